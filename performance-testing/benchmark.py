@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import psutil
+import requests
+
+from run_report import RunReport
+from student_ppt_viewer import apply_config_overrides, get_free_port, load_config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join("results", "benchmark")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+PHASES = ('provisioning', 'overhead', 'capacity')
+
+# Mock routes whose server-side time is inside each harness step; the rest of the step is harness overhead
+STEP_ROUTES = {
+    'initial_page_load': ['page'], 'login_submit': ['login'], 'aspirations': ['aspirations'], 'enrolled_units': ['units'],
+    'session_list': ['sessions'], 'ppt_container': ['ppt'], 'chat_message': ['chat'],
+    'chat_first_token': ['chat_first_token'], 'chat_response': ['chat'],
+}
+# The browser records aspirations up to the submit click, before the API call returns
+BROWSER_STEP_ROUTES = dict(STEP_ROUTES, aspirations=[])
+
+def int_list(value):
+    return [int(item) for item in str(value).split(',') if item.strip()]
+
+class ProcessTreeCpu:
+    """CPU seconds and peak RSS of a process and all its descendants (Chrome, chromedriver), sampled
+
+    A descendant's CPU time is kept from its last sample after it exits, so short-lived
+    browsers lose at most one sampling interval.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.cpu = {}
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-cpu", daemon=True)
+
+    def _sample(self):
+        rss = 0
+        try:
+            processes = [self.root] + self.root.children(recursive=True)
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                times = process.cpu_times()
+                self.cpu[(process.pid, process.create_time())] = times.user + times.system
+                rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    @property
+    def cpu_seconds(self):
+        return sum(self.cpu.values())
+
+class Benchmark:
+    """Runs the harness against a local mock portal in a scratch directory and measures the harness itself
+
+    The scratch directory gets a copy of test_config.properties pointed at the mock,
+    its own credential store and its own logs, so real accounts and results are untouched.
+    """
+
+    def __init__(self, config, overrides):
+        self.config = config
+        self.overrides = overrides or []
+        self.stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.workdir = os.path.abspath(os.path.join(BENCH_DIR, f"work_{self.stamp}"))
+        self.port = int(config.get('BENCH_MOCK_PORT', 0)) or get_free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.mock = None
+        self.mock_log = None
+        self.timeout = int(config.get('BENCH_RUN_TIMEOUT', 900))
+
+    def prepare(self):
+        """Scratch directory with a config that sends every request to the mock"""
+        os.makedirs(self.workdir, exist_ok=True)
+        login_path = urlparse(self.config['LOGIN_URL']).path or '/login'
+        viewing = int(float(self.config.get('BENCH_VIEWING_DURATION', 5)))
+        think = self.config.get('BENCH_THINK_TIME', 1)
+        settings = {
+            'LOGIN_URL': f"{self.base}{login_path}", 'API_BASE_URL': self.base, 'PROTOCOL_BASE_URL': self.base,
+            'CREDENTIALS_FILE': 'student_credentials.csv', 'CREDENTIALS_DB': 'student_credentials.db',
+            'PPT_VIEWING_DURATION': viewing, 'PROTOCOL_VIEWING_DURATION': viewing, 'PROTOCOL_PPT_POLL_INTERVAL': 1,
+            'SOAK_THINK_TIME_MIN': think, 'SOAK_THINK_TIME_MAX': think, 'SOAK_DRAIN_TIMEOUT': 120,
+            # Measure the harness alone: no throttling, retries, exporters or checkpoints in the way
+            'HOST_MONITOR': 'false', 'RETRY_MAX_ATTEMPTS': 0, 'CHECKPOINT': 'false', 'TELEMETRY_PORT': 0,
+            'TELEMETRY_CSV_INTERVAL': 0, 'LOG_CONSOLE': 'quiet', 'PROVISION_RATE_LIMIT': 0,
+        }
+        shutil.copy('test_config.properties', os.path.join(self.workdir, 'test_config.properties'))
+        with open(os.path.join(self.workdir, 'test_config.properties'), 'a') as f:
+            f.write("\n\n# Benchmark: everything points at the local mock portal\n")
+            for key, value in settings.items():
+                f.write(f"{key}={value}\n")
+            for override in self.overrides:
+                f.write(f"{override}\n")
+
+    def start_mock(self):
+        self.mock_log = open(os.path.join(self.workdir, 'mock_portal.out'), 'w')
+        self.mock = subprocess.Popen([sys.executable, os.path.join(HERE, 'mock_portal.py'), '--port', str(self.port)],
+                                     cwd=self.workdir, stdout=self.mock_log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            if self.mock.poll() is not None:
+                raise RuntimeError(f"Mock portal exited (see {self.mock_log.name})")
+            try:
+                requests.get(f"{self.base}/__mock/stats", timeout=1)
+                return
+            except requests.exceptions.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError(f"Mock portal did not answer on {self.base}")
+
+    def stop_mock(self):
+        if self.mock and self.mock.poll() is None:
+            self.mock.terminate()
+            try:
+                self.mock.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.mock.kill()
+        if self.mock_log:
+            self.mock_log.close()
+            self.mock_log = None
+
+    def mock_settings(self, **settings):
+        requests.post(f"{self.base}/__mock/settings", json=settings, timeout=5).raise_for_status()
+        requests.post(f"{self.base}/__mock/stats/reset", timeout=5).raise_for_status()
+
+    def mock_stats(self):
+        return requests.get(f"{self.base}/__mock/stats", timeout=5).json()['routes']
+
+    def run(self, script, args, name):
+        """Run one harness script in the scratch directory; wall time, CPU and peak RSS of its process tree"""
+        output = os.path.join(self.workdir, f"{name}.out")
+        started = time.monotonic()
+        with open(output, 'w') as out:
+            process = subprocess.Popen([sys.executable, os.path.join(HERE, script)] + args, cwd=self.workdir,
+                                       stdout=out, stderr=subprocess.STDOUT)
+            sampler = ProcessTreeCpu(process.pid).start()
+            try:
+                returncode = process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                returncode = process.wait()
+            finally:
+                sampler.stop()
+        wall = time.monotonic() - started
+        with open(output, errors='replace') as f:
+            text = f.read()
+        return {'returncode': returncode, 'wall_seconds': round(wall, 2), 'cpu_seconds': round(sampler.cpu_seconds, 2),
+                'cpu_cores': round(sampler.cpu_seconds / wall, 3) if wall > 0 else None,
+                'peak_rss_mb': round(sampler.peak_rss / 1024 / 1024, 1), 'output': output, 'text': text}
+
+    def run_report(self, text):
+        """RunReport of the harness run whose console output is `text`"""
+        match = re.search(r"Log file: (\S+\.log)", text)
+        if not match:
+            return None
+        report = RunReport()
+        report.add_log(os.path.join(self.workdir, match.group(1)))
+        report.metrics_files = [os.path.join(self.workdir, path) for path in report.metrics_files]
+        return report.finish()
+
+    def provisioning(self, levels):
+        """create_students.py throughput against the mock at each concurrency level"""
+        largest = max(int_list(self.config.get('BENCH_LEVELS_PROTOCOL', '25,50,100,200,400')) +
+                      int_list(self.config.get('BENCH_LEVELS_BROWSER', '1,2,4,8')))
+        students = max(int(self.config.get('BENCH_PROVISION_STUDENTS', 200)), largest)
+        self.mock_settings(MOCK_LATENCY_MS=float(self.config.get('BENCH_MOCK_LATENCY_MS', 50)))
+        rows = []
+        for concurrency in levels:
+            print(f"Provisioning: {students} students at concurrency {concurrency}")
+            result = self.run('create_students.py', ['--students', str(students), '--concurrency', str(concurrency), '--rate', '0'],
+                              f"provision_c{concurrency}")
+            text = result.pop('text')
+            completed = re.search(r"Completed: (\d+) created, (\d+) failed", text)
+            duration = re.search(r"Duration: ([\d.]+)s, throughput: ([\d.]+) students/s", text)
+            latency = re.search(r"p50=(\d+) p90=\d+ p95=(\d+)", text)
+            row = dict(concurrency=concurrency, students=students, created=int(completed.group(1)) if completed else 0,
+                       failed=int(completed.group(2)) if completed else students,
+                       duration_s=float(duration.group(1)) if duration else None,
+                       throughput_per_s=float(duration.group(2)) if duration else None,
+                       p50_ms=int(latency.group(1)) if latency else None, p95_ms=int(latency.group(2)) if latency else None,
+                       **result)
+            print(f"  {row['created']} created, {row['failed']} failed, {row['throughput_per_s']} students/s, "
+                  f"{row['cpu_cores']} cores")
+            rows.append(row)
+        return rows
+
+    def overhead(self, engine):
+        """Per-step harness overhead: the step's measured time minus the mock's server-side time for it"""
+        students = int(self.config.get('BENCH_OVERHEAD_STUDENTS', 10))
+        concurrency = int(self.config.get('BENCH_OVERHEAD_CONCURRENCY', 2))
+        self.mock_settings(MOCK_LATENCY_MS=0, MOCK_LATENCY_JITTER_MS=0, MOCK_ERROR_RATE=0, MOCK_PPT_READY_SECONDS=0)
+        print(f"Overhead ({engine}): {students} students at concurrency {concurrency}, no injected latency")
+        result = self.run('student_ppt_viewer.py', ['--engine', engine, '--students', str(students), '--concurrency', str(concurrency),
+                                                    '--timeout', str(self.timeout)], f"overhead_{engine}")
+        report = self.run_report(result.pop('text'))
+        routes = self.mock_stats()
+        step_routes = BROWSER_STEP_ROUTES if engine == 'browser' else STEP_ROUTES
+        steps = []
+        for row in (report.step_metrics.rows() if report else []):
+            if row['session'] != 'all' or not row['count']:
+                continue
+            server = {pct: sum(routes.get(route, {}).get(f"{pct}_ms", 0) for route in step_routes.get(row['step'], []))
+                      for pct in ('p50', 'p95')}
+            steps.append({'step': row['step'], 'count': row['count'], 'p50_ms': row['p50_ms'], 'p95_ms': row['p95_ms'],
+                          'server_p50_ms': round(server['p50'], 2), 'server_p95_ms': round(server['p95'], 2),
+                          'overhead_p50_ms': round(max(0.0, row['p50_ms'] - server['p50']), 2),
+                          'overhead_p95_ms': round(max(0.0, row['p95_ms'] - server['p95']), 2)})
+        for step in steps:
+            print(f"  {step['step']:<18} p50 {step['p50_ms']:>9.1f} ms  server {step['server_p50_ms']:>8.1f} ms  "
+                  f"overhead {step['overhead_p50_ms']:>8.1f} ms")
+        batch = report.to_dict()['batch'] if report else {}
+        return dict(students=students, concurrency=concurrency, success_rate=batch.get('success_rate'), steps=steps,
+                    mock_routes=routes, **result)
+
+    def capacity(self, engine):
+        """Step up concurrent virtual students (a short soak per level) until the harness no longer keeps up
+
+        A level is sustainable while its success rate stays at BENCH_MIN_SUCCESS_RATE and no
+        step's p95 grows past BENCH_MAX_LATENCY_INFLATION x its p95 at the first level: the
+        mock's latency is fixed, so growth is the harness queueing behind itself.
+        """
+        levels = int_list(self.config.get(f"BENCH_LEVELS_{engine.upper()}", '25,50,100,200,400' if engine == 'protocol' else '1,2,4,8'))
+        duration = self.config.get('BENCH_LEVEL_DURATION', '60s')
+        min_success = float(self.config.get('BENCH_MIN_SUCCESS_RATE', 0.99))
+        max_inflation = float(self.config.get('BENCH_MAX_LATENCY_INFLATION', 1.5))
+        self.mock_settings(MOCK_LATENCY_MS=float(self.config.get('BENCH_MOCK_LATENCY_MS', 50)), MOCK_ERROR_RATE=0)
+        rows, reference = [], None
+        for level in levels:
+            print(f"Capacity ({engine}): {level} virtual students for {duration}")
+            result = self.run('student_ppt_viewer.py', ['--engine', engine, '--soak', str(duration), '--students', str(level),
+                                                        '--concurrency', str(level)],
+                              f"capacity_{engine}_{level}")
+            report = self.run_report(result.pop('text'))
+            data = report.to_dict() if report else {'batch': {}, 'step_latency': []}
+            p95 = {row['step']: row['p95_ms'] for row in data['step_latency'] if row['count'] >= 5}
+            reference = reference or p95
+            ratios = [p95[step] / reference[step] for step in p95 if reference.get(step)]
+            inflation = max(ratios) if ratios else None
+            iterations = data['batch'].get('total', 0)
+            success_rate = data['batch'].get('success_rate')
+            sustainable = (result['returncode'] in (0, 2) and iterations > 0 and success_rate is not None
+                           and success_rate >= min_success and (inflation is None or inflation <= max_inflation))
+            row = dict(concurrency=level, iterations=iterations, success_rate=success_rate,
+                       iterations_per_s=round(iterations / result['wall_seconds'], 3) if result['wall_seconds'] else None,
+                       p95_inflation=round(inflation, 3) if inflation else None,
+                       students_per_core=round(level / result['cpu_cores'], 1) if result['cpu_cores'] else None,
+                       sustainable=sustainable, step_p95_ms=p95, **result)
+            print(f"  {iterations} iterations, success {success_rate if success_rate is None else f'{success_rate:.1%}'}, "
+                  f"{result['cpu_cores']} cores, p95 inflation {row['p95_inflation']}, "
+                  f"{'sustainable' if sustainable else 'NOT sustainable'}")
+            rows.append(row)
+            if not sustainable:
+                break
+        best = max((row for row in rows if row['sustainable']), key=lambda row: row['concurrency'], default=None)
+        return {'levels': rows, 'max_sustainable_concurrency': best['concurrency'] if best else 0,
+                'students_per_core': best['students_per_core'] if best else None,
+                'peak_rss_mb_per_student': round(best['peak_rss_mb'] / best['concurrency'], 1) if best else None}
+
+def host_info():
+    memory = psutil.virtual_memory()
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'hostname': socket.gethostname(), 'cpu_cores': psutil.cpu_count(), 'physical_cores': psutil.cpu_count(logical=False),
+            'memory_gb': round(memory.total / 1024 ** 3, 1), 'platform': platform.platform(),
+            'python': platform.python_version(), 'commit': commit or None}
+
+def baseline_metrics(result):
+    """Flat {metric: (value, higher_is_better)} view of a benchmark result, for comparing against a baseline"""
+    metrics = {}
+    for row in result.get('provisioning', []):
+        if row['throughput_per_s'] is not None:
+            metrics[f"provisioning.c{row['concurrency']}.throughput_per_s"] = (row['throughput_per_s'], True)
+    for engine, overhead in result.get('overhead', {}).items():
+        for step in overhead['steps']:
+            metrics[f"overhead.{engine}.{step['step']}.overhead_p50_ms"] = (step['overhead_p50_ms'], False)
+    for engine, capacity in result.get('capacity', {}).items():
+        metrics[f"capacity.{engine}.max_sustainable_concurrency"] = (capacity['max_sustainable_concurrency'], True)
+        if capacity['students_per_core'] is not None:
+            metrics[f"capacity.{engine}.students_per_core"] = (capacity['students_per_core'], True)
+    return metrics
+
+def compare_to_baseline(result, baseline, tolerance, min_overhead_ms=5.0):
+    """Metric-by-metric change against the baseline; a regression is a change for the worse beyond `tolerance`
+
+    Overheads below `min_overhead_ms` are too small to compare relatively and are skipped.
+    """
+    current, previous = baseline_metrics(result), baseline_metrics(baseline)
+    rows = []
+    for metric, (value, higher_is_better) in current.items():
+        if metric not in previous:
+            continue
+        before = previous[metric][0]
+        if not before or (metric.endswith('overhead_p50_ms') and max(before, value) < min_overhead_ms):
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better else change
+        rows.append({'metric': metric, 'baseline': before, 'current': value, 'change_pct': round(change * 100, 1),
+                     'regression': worse > tolerance})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Harness overhead, capacity and provisioning benchmarks against a local mock portal')
+    parser.add_argument('--phases', default=','.join(PHASES), help=f"Comma-separated phases to run (default: {','.join(PHASES)})")
+    parser.add_argument('--engines', help='Comma-separated engines for the overhead and capacity phases (overrides BENCH_ENGINES)')
+    parser.add_argument('--save-baseline', action='store_true', help='Also save the result as the --baseline file')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline to compare against, if it exists')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='Override any config value for the benchmark and the runs it starts (repeatable)')
+    args = parser.parse_args()
+
+    config = apply_config_overrides(load_config(), args.set)
+    phases = [phase.strip() for phase in args.phases.split(',') if phase.strip()]
+    unknown = [phase for phase in phases if phase not in PHASES]
+    if unknown:
+        print(f"Unknown phases: {', '.join(unknown)} (expected {', '.join(PHASES)})")
+        return 1
+    engines = [engine.strip() for engine in (args.engines or config.get('BENCH_ENGINES', 'protocol,browser')).split(',') if engine.strip()]
+
+    bench = Benchmark(config, args.set)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    bench.prepare()
+    print(f"Benchmark workspace: {bench.workdir}")
+    result = {'created': datetime.now().isoformat(timespec='seconds'), 'host': host_info(), 'phases': phases, 'engines': engines,
+              'settings': {key: value for key, value in config.items() if key.startswith(('BENCH_', 'MOCK_'))}}
+    try:
+        bench.start_mock()
+        print(f"Mock portal: {bench.base}")
+        # Provisioning also creates the accounts the harness phases log in with, so a fresh workspace always gets one pass
+        levels = int_list(config.get('BENCH_PROVISION_CONCURRENCY', '1,10,50'))
+        provisioning = bench.provisioning(levels if 'provisioning' in phases else levels[-1:])
+        if 'provisioning' in phases:
+            result['provisioning'] = provisioning
+        if 'overhead' in phases:
+            result['overhead'] = {engine: bench.overhead(engine) for engine in engines}
+        if 'capacity' in phases:
+            result['capacity'] = {engine: bench.capacity(engine) for engine in engines}
+    finally:
+        bench.stop_mock()
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare_to_baseline(result, baseline, float(config.get('BENCH_REGRESSION_TOLERANCE', 0.15)))
+        result['baseline'] = {'path': args.baseline, 'created': baseline.get('created'), 'comparison': comparison}
+        print(f"\nAGAINST BASELINE ({baseline.get('created')})")
+        changed = sorted(key for key in set(result['settings']) | set(baseline.get('settings', {}))
+                         if result['settings'].get(key) != baseline.get('settings', {}).get(key))
+        if changed:
+            print(f"WARNING: Baseline was measured with different settings ({', '.join(changed)}) - changes may not be regressions")
+        for row in comparison:
+            print(f"{row['metric']:<55} {row['baseline']:>10g} -> {row['current']:>10g} {row['change_pct']:>+7.1f}%"
+                  f"{'  REGRESSION' if row['regression'] else ''}")
+        regressions = [row for row in comparison if row['regression']]
+
+    print("\nBENCHMARK SUMMARY")
+    for engine, capacity in result.get('capacity', {}).items():
+        print(f"{engine}: max sustainable {capacity['max_sustainable_concurrency']} virtual students, "
+              f"{capacity['students_per_core']} per core")
+    result_file = os.path.join(BENCH_DIR, f"benchmark_{bench.stamp}.json")
+    with open(result_file, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Benchmark result: {result_file}")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        shutil.copy(result_file, args.baseline)
+        print(f"Baseline saved: {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} metrics regressed beyond {float(config.get('BENCH_REGRESSION_TOLERANCE', 0.15)):.0%} of the baseline")
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import threading
+
+import requests
+import websocket
+
+# Fonts and analytics/tracking beacons: not needed to render slides or chat, but fetched by every student
+DEFAULT_BLOCK_URLS = ("*.woff", "*.woff2", "*.ttf", "*.otf", "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+                      "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+                      "*clarity.ms*", "*segment.io*", "*sentry.io*")
+
+# Network.emulateNetworkConditions presets: round-trip latency (ms), download/upload (kbit/s)
+NETWORK_PROFILES = {
+    '3g': (300, 1600, 750),
+    '4g': (50, 12000, 6000),
+    'home_dsl': (30, 8000, 1000),
+    'campus_wifi': (10, 30000, 15000),
+}
+
+LEAN_CHROME_ARGS = ("--disable-background-networking", "--disable-component-update", "--disable-default-apps",
+                    "--disable-sync", "--disable-features=Translate,OptimizationHints,MediaRouter",
+                    "--mute-audio", "--no-first-run", "--metrics-recording-only")
+
+def lean_mode_enabled(config):
+    return str(config.get('BROWSER_LEAN_MODE', 'false')).lower() == 'true'
+
+def contexts_per_browser(config):
+    """Students sharing one Chrome process in lean mode (1 = a Chrome per student)"""
+    return max(1, int(config.get('BROWSER_CONTEXTS_PER_PROCESS', 1))) if lean_mode_enabled(config) else 1
+
+def blocked_url_patterns(config):
+    patterns = config.get('BROWSER_BLOCK_URLS')
+    if patterns is None:
+        return list(DEFAULT_BLOCK_URLS)
+    return [p.strip() for p in patterns.split(',') if p.strip()]
+
+def network_conditions(config):
+    """CDP emulateNetworkConditions params for NETWORK_PROFILE, or None when unthrottled"""
+    name = config.get('NETWORK_PROFILE', 'none').strip().lower()
+    if name in ('', 'none'):
+        return None
+    if name == 'custom':
+        latency, down, up = (float(config.get('NETWORK_PROFILE_LATENCY_MS', 0)),
+                             float(config.get('NETWORK_PROFILE_DOWNLOAD_KBPS', 0)),
+                             float(config.get('NETWORK_PROFILE_UPLOAD_KBPS', 0)))
+    elif name in NETWORK_PROFILES:
+        latency, down, up = NETWORK_PROFILES[name]
+    else:
+        raise ValueError(f"Unknown NETWORK_PROFILE '{name}' (expected none, custom or one of {', '.join(NETWORK_PROFILES)})")
+    # Throughput is in bytes per second; -1 disables that direction's limit
+    return {'offline': False, 'latency': latency,
+            'downloadThroughput': down * 1000 / 8 if down > 0 else -1,
+            'uploadThroughput': up * 1000 / 8 if up > 0 else -1}
+
+def describe_browser_mode(config):
+    mode = "lean" if lean_mode_enabled(config) else "standard"
+    per_browser = contexts_per_browser(config)
+    if per_browser > 1:
+        mode += f", {per_browser} contexts per Chrome"
+    profile = config.get('NETWORK_PROFILE', 'none').strip().lower() or 'none'
+    return mode if profile == 'none' else f"{mode}, network {profile}"
+
+def apply_browser_conditions(driver, config):
+    """URL blocking (lean mode) and network throttling for the driver's current tab; both are per tab in CDP"""
+    conditions = network_conditions(config)
+    patterns = blocked_url_patterns(config) if lean_mode_enabled(config) else []
+    if not patterns and conditions is None:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    if patterns:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    if conditions is not None:
+        driver.execute_cdp_cmd("Network.emulateNetworkConditions", conditions)
+
+class BrowserHost:
+    """One shared Chrome process, driven through its browser-level DevTools endpoint"""
+
+    def __init__(self, driver, port):
+        self.driver = driver
+        self.port = port
+        self.contexts = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        version = requests.get(f"http://127.0.0.1:{port}/json/version", timeout=10).json()
+        self._ws = websocket.create_connection(version['webSocketDebuggerUrl'], timeout=30, suppress_origin=True)
+
+    def command(self, method, params=None):
+        """Send one browser-level CDP command and return its result (events on this connection are skipped)"""
+        with self._lock:
+            message_id = next(self._ids)
+            self._ws.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+            while True:
+                reply = json.loads(self._ws.recv())
+                if reply.get('id') != message_id:
+                    continue
+                if 'error' in reply:
+                    raise RuntimeError(f"{method} failed: {reply['error'].get('message')}")
+                return reply.get('result', {})
+
+    def new_context(self):
+        """An isolated (incognito-like) context with one blank tab: (context_id, target_id)"""
+        context_id = self.command('Target.createBrowserContext', {'disposeOnDetach': False})['browserContextId']
+        try:
+            target_id = self.command('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})['targetId']
+        except Exception:
+            self.dispose_context(context_id)
+            raise
+        return context_id, target_id
+
+    def dispose_context(self, context_id):
+        """Close the context's tabs and drop its cookies, storage and cache"""
+        try:
+            self.command('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except Exception:
+            pass
+
+    def close(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+class BrowserContexts:
+    """Packs several students into each Chrome process, one isolated browser context each
+
+    `launch()` starts a shared Chrome and returns (driver, debug_port); `attach(port)`
+    opens a WebDriver session on an already running Chrome; `prepare(driver)` sets up
+    a student's tab; `destroy(driver)` shuts a launched Chrome down. A Chrome is closed
+    once its last context is gone.
+    """
+
+    def __init__(self, launch, attach, prepare, destroy, per_browser):
+        self.launch = launch
+        self.attach = attach
+        self.prepare = prepare
+        self.destroy_browser = destroy
+        self.per_browser = per_browser
+        self.hosts = []
+        self.peak_hosts = 0
+        self.contexts_created = 0
+        self._lock = threading.Lock()
+        self._launch_lock = threading.Lock()
+
+    def _take_slot(self):
+        with self._lock:
+            for host in self.hosts:
+                if host.contexts < self.per_browser:
+                    host.contexts += 1
+                    return host
+        return None
+
+    def _reserve(self):
+        """A host with a free context slot, launching a new Chrome when all are full"""
+        host = self._take_slot()
+        if host is not None:
+            return host
+        # One launch at a time, so students arriving together fill a new Chrome instead of each starting one
+        with self._launch_lock:
+            host = self._take_slot()
+            if host is not None:
+                return host
+            launched = self.launch()
+            if launched is None:
+                return None
+            driver, port = launched
+            try:
+                host = BrowserHost(driver, port)
+            except Exception as e:
+                print(f"Error connecting to shared Chrome on port {port}: {e}")
+                self.destroy_browser(driver)
+                return None
+            with self._lock:
+                host.contexts = 1
+                self.hosts.append(host)
+                self.peak_hosts = max(self.peak_hosts, len(self.hosts))
+            return host
+
+    def _free(self, host):
+        with self._lock:
+            host.contexts -= 1
+            if host.contexts > 0 or host not in self.hosts:
+                return
+            self.hosts.remove(host)
+        host.close()
+        self.destroy_browser(host.driver)
+
+    def _open_tab(self, driver, host):
+        context_id, target_id = host.new_context()
+        # chromedriver window handles are CDP target ids
+        driver.switch_to.window(target_id)
+        driver.browser_context_id = context_id
+        self.prepare(driver)
+
+    def create(self):
+        """A driver on a fresh isolated context; None if Chrome could not be started or attached"""
+        host = self._reserve()
+        if host is None:
+            return None
+        driver = None
+        try:
+            driver = self.attach(host.port)
+            driver.browser_host = host
+            driver.browser_contexts = self
+            self._open_tab(driver, host)
+        except Exception as e:
+            print(f"Error opening browser context: {e}")
+            if driver is not None:
+                self.close(driver)
+            else:
+                self._free(host)
+            return None
+        with self._lock:
+            self.contexts_created += 1
+        return driver
+
+    def reset(self, driver, origins=None):
+        """Swap the driver onto a brand-new context, which clears everything the last student left behind"""
+        host = driver.browser_host
+        old_context = getattr(driver, 'browser_context_id', None)
+        self._open_tab(driver, host)
+        if old_context:
+            host.dispose_context(old_context)
+        with self._lock:
+            self.contexts_created += 1
+
+    def close(self, driver):
+        """End one student's WebDriver session and context; the shared Chrome keeps running for the others"""
+        host = driver.browser_host
+        try:
+            # An attached session leaves the browser itself running
+            driver.quit()
+        except Exception:
+            pass
+        context_id = getattr(driver, 'browser_context_id', None)
+        if context_id:
+            host.dispose_context(context_id)
+        self._free(host)
+
+    def shutdown(self):
+        with self._lock:
+            hosts = list(self.hosts)
+            self.hosts.clear()
+        for host in hosts:
+            host.close()
+            self.destroy_browser(host.driver)
+
+    def summary(self):
+        with self._lock:
+            return {'contexts_per_browser': self.per_browser, 'peak_browsers': self.peak_hosts,
+                    'contexts_created': self.contexts_created}
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+from step_metrics import LatencyHistogram
+
+# Installed on the chat container before the question is sent. Records (in page time)
+# when the reply first appears and when the container last changed while streaming.
+CHAT_OBSERVER_JS = """
+var container = typeof arguments[0] !== 'string' ? arguments[0] : document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!container) { return false; }
+if (window.__chatObserver) { window.__chatObserver.disconnect(); }
+var state = {baseline: container.textContent.length, threshold: arguments[1],
+             sentAt: null, firstAt: null, lastAt: null, firstLength: 0, length: 0};
+window.__chatState = state;
+window.__chatObserver = new MutationObserver(function () {
+    if (state.sentAt === null) { return; }
+    var length = container.textContent.length;
+    state.length = length;
+    // Ignore the echoed question: only growth beyond it counts as reply content
+    if (length - state.baseline <= state.threshold) { return; }
+    var now = performance.now();
+    if (state.firstAt === null) { state.firstAt = now; state.firstLength = length; }
+    state.lastAt = now;
+    state.tail = container.textContent.slice(-500);
+});
+window.__chatObserver.observe(container, {childList: true, subtree: true, characterData: true});
+return true;
+"""
+
+MARK_SENT_JS = "if (window.__chatState) { window.__chatState.sentAt = performance.now(); }"
+
+READ_STATE_JS = """
+var s = window.__chatState;
+if (!s) { return null; }
+return {now: performance.now(), sentAt: s.sentAt, firstAt: s.firstAt, lastAt: s.lastAt,
+        firstLength: s.firstLength, length: s.length, tail: s.tail || ''};
+"""
+
+STOP_OBSERVER_JS = "if (window.__chatObserver) { window.__chatObserver.disconnect(); window.__chatObserver = null; }"
+
+def install_chat_observer(driver, container, question, config):
+    """Start watching the chat container (an element or its XPath); True if the container was found"""
+    threshold = len(question) + int(config.get('CHAT_ECHO_MARGIN', 20))
+    return bool(driver.execute_script(CHAT_OBSERVER_JS, container, threshold))
+
+def mark_chat_sent(driver):
+    driver.execute_script(MARK_SENT_JS)
+
+def classify_reply(text, config):
+    """'error' if the reply matches a configured error phrase, else 'ok'"""
+    patterns = [p.strip().lower() for p in config.get('CHAT_ERROR_PATTERNS', '').split(',') if p.strip()]
+    lowered = text.lower()
+    return 'error' if any(pattern in lowered for pattern in patterns) else 'ok'
+
+def wait_for_chat_response(driver, config, stop_event=None):
+    """Poll the observer until the reply stops changing; returns an observation dict
+
+    outcome is 'ok', 'error' (matched CHAT_ERROR_PATTERNS), 'empty' (no reply
+    before CHAT_RESPONSE_TIMEOUT) or 'incomplete' (still streaming at the timeout).
+    Times are in seconds from the moment the question was sent.
+    """
+    timeout = float(config.get('CHAT_RESPONSE_TIMEOUT', 120))
+    idle = float(config.get('CHAT_RESPONSE_IDLE', 3))
+    poll = float(config.get('CHAT_POLL_INTERVAL', 0.25))
+    deadline = time.monotonic() + timeout
+    state = None
+    completed = False
+    try:
+        while True:
+            state = driver.execute_script(READ_STATE_JS)
+            if state and state['firstAt'] is not None and (state['now'] - state['lastAt']) / 1000.0 >= idle:
+                completed = True
+                break
+            if time.monotonic() >= deadline:
+                break
+            if stop_event is not None:
+                if stop_event.wait(poll):
+                    break
+            else:
+                time.sleep(poll)
+    finally:
+        driver.execute_script(STOP_OBSERVER_JS)
+    return build_observation(state, config, completed)
+
+def build_observation(state, config, completed=True):
+    if not state or state['sentAt'] is None or state['firstAt'] is None:
+        return {'outcome': 'empty', 'first_token': None, 'full_response': None, 'chars_per_second': None, 'chars': 0}
+    first_token = (state['firstAt'] - state['sentAt']) / 1000.0
+    full_response = (state['lastAt'] - state['sentAt']) / 1000.0
+    streamed_chars = state['length'] - state['firstLength']
+    streaming_time = (state['lastAt'] - state['firstAt']) / 1000.0
+    outcome = classify_reply(state['tail'], config) if completed else 'incomplete'
+    return {
+        'outcome': outcome,
+        'first_token': first_token,
+        'full_response': full_response,
+        'chars_per_second': streamed_chars / streaming_time if streaming_time > 0 else None,
+        'chars': streamed_chars,
+    }
+
+def concurrency_bucket(active, width):
+    """Label for the concurrency band a request was sent in, e.g. '11-20'"""
+    low = ((max(active, 1) - 1) // width) * width + 1
+    return f"{low}-{low + width - 1}"
+
+class ChatMetrics:
+    """AI tutor reply latency and streaming throughput, aggregated per concurrency band"""
+
+    OUTCOMES = ('ok', 'error', 'empty', 'incomplete')
+
+    def __init__(self, bucket_width=10):
+        self.bucket_width = bucket_width
+        self.levels = {}
+        self._lock = threading.Lock()
+
+    def _level(self, label):
+        level = self.levels.get(label)
+        if level is None:
+            level = {'first_token': LatencyHistogram(), 'full_response': LatencyHistogram(),
+                     'cps_total': 0.0, 'cps_count': 0}
+            level.update({outcome: 0 for outcome in self.OUTCOMES})
+            self.levels[label] = level
+        return level
+
+    def record(self, observation, active_sessions):
+        labels = ['all', concurrency_bucket(active_sessions, self.bucket_width)]
+        with self._lock:
+            for label in labels:
+                level = self._level(label)
+                level[observation['outcome']] += 1
+                if observation['first_token'] is not None:
+                    level['first_token'].record(observation['first_token'])
+                    level['full_response'].record(observation['full_response'])
+                if observation['chars_per_second']:
+                    level['cps_total'] += observation['chars_per_second']
+                    level['cps_count'] += 1
+
+    def merge(self, other):
+        with self._lock:
+            for label, theirs in other.levels.items():
+                level = self._level(label)
+                level['first_token'].merge(theirs['first_token'])
+                level['full_response'].merge(theirs['full_response'])
+                for key in ('cps_total', 'cps_count') + self.OUTCOMES:
+                    level[key] += theirs[key]
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {'bucket_width': self.bucket_width,
+                    'levels': {label: dict(level, first_token=level['first_token'].to_dict(),
+                                           full_response=level['full_response'].to_dict())
+                               for label, level in self.levels.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls(data['bucket_width'])
+        for label, level in data['levels'].items():
+            metrics.levels[label] = dict(level, first_token=LatencyHistogram.from_dict(level['first_token']),
+                                         full_response=LatencyHistogram.from_dict(level['full_response']))
+        return metrics
+
+    def rows(self):
+        with self._lock:
+            rows = []
+            for label, level in self.levels.items():
+                first, full = level['first_token'].summary(), level['full_response'].summary()
+                row = {'concurrency': label}
+                row.update({outcome: level[outcome] for outcome in self.OUTCOMES})
+                row.update({f'first_token_{k}': v for k, v in first.items() if k != 'count'})
+                row.update({f'full_response_{k}': v for k, v in full.items() if k != 'count'})
+                row['mean_chars_per_second'] = round(level['cps_total'] / level['cps_count'], 1) if level['cps_count'] else None
+                rows.append(row)
+        rows.sort(key=lambda r: (r['concurrency'] != 'all', int(r['concurrency'].split('-')[0]) if r['concurrency'] != 'all' else 0))
+        return rows
+
+def format_chat_row(row):
+    replies = row['ok'] + row['error'] + row['empty'] + row['incomplete']
+    line = f"{row['concurrency']:>10} {replies:>6} {row['ok']:>5} {row['error']:>5} {row['empty']:>5} {row['incomplete']:>5}"
+    if 'first_token_p50_ms' in row:
+        line += (f" {row['first_token_p50_ms']:>9.0f} {row['first_token_p95_ms']:>9.0f}"
+                 f" {row['full_response_p50_ms']:>9.0f} {row['full_response_p95_ms']:>9.0f}")
+        if row['mean_chars_per_second'] is not None:
+            line += f" {row['mean_chars_per_second']:>8.1f}"
+    return line
+
+CHAT_TABLE_HEADER = (f"{'active':>10} {'sent':>6} {'ok':>5} {'error':>5} {'empty':>5} {'incmp':>5}"
+                     f" {'ttft_p50':>9} {'ttft_p95':>9} {'full_p50':>9} {'full_p95':>9} {'chars/s':>8}")
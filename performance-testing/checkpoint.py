@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+CHECKPOINT_DIR = os.path.join("results", "checkpoints")
+
+class RunCheckpoint:
+    """Append-only JSON-lines log of a run: a header line, then one line per finished attempt
+
+    Every line is flushed as it is written, so a crashed harness loses at most the
+    students that were still running. `--resume` replays the file into a new run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, students, total_students, owner, engine):
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        path = os.path.join(CHECKPOINT_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        checkpoint = cls(path)
+        checkpoint._write({'type': 'run', 'started': datetime.now().isoformat(timespec='seconds'), 'owner': owner,
+                           'engine': engine, 'total_students': total_students,
+                           'students': [student['email'] for student in students]})
+        return checkpoint
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def resumed(self, owner, remaining):
+        """Mark where a resumed run picked the file up"""
+        self._write({'type': 'resume', 'at': datetime.now().isoformat(timespec='seconds'), 'owner': owner,
+                     'remaining': remaining})
+
+    def record(self, student, attempt, success, final, timer, category=None, kind=None):
+        self._write({'type': 'attempt', 'email': student['email'], 'attempt': attempt, 'success': success,
+                     'final': final, 'category': category, 'kind': kind, 'session': timer.session,
+                     'steps': timer.durations, 'failed_step': timer.failed_step, 'at': time.time()})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def latest_checkpoint():
+    paths = sorted(glob.glob(os.path.join(CHECKPOINT_DIR, "run_*.jsonl")))
+    return paths[-1] if paths else None
+
+def load_checkpoint(path):
+    """Parse a checkpoint file: {'path', 'header', 'attempts', 'finished', 'prior_attempts'}
+
+    A torn last line (the harness died mid-write) is ignored.
+    """
+    header, owners, attempts = None, [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('type') == 'run':
+                header = entry
+                owners.append(entry['owner'])
+            elif entry.get('type') == 'resume':
+                owners.append(entry['owner'])
+            elif entry.get('type') == 'attempt':
+                attempts.append(entry)
+    if header is None:
+        raise ValueError(f"{path} is not a run checkpoint (no header line)")
+    finished = {entry['email'] for entry in attempts if entry['final']}
+    prior_attempts = {}
+    for entry in attempts:
+        if entry['email'] not in finished:
+            prior_attempts[entry['email']] = max(prior_attempts.get(entry['email'], 0), entry['attempt'] + 1)
+    return {'path': path, 'header': header, 'owners': owners, 'attempts': attempts,
+            'finished': finished, 'prior_attempts': prior_attempts}
+
+def restore_run(run, checkpoint):
+    """Replay finished attempts into a fresh RunState: outcome counters and step metrics"""
+    for entry in checkpoint['attempts']:
+        metrics = run.step_metrics if entry['attempt'] == 0 else run.retry_step_metrics
+        for step, seconds in entry['steps'].items():
+            metrics.record(step, seconds, entry['session'])
+        if entry['failed_step']:
+            metrics.record_failure(entry['failed_step'], entry['session'])
+        run.count_attempt(entry['attempt'], entry['success'])
+        if entry['final']:
+            run.restored += 1
+            if entry['success']:
+                run.successful += 1
+            else:
+                run.failed += 1
+    run.prior_attempts = dict(checkpoint['prior_attempts'])
@@ -3,7 +3,14 @@ import random
 import csv
 import json
 import os
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from step_metrics import LatencyHistogram
+from credential_store import open_credential_store
 
 def load_config():
     config = {}
@@ -37,6 +44,49 @@ def generate_name():
     last = random.choice(last_names)
     return f"{first} {last}"
 
+class TokenBucket:
+    """Thread-safe token bucket limiting requests to `rate` per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available (no-op when rate <= 0)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_thread_local = threading.local()
+
+def get_session(pool_size):
+    """One pooled requests.Session per worker thread"""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _thread_local.session = session
+    return session
+
+def is_retryable(status_code):
+    """Retry timeouts/connection errors (reported as 0), throttling and 5xx responses"""
+    return status_code == 0 or status_code == 429 or status_code >= 500
+
 def create_student(api_url, student_data, session):
     try:
         response = session.post(api_url, json=student_data, timeout=30)
@@ -44,74 +94,137 @@ def create_student(api_url, student_data, session):
     except requests.exceptions.RequestException as e:
         return 0, str(e)
 
+def create_student_with_retry(api_url, student_data, pool_size, bucket, max_retries, backoff_base):
+    """Create one student, retrying transient failures with full-jitter exponential backoff
+    
+    Returns (status_code, response_text, latency_seconds_of_last_attempt, attempts).
+    """
+    session = get_session(pool_size)
+    attempt = 0
+    while True:
+        attempt += 1
+        bucket.acquire()
+        started = time.perf_counter()
+        status_code, response_text = create_student(api_url, student_data, session)
+        latency = time.perf_counter() - started
+        if not is_retryable(status_code) or attempt > max_retries:
+            return status_code, response_text, latency, attempt
+        time.sleep(random.uniform(0, backoff_base * (2 ** (attempt - 1))))
+
 def main():
+    parser = argparse.ArgumentParser(description='AI Tutor bulk student provisioning')
+    parser.add_argument('--students', type=int, help='Number of students to create (overrides TOTAL_STUDENTS)')
+    parser.add_argument('--concurrency', type=int, help='Parallel create-student requests (overrides PROVISION_CONCURRENCY)')
+    parser.add_argument('--rate', type=float, help='Max requests per second, 0 for unlimited (overrides PROVISION_RATE_LIMIT)')
+    args = parser.parse_args()
+    
     # Load configuration
     config = load_config()
     
     api_url = config['API_BASE_URL'] + config['API_ENDPOINT']
-    total_students = int(config['TOTAL_STUDENTS'])
+    total_students = args.students or int(config['TOTAL_STUDENTS'])
+    concurrency = max(1, args.concurrency or int(config.get('PROVISION_CONCURRENCY', 1)))
+    rate_limit = args.rate if args.rate is not None else float(config.get('PROVISION_RATE_LIMIT', 0))
+    max_retries = int(config.get('PROVISION_MAX_RETRIES', 3))
+    backoff_base = float(config.get('PROVISION_BACKOFF_BASE', 0.5))
     
     print(f"Creating {total_students} students...")
     print(f"API URL: {api_url}")
-    
-
+    print(f"Concurrency: {concurrency}, rate limit: {f'{rate_limit}/s' if rate_limit > 0 else 'unlimited'}, retries: {max_retries}")
     
     # Files
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     os.makedirs("logs", exist_ok=True)
-    log_file = f"logs/students_{timestamp}.log"
+    log_file = f"logs/students_{timestamp}.jsonl"
     credentials_file = "student_credentials.csv"
     
     success = 0
     failed = 0
+    retried = 0
+    latency = LatencyHistogram()
+    bucket = TokenBucket(rate_limit)
     
-    # Create credentials file with just email and password
-    with open(credentials_file, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['email', 'password'])
-    
-    # Create session for connection reuse
-    session = requests.Session()
-    session.headers.update({'Content-Type': 'application/json'})
-    
-    # Create students
+    # Build all payloads up front, making sure emails are unique within the batch and the existing CSV
+    students = []
+    used_emails = set()
+    new_file = not os.path.exists(credentials_file) or os.path.getsize(credentials_file) == 0
+    if not new_file:
+        with open(credentials_file, 'r', newline='') as f:
+            used_emails.update(row['email'] for row in csv.DictReader(f))
     for i in range(1, total_students + 1):
         email = generate_email()
-        name = generate_name()
-        
-        print(f"[{i}/{total_students}] {name} ({email})")
-        
-        student_data = {
+        while email in used_emails:
+            email = generate_email()
+        used_emails.add(email)
+        students.append((i, {
             "email": email,
-            "full_name": name,
+            "full_name": generate_name(),
             "program_id": config['PROGRAM_ID'],
             "cohort_id": config['COHORT_ID'],
             "academic_year_id": config['ACADEMIC_YEAR_ID'],
             "password": config['DEFAULT_PASSWORD']
-        }
-        
-        status_code, response_text = create_student(api_url, student_data, session)
+        }))
+    
+    start_time = time.monotonic()
+    
+    # Results are written from this thread only, through one buffered handle per file.
+    # New accounts are appended, so the ones created earlier keep their CSV row (and session).
+    with open(credentials_file, 'a', newline='') as csvfile, open(log_file, 'w') as logfile, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="provision") as executor:
+        writer = csv.writer(csvfile)
+        if new_file:
+            writer.writerow(['email', 'password'])
         
-        # Log to file
-        with open(log_file, 'a') as f:
-            f.write(f"[{i}] {datetime.now()} - {email} - {name} - HTTP:{status_code}\n")
-            f.write(f"[{i}] Response: {response_text}\n")
+        futures = {
+            executor.submit(create_student_with_retry, api_url, student_data, concurrency,
+                            bucket, max_retries, backoff_base): (i, student_data)
+            for i, student_data in students
+        }
         
-        if 200 <= status_code < 300:
-            print("  Created successfully")
-            success += 1
+        for done, future in enumerate(as_completed(futures), 1):
+            i, student_data = futures[future]
+            status_code, response_text, request_latency, attempts = future.result()
+            email = student_data['email']
+            
+            logfile.write(json.dumps({
+                'index': i,
+                'timestamp': datetime.now().isoformat(),
+                'email': email,
+                'full_name': student_data['full_name'],
+                'status': status_code,
+                'attempts': attempts,
+                'latency_ms': round(request_latency * 1000, 1),
+                'response': response_text,
+            }) + "\n")
             
-            # Save credentials to file
-            with open(credentials_file, 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
+            latency.record(request_latency)
+            if attempts > 1:
+                retried += 1
+            
+            if 200 <= status_code < 300:
+                success += 1
                 writer.writerow([email, config['DEFAULT_PASSWORD']])
-        else:
-            print(f"  Failed (HTTP {status_code})")
-            failed += 1
+                print(f"[{done}/{total_students}] {student_data['full_name']} ({email}) - created")
+            else:
+                failed += 1
+                print(f"[{done}/{total_students}] {student_data['full_name']} ({email}) - failed (HTTP {status_code}, {attempts} attempts)")
+    
+    elapsed = time.monotonic() - start_time
+    stats = latency.summary()
     
-    print(f"Completed: {success} created, {failed} failed")
+    print(f"Completed: {success} created, {failed} failed, {retried} needed retries")
+    print(f"Duration: {elapsed:.1f}s, throughput: {success / elapsed if elapsed > 0 else 0:.2f} students/s")
+    if stats['count']:
+        print(f"Create-student latency (ms): p50={stats['p50_ms']:.0f} p90={stats['p90_ms']:.0f} "
+              f"p95={stats['p95_ms']:.0f} p99={stats['p99_ms']:.0f} max={stats['max_ms']:.0f}")
     print(f"Log: {log_file}")
     print(f"Student credentials saved: {credentials_file}")
+    
+    # The CSV accumulates across provisioning runs, so importing it retires nothing
+    store = open_credential_store(config)
+    if store:
+        print(f"Credential store: {store.count()} accounts in {store.path}")
+        store.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from step_metrics import FAILURE_WRAP_SECONDS, parse_failure
+
+CREDENTIALS_CSV = "student_credentials.csv"
+CREDENTIALS_DB = "student_credentials.db"
+IMPORT_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    position INTEGER PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    onboarded INTEGER NOT NULL DEFAULT 0,
+    runs INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    last_session INTEGER,
+    last_used REAL,
+    last_failure TEXT,
+    last_failure_detail TEXT,
+    last_failure_at REAL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    retired INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS accounts_lease ON accounts (lease_expires);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS auth_sessions (
+    email TEXT PRIMARY KEY,
+    origin TEXT NOT NULL,
+    cookies TEXT NOT NULL,
+    local_storage TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stored_at REAL NOT NULL
+);
+"""
+
+def lease_owner():
+    """Identifies this process as a lease holder"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class CredentialStore:
+    """SQLite-backed student accounts with atomic leases and per-account run state
+
+    `position` is the account's 1-based row in the CSV it was last imported from; session
+    batching is derived from it, so it stays the same across reruns, shards and nodes.
+    Accounts dropped from the CSV are retired: they keep their history but are no longer
+    counted or leased. The database is safe to share between processes on one host
+    (WAL mode, immediate transactions).
+    """
+
+    def __init__(self, path=CREDENTIALS_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(accounts)")}
+            if 'retired' not in columns:
+                self._conn.execute("ALTER TABLE accounts ADD COLUMN retired INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def import_csv(self, csv_path):
+        """Stream email/password rows from a CSV into the store, re-numbering positions in file order
+
+        The rows are staged in a temporary table first, then one transaction moves every
+        account to its row in this CSV and retires the accounts the CSV no longer lists.
+        """
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS csv_import "
+                               "(seq INTEGER PRIMARY KEY, email TEXT NOT NULL UNIQUE, password TEXT NOT NULL)")
+            self._conn.execute("DELETE FROM temp.csv_import")
+        imported = 0
+        batch = []
+        with open(csv_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                batch.append((row['email'], row['password']))
+                if len(batch) >= IMPORT_BATCH:
+                    imported += self._stage(batch)
+                    batch = []
+        if batch:
+            imported += self._stage(batch)
+        with self._transaction() as conn:
+            staged = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM temp.csv_import").fetchone()[0]
+            highest = conn.execute("SELECT COALESCE(MAX(position), 0) FROM accounts").fetchone()[0]
+            # Shift every account clear of 1..staged so the re-numbering never hits a taken position
+            conn.execute("UPDATE accounts SET position = position + ?", (highest + staged,))
+            conn.execute("UPDATE accounts SET position = (SELECT seq FROM temp.csv_import AS s WHERE s.email = accounts.email), "
+                         "password = (SELECT password FROM temp.csv_import AS s WHERE s.email = accounts.email), retired = 0 "
+                         "WHERE email IN (SELECT email FROM temp.csv_import)")
+            conn.execute("INSERT INTO accounts (position, email, password) SELECT seq, email, password "
+                         "FROM temp.csv_import WHERE email NOT IN (SELECT email FROM accounts)")
+            conn.execute("UPDATE accounts SET position = position - ?, retired = 1 WHERE position > ?", (highest, staged))
+            conn.execute("DELETE FROM temp.csv_import")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (f"imported:{os.path.abspath(csv_path)}", str(os.path.getmtime(csv_path))))
+        return imported
+
+    def _stage(self, rows):
+        with self._lock:
+            self._conn.executemany("INSERT INTO temp.csv_import (email, password) VALUES (?, ?) "
+                                   "ON CONFLICT (email) DO UPDATE SET password = excluded.password", rows)
+        return len(rows)
+
+    def sync_csv(self, csv_path):
+        """Import the CSV if it changed since it was last imported; returns rows imported (0 if up to date)"""
+        if not os.path.exists(csv_path):
+            return 0
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (f"imported:{os.path.abspath(csv_path)}",))
+        if rows and float(rows[0]['value']) >= os.path.getmtime(csv_path):
+            return 0
+        return self.import_csv(csv_path)
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM accounts WHERE NOT retired")[0][0]
+
+    def available(self):
+        """Accounts not currently leased by anyone"""
+        return self._query("SELECT COUNT(*) FROM accounts WHERE NOT retired AND (lease_expires IS NULL OR lease_expires < ?)",
+                           (time.time(),))[0][0]
+
+    def position_of(self, email):
+        rows = self._query("SELECT position FROM accounts WHERE email = ?", (email,))
+        return rows[0]['position'] if rows else None
+
+    def get(self, email):
+        rows = self._query("SELECT * FROM accounts WHERE email = ?", (email,))
+        return dict(rows[0]) if rows else None
+
+    def iter_accounts(self, limit=None, chunk=IMPORT_BATCH):
+        """Yield {'email', 'password', 'index'} in position order without loading the whole table"""
+        last, remaining = 0, limit
+        while remaining is None or remaining > 0:
+            size = chunk if remaining is None else min(chunk, remaining)
+            rows = self._query("SELECT position, email, password, onboarded FROM accounts WHERE position > ? "
+                               "AND NOT retired ORDER BY position LIMIT ?", (last, size))
+            if not rows:
+                return
+            for row in rows:
+                yield _student(row)
+            last = rows[-1]['position']
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def random_account(self):
+        rows = self._query("SELECT position, email, password, onboarded FROM accounts WHERE NOT retired ORDER BY RANDOM() LIMIT 1")
+        return _student(rows[0]) if rows else None
+
+    def lease(self, count, owner, ttl):
+        """Atomically take up to `count` unleased (or expired) accounts for `ttl` seconds, in position order"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT position, email, password, onboarded FROM accounts "
+                                "WHERE NOT retired AND (lease_expires IS NULL OR lease_expires < ?) "
+                                "ORDER BY position LIMIT ?",
+                                (now, count)).fetchall()
+            conn.executemany("UPDATE accounts SET lease_owner = ?, lease_expires = ? WHERE position = ?",
+                             [(owner, now + ttl, row['position']) for row in rows])
+        return [_student(row) for row in rows]
+
+    def lease_emails(self, emails, owner, ttl, takeover=()):
+        """Lease specific accounts, e.g. a resumed run's unfinished students; leases held by `takeover` owners are taken over"""
+        now = time.time()
+        leased = []
+        with self._transaction() as conn:
+            for email in emails:
+                row = conn.execute("SELECT position, email, password, onboarded, lease_owner, lease_expires FROM accounts "
+                                   "WHERE email = ? AND NOT retired", (email,)).fetchone()
+                if row is None:
+                    continue
+                held = row['lease_expires'] is not None and row['lease_expires'] >= now
+                if held and row['lease_owner'] != owner and row['lease_owner'] not in takeover:
+                    continue
+                conn.execute("UPDATE accounts SET lease_owner = ?, lease_expires = ? WHERE position = ?",
+                             (owner, now + ttl, row['position']))
+                leased.append(_student(row))
+        return leased
+
+    def release(self, owner, emails=None):
+        """Return leased accounts (all of this owner's when emails is None)"""
+        with self._transaction() as conn:
+            if emails is None:
+                conn.execute("UPDATE accounts SET lease_owner = NULL, lease_expires = NULL WHERE lease_owner = ?", (owner,))
+            else:
+                conn.executemany("UPDATE accounts SET lease_owner = NULL, lease_expires = NULL "
+                                 "WHERE lease_owner = ? AND email = ?", [(owner, email) for email in emails])
+
+    def record_result(self, email, success, session=None):
+        with self._transaction() as conn:
+            conn.execute("UPDATE accounts SET runs = runs + 1, successes = successes + ?, last_used = ?, "
+                         "last_session = COALESCE(?, last_session) WHERE email = ?",
+                         (1 if success else 0, time.time(), session, email))
+
+    def record_failure(self, email, category, detail='', at=None):
+        """Remember why the account last failed; re-raised wrapper records right after the first are ignored"""
+        at = at or time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE accounts SET last_failure = ?, last_failure_detail = ?, last_failure_at = ? "
+                         "WHERE email = ? AND (last_failure_at IS NULL OR last_failure_at < ?)",
+                         (category, detail[:500], at, email, at - FAILURE_WRAP_SECONDS))
+
+    def mark_onboarded(self, email):
+        with self._transaction() as conn:
+            conn.execute("UPDATE accounts SET onboarded = 1 WHERE email = ?", (email,))
+
+    def get_auth_session(self, email):
+        """Cached login state for an account: {'origin', 'cookies', 'local_storage', 'expires_at'} or None"""
+        rows = self._query("SELECT origin, cookies, local_storage, expires_at FROM auth_sessions WHERE email = ?", (email,))
+        if not rows:
+            return None
+        return {'origin': rows[0]['origin'], 'cookies': json.loads(rows[0]['cookies']),
+                'local_storage': json.loads(rows[0]['local_storage']), 'expires_at': rows[0]['expires_at']}
+
+    def put_auth_session(self, email, origin, cookies, local_storage, expires_at):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO auth_sessions (email, origin, cookies, local_storage, expires_at, stored_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (email, origin, json.dumps(cookies), json.dumps(local_storage), expires_at, time.time()))
+
+    def invalidate_auth_session(self, email):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM auth_sessions WHERE email = ?", (email,))
+
+    def apply_updates(self, updates):
+        """Replay an AccountUpdates.to_dict() payload from a remote worker"""
+        for email, state in updates.items():
+            for success, session in state.get('results', []):
+                self.record_result(email, success, session)
+            if state.get('failure'):
+                self.record_failure(email, *state['failure'])
+            if state.get('onboarded'):
+                self.mark_onboarded(email)
+
+def _student(row):
+    return {'email': row['email'], 'password': row['password'], 'index': row['position'], 'onboarded': bool(row['onboarded'])}
+
+class AccountUpdates:
+    """In-memory stand-in for CredentialStore on distributed workers; the coordinator applies it to the real store"""
+
+    def __init__(self):
+        self.accounts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, email):
+        return self.accounts.setdefault(email, {'results': [], 'failure': None, 'onboarded': False})
+
+    def position_of(self, email):
+        return None
+
+    def record_result(self, email, success, session=None):
+        with self._lock:
+            self._state(email)['results'].append((success, session))
+
+    def record_failure(self, email, category, detail='', at=None):
+        at = at or time.time()
+        with self._lock:
+            state = self._state(email)
+            if state['failure'] is None or state['failure'][2] < at - FAILURE_WRAP_SECONDS:
+                state['failure'] = (category, detail[:500], at)
+
+    def mark_onboarded(self, email):
+        with self._lock:
+            self._state(email)['onboarded'] = True
+
+    def to_dict(self):
+        with self._lock:
+            return {email: dict(state) for email, state in self.accounts.items()}
+
+class QueuedAccounts:
+    """Front for a CredentialStore whose writes are applied in order by one background thread
+
+    For callers that must not wait on SQLite commits, such as the protocol engine's
+    event loop. Reads go straight to the store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._apply, name="account-writer", daemon=True)
+        self._thread.start()
+
+    def _apply(self):
+        while True:
+            update = self._queue.get()
+            if update is None:
+                return
+            method, args = update
+            try:
+                method(*args)
+            except sqlite3.Error as e:
+                logging.warning(f"Account update {method.__name__}{args[:1]} failed: {e}")
+
+    def position_of(self, email):
+        return self.store.position_of(email)
+
+    def record_result(self, email, success, session=None):
+        self._queue.put((self.store.record_result, (email, success, session)))
+
+    def record_failure(self, email, category, detail='', at=None):
+        self._queue.put((self.store.record_failure, (email, category, detail, at or time.time())))
+
+    def mark_onboarded(self, email):
+        self._queue.put((self.store.mark_onboarded, (email,)))
+
+    def close(self):
+        """Apply every queued write, then stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+class AccountFailureHandler(logging.Handler):
+    """Stores each FAILURE_STEP_* record as the account's last failure"""
+
+    def __init__(self, accounts):
+        super().__init__(level=logging.ERROR)
+        self.accounts = accounts
+
+    def emit(self, record):
+        failure = parse_failure(record.getMessage())
+        if failure:
+            category, email, detail = failure
+            self.accounts.record_failure(email, category, detail, record.created)
+
+def open_credential_store(config=None):
+    """Open the credential store, importing the provisioning CSV first if it is new or changed"""
+    config = config or {}
+    db_path = config.get('CREDENTIALS_DB', CREDENTIALS_DB)
+    csv_path = config.get('CREDENTIALS_FILE', CREDENTIALS_CSV)
+    if not os.path.exists(db_path) and not os.path.exists(csv_path):
+        print(f"Credentials file not found: {csv_path}")
+        print("Please run create_students.py first to create students")
+        return None
+    store = CredentialStore(db_path)
+    imported = store.sync_csv(csv_path)
+    if imported:
+        print(f"Imported {imported} accounts from {csv_path} into {db_path}")
+    return store
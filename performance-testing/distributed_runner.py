@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from chat_metrics import ChatMetrics
+from credential_store import AccountUpdates, lease_owner, open_credential_store
+from locators import LocatorRegistry
+from network_metrics import NetworkMetrics
+from scenarios import compile_scenarios, load_scenarios
+from load_profiles import build_arrival_schedule, describe_schedule
+from step_metrics import StepMetrics, parse_failure
+from student_ppt_viewer import (RunState, apply_config_overrides, attach_log_handler, execute_batch, flush_logs,
+                                load_config, log_print, log_run_summary, quiet_console, setup_logging)
+
+class FailureCollector(logging.Handler):
+    """Captures FAILURE_STEP_* log records so a worker can ship them to the coordinator"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.failures = []
+        self._records_lock = threading.Lock()
+
+    def emit(self, record):
+        failure = parse_failure(record.getMessage())
+        if failure:
+            category, email, detail = failure
+            with self._records_lock:
+                self.failures.append({'step': category, 'email': email, 'message': detail[:500], 'time': record.created})
+
+def shard_students(students, shard_count):
+    """Round-robin shards of leased students; each keeps its store position as 'index'"""
+    shards = [[] for _ in range(shard_count)]
+    for i, student in enumerate(students):
+        shards[i % shard_count].append(student)
+    return shards
+
+def shard_schedule(schedule, shard_count):
+    """Split a global arrival schedule the same way students are sharded, preserving the global rate"""
+    if schedule is None:
+        return [None] * shard_count
+    return [schedule[k::shard_count] for k in range(shard_count)]
+
+class Coordinator:
+    """Hands out shards, fixes a common start time and merges worker results"""
+
+    def __init__(self, shards, schedules, expected_workers, start_delay, overrides, scenarios=None):
+        self.shards = shards
+        self.schedules = schedules
+        self.expected_workers = expected_workers
+        self.start_delay = start_delay
+        self.overrides = overrides
+        self.scenarios = scenarios
+        self.workers = []
+        self.results = {}
+        self.start_at = None
+        self.all_results = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, name):
+        with self._lock:
+            if len(self.workers) >= self.expected_workers:
+                return None
+            worker_id = len(self.workers)
+            self.workers.append(name)
+            log_print(f"Worker {worker_id} registered: {name} ({len(self.workers)}/{self.expected_workers})")
+            if len(self.workers) == self.expected_workers:
+                # Everyone is in: fix one wall-clock start time for all shards
+                self.start_at = time.time() + self.start_delay
+                log_print(f"All workers registered - synchronized start at {datetime.fromtimestamp(self.start_at).strftime('%H:%M:%S')}")
+            return worker_id
+
+    def assignment(self, worker_id):
+        with self._lock:
+            if self.start_at is None:
+                return None
+            return {'worker_id': worker_id, 'start_at': self.start_at, 'students': self.shards[worker_id],
+                    'schedule': self.schedules[worker_id], 'overrides': self.overrides,
+                    'scenarios': self.scenarios.definition, 'scenario_source': self.scenarios.source}
+
+    def submit(self, worker_id, result):
+        with self._lock:
+            self.results[worker_id] = result
+            log_print(f"Results received from worker {worker_id} ({len(self.results)}/{self.expected_workers})")
+            if len(self.results) == self.expected_workers:
+                self.all_results.set()
+
+    def merged_run(self):
+        """Combine every worker's counters and metrics into one RunState for the summary"""
+        run = RunState(None)
+        run.chat_metrics = ChatMetrics()
+        run.locators = LocatorRegistry()
+        for result in self.results.values():
+            run.successful += result['successful']
+            run.failed += result['failed']
+            run.cancelled += result['cancelled']
+            run.step_metrics.merge(StepMetrics.from_dict(result['step_metrics']))
+            run.chat_metrics.merge(ChatMetrics.from_dict(result['chat_metrics']))
+            run.network_metrics.merge(NetworkMetrics.from_dict(result['network_metrics']))
+            run.locators.merge(LocatorRegistry.from_dict(result.get('locators') or {}))
+            for name, counts in result.get('scenarios', {}).items():
+                merged = run.scenario_results.setdefault(name, {'success': 0, 'failed': 0})
+                merged['success'] += counts['success']
+                merged['failed'] += counts['failed']
+        run.scenarios = self.scenarios
+        return run
+
+def make_handler(coordinator):
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload=None):
+            body = json.dumps(payload).encode() if payload is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        def do_POST(self):
+            if self.path == '/register':
+                worker_id = coordinator.register(self._body().get('name', self.client_address[0]))
+                self._reply(409 if worker_id is None else 200, {'worker_id': worker_id})
+            elif self.path.startswith('/results/'):
+                coordinator.submit(int(self.path.rsplit('/', 1)[1]), self._body())
+                self._reply(200, {})
+            else:
+                self._reply(404)
+
+        def do_GET(self):
+            if self.path.startswith('/assignment/'):
+                assignment = coordinator.assignment(int(self.path.rsplit('/', 1)[1]))
+                self._reply(204 if assignment is None else 200, assignment)
+            else:
+                self._reply(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CoordinatorHandler
+
+def run_coordinator(args):
+    config = apply_config_overrides(load_config(), args.set)
+    log_file = setup_logging("distributed_coordinator", config)
+    log_print("AI Tutor Student PPT Viewer - Distributed Coordinator")
+    store = open_credential_store(config)
+    available = store.available() if store else 0
+    if not available:
+        log_print("ERROR: No unleased student credentials found")
+        return 1
+
+    # Workers get the parsed scenario file with their assignment, so it only has to exist here
+    try:
+        scenarios = load_scenarios(config)
+    except ValueError as e:
+        log_print(f"ERROR: {e}")
+        return 1
+    log_print(f"Workload: {scenarios.describe()}")
+
+    total_students = min(args.students or int(config.get('TOTAL_STUDENTS', available)), available)
+    try:
+        schedule = build_arrival_schedule(config, total_students)
+    except ValueError as e:
+        log_print(f"ERROR: {e}")
+        return 1
+    if schedule is not None:
+        total_students = len(schedule)
+        log_print(f"Load profile: {config['LOAD_PROFILE']} - {describe_schedule(schedule)}")
+
+    # Lease centrally so no two workers (or other runs) log in as the same student;
+    # shards keep the store position so get_session_number batching stays global
+    execution_timeout = int(config.get('EXECUTION_TIMEOUT', 0))
+    owner = lease_owner()
+    lease_ttl = float(config.get('CREDENTIAL_LEASE_TTL', 0)) or (
+        execution_timeout + args.start_delay + args.report_grace + 600 if execution_timeout else 6 * 3600)
+    shards = shard_students(store.lease(total_students, owner, lease_ttl), args.workers)
+    coordinator = Coordinator(shards, shard_schedule(schedule, args.workers), args.workers,
+                              args.start_delay, args.set or [], scenarios)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(coordinator))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log_print(f"Coordinator listening on {args.host}:{server.server_address[1]} for {args.workers} workers, "
+              f"{total_students} students ({', '.join(str(len(s)) for s in shards)} per shard)")
+
+    local_workers = []
+    if args.spawn_local:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        for k in range(args.workers):
+            command = [sys.executable, os.path.abspath(__file__), 'worker', '--coordinator', url, '--name', f"local-{k}"]
+            local_workers.append(subprocess.Popen(command))
+
+    start_time = datetime.now()
+    try:
+        while coordinator.start_at is None:
+            time.sleep(0.5)
+        # Workers enforce EXECUTION_TIMEOUT themselves; allow them a grace period to report
+        wait_limit = coordinator.start_at - time.time() + execution_timeout + args.report_grace if execution_timeout else None
+        if not coordinator.all_results.wait(wait_limit):
+            missing = [k for k in range(args.workers) if k not in coordinator.results]
+            log_print(f"WARNING: No results from workers {missing} - summary covers {len(coordinator.results)} workers")
+        server.shutdown()
+        for process in local_workers:
+            process.wait()
+        for result in coordinator.results.values():
+            store.apply_updates(result.get('accounts', {}))
+    finally:
+        store.release(owner)
+
+    run = coordinator.merged_run()
+    total_concurrency = sum(result.get('concurrency', 0) for result in coordinator.results.values())
+    log_run_summary(run, config, total_students, total_concurrency, start_time, datetime.now(), log_file, schedule)
+
+    failures = [failure for result in coordinator.results.values() for failure in result['failures']]
+    by_step = {}
+    for failure in failures:
+        by_step[failure['step']] = by_step.get(failure['step'], 0) + 1
+    for step, count in sorted(by_step.items(), key=lambda item: -item[1]):
+        log_print(f"FAILURE_STEP_{step}: {count}")
+
+    os.makedirs(os.path.join("results", "summary"), exist_ok=True)
+    summary_file = os.path.join("results", "summary", f"distributed_{start_time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(summary_file, 'w') as f:
+        json.dump({
+            'total_students': total_students,
+            'successful': run.successful,
+            'failed': run.failed,
+            'cancelled': run.cancelled,
+            'workers': {coordinator.workers[k]: {key: result.get(key) for key in ('successful', 'failed', 'cancelled', 'duration', 'host', 'session_cache')}
+                        for k, result in coordinator.results.items()},
+            'scenarios': run.scenario_results,
+            'failures_by_step': by_step,
+            'failures': failures,
+            'step_latency': run.step_metrics.rows(),
+            'chat_latency': run.chat_metrics.rows(),
+            'network_latency': run.network_metrics.rows(),
+            'locators': run.locators.rows(),
+            'step_metrics': run.step_metrics.to_dict(),
+        }, f, indent=2)
+    log_print(f"Distributed summary: {summary_file}")
+    return 0
+
+def run_worker(args):
+    setup_logging(f"distributed_worker_{re.sub(r'[^A-Za-z0-9_.-]', '_', args.name)}")
+    collector = FailureCollector()
+    attach_log_handler(collector)
+    coordinator = args.coordinator.rstrip('/')
+
+    response = requests.post(f"{coordinator}/register", json={'name': args.name}, timeout=30)
+    response.raise_for_status()
+    worker_id = response.json()['worker_id']
+    log_print(f"Registered with {coordinator} as worker {worker_id}")
+
+    while True:
+        response = requests.get(f"{coordinator}/assignment/{worker_id}", timeout=30)
+        if response.status_code == 200:
+            assignment = response.json()
+            break
+        time.sleep(1)
+
+    config = apply_config_overrides(load_config(), assignment['overrides'])
+    students = assignment['students']
+    engine = config.get('ENGINE', 'browser')
+    concurrency_key = 'PROTOCOL_MAX_CONCURRENT' if engine == 'protocol' else 'MAX_CONCURRENT_STUDENTS'
+    max_workers = max(1, min(args.concurrency or int(config.get(concurrency_key, 1)), len(students) or 1))
+    execution_timeout = int(config.get('EXECUTION_TIMEOUT', 0))
+    log_print(f"Shard: {len(students)} students, concurrency {max_workers}, engine {engine}")
+    shard = {'worker_id': worker_id, 'start_at': assignment['start_at'], 'students': [student['email'] for student in students]}
+    logging.info(f"WORKER_ASSIGNMENT: {json.dumps(shard)}")
+    quiet_console(config, max_workers)
+
+    delay = assignment['start_at'] - time.time()
+    if delay > 0:
+        log_print(f"Waiting {delay:.1f}s for synchronized start")
+        time.sleep(delay)
+
+    # Account state changes go back to the coordinator's credential store
+    accounts = AccountUpdates()
+    scenarios = None
+    if assignment.get('scenarios'):
+        scenarios = compile_scenarios(assignment['scenarios'], config, assignment['scenario_source'])
+    started = time.monotonic()
+    if students:
+        run = execute_batch(config, accounts, students, max_workers, execution_timeout, assignment['schedule'],
+                            scenarios=scenarios)
+    else:
+        run = RunState(accounts)
+    flush_logs()
+    result = {
+        'concurrency': max_workers,
+        'successful': run.successful,
+        'failed': run.failed,
+        'cancelled': run.cancelled,
+        'duration': time.monotonic() - started,
+        'step_metrics': run.step_metrics.to_dict(),
+        'chat_metrics': run.chat_metrics.to_dict(),
+        'network_metrics': run.network_metrics.to_dict(),
+        'locators': run.locators.to_dict() if run.locators else {},
+        'scenarios': run.scenario_results,
+        'failures': collector.failures,
+        'accounts': accounts.to_dict(),
+        'host': run.host_monitor.summary() if run.host_monitor else None,
+        'session_cache': run.session_cache.summary() if run.session_cache else None,
+    }
+    requests.post(f"{coordinator}/results/{worker_id}", json=result, timeout=120).raise_for_status()
+    log_print(f"Results sent: {run.successful} succeeded, {run.failed} failed, {run.cancelled} cancelled")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='AI Tutor Student PPT Viewer - Distributed Load Generation')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = subparsers.add_parser('coordinator', help='Shard credentials, synchronize workers and merge results')
+    coordinator.add_argument('--workers', type=int, required=True, help='Number of worker nodes to wait for')
+    coordinator.add_argument('--students', type=int, help='Number of students across all workers (overrides config)')
+    coordinator.add_argument('--host', default='127.0.0.1', help='Interface to listen on (0.0.0.0 to accept remote workers)')
+    coordinator.add_argument('--port', type=int, default=8700, help='Port to listen on (0 = any free port)')
+    coordinator.add_argument('--start-delay', type=float, default=10, help='Seconds between the last registration and the synchronized start')
+    coordinator.add_argument('--report-grace', type=float, default=300, help='Seconds after EXECUTION_TIMEOUT to wait for worker results')
+    coordinator.add_argument('--spawn-local', action='store_true', help='Also launch --workers worker processes on this host')
+    coordinator.add_argument('--set', action='append', metavar='KEY=VALUE', help='Config override sent to every worker (repeatable)')
+
+    worker = subparsers.add_parser('worker', help='Run one shard for a coordinator')
+    worker.add_argument('--coordinator', required=True, help='Coordinator URL, e.g. http://10.0.0.5:8700')
+    worker.add_argument('--name', default=os.uname().nodename, help='Worker name shown in the summary')
+    worker.add_argument('--concurrency', type=int, help='Parallel sessions on this worker (overrides config)')
+
+    args = parser.parse_args()
+    return run_coordinator(args) if args.role == 'coordinator' else run_worker(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
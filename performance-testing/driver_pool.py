@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from step_metrics import LatencyHistogram
+
+def origin_of(url):
+    """scheme://host[:port] of a URL, as expected by CDP storage commands"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def reset_driver(driver, origins):
+    """Wipe all per-student state so a warm browser can be reused by the next student"""
+    # Close any extra tabs/windows the previous student opened
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get("about:blank")
+
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    for origin in origins:
+        # Covers local/session storage, IndexedDB, cache storage and service workers
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+def is_driver_healthy(driver):
+    """True if the browser still answers WebDriver commands"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+class DriverPool:
+    """Pool of pre-launched browsers that workers check out and return between students
+
+    `factory()` launches a driver (or returns None on failure), `destroy(driver)`
+    shuts one down and `reset(driver, origins)` clears it between students; the pool
+    itself knows nothing about Chrome options.
+    """
+
+    def __init__(self, factory, destroy, size, origins, max_reuse=0, reset=reset_driver):
+        self.factory = factory
+        self.destroy = destroy
+        self.reset = reset
+        self.size = size
+        self.origins = origins
+        self.max_reuse = max_reuse
+        self.wait_times = LatencyHistogram()
+        self.created = 0
+        self.replaced = 0
+        self.reused = 0
+        self._idle = queue.Queue()
+        self._uses = {}
+        self._live = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Launch every driver up front, in parallel; returns how many started"""
+        with self._lock:
+            missing = self.size - self._live
+            self._live += missing
+        if missing <= 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(missing, 8)) as executor:
+            drivers = list(executor.map(lambda _: self.factory(), range(missing)))
+        started = 0
+        for driver in drivers:
+            if driver is None:
+                with self._lock:
+                    self._live -= 1
+                continue
+            started += 1
+            with self._lock:
+                self.created += 1
+                self._uses[id(driver)] = 0
+            self._idle.put(driver)
+        return started
+
+    def acquire(self, timeout=None):
+        """Check out a healthy driver, launching one if the pool is below size; None on failure"""
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    driver = self._launch_if_room()
+                    if driver is None:
+                        if self._closed:
+                            return None
+                        waited = time.perf_counter() - started
+                        if timeout is not None and waited >= timeout:
+                            return None
+                        # Short waits so a slot freed by a discarded driver is noticed promptly
+                        poll = 1.0 if timeout is None else min(1.0, timeout - waited)
+                        try:
+                            driver = self._idle.get(timeout=poll)
+                        except queue.Empty:
+                            continue
+                if driver is False:
+                    # Pool capacity exists but the browser failed to launch
+                    return None
+                if is_driver_healthy(driver):
+                    return driver
+                self._discard(driver, replaced=True)
+        finally:
+            with self._lock:
+                self.wait_times.record(time.perf_counter() - started)
+
+    def _launch_if_room(self):
+        """Start a new driver when below size; None if full, False if launch failed"""
+        with self._lock:
+            if self._closed or self._live >= self.size:
+                return None
+            self._live += 1
+        driver = self.factory()
+        with self._lock:
+            if driver is None:
+                self._live -= 1
+                return False
+            self.created += 1
+            self._uses[id(driver)] = 0
+        return driver
+
+    def release(self, driver):
+        """Return a driver after a student; it is reset, or replaced if it crashed or is worn out"""
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            closed = self._closed
+        if closed or (self.max_reuse and uses >= self.max_reuse):
+            self._discard(driver)
+            return
+        try:
+            self.reset(driver, self.origins)
+        except Exception:
+            self._discard(driver, replaced=True)
+            return
+        with self._lock:
+            self.reused += 1
+        self._idle.put(driver)
+
+    def _discard(self, driver, replaced=False):
+        """Shut a driver down and free its slot; the next acquire launches a replacement"""
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._live -= 1
+            if replaced:
+                self.replaced += 1
+        self.destroy(driver)
+
+    def close(self):
+        """Shut down every idle driver; drivers still checked out are discarded on release"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def summary(self):
+        with self._lock:
+            result = {'size': self.size, 'created': self.created, 'replaced': self.replaced,
+                      'reused': self.reused}
+            result.update({f'wait_{k}': v for k, v in self.wait_times.summary().items()})
+            return result
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from locators import LOCATE_JS, LocatorRegistry
+
+# Injected into every new document via CDP: counts in-flight fetch/XHR requests
+# and remembers when network activity last changed.
+NETWORK_TRACKER_JS = """
+(function () {
+    if (window.__net) { return; }
+    var net = window.__net = {inflight: 0, lastActivity: performance.now()};
+    function bump(delta) { net.inflight += delta; net.lastActivity = performance.now(); }
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            bump(1);
+            return originalFetch.apply(this, arguments).finally(function () { bump(-1); });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        bump(1);
+        this.addEventListener('loadend', function () { bump(-1); });
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+# Installs a MutationObserver that stamps the exact (epoch ms) moment a locator's
+# condition first holds. Checks are coalesced to one per microtask burst.
+WATCH_CONDITION_JS = LOCATE_JS + """
+var name = arguments[0], candidates = arguments[1], mode = arguments[2];
+var waits = window.__waits = window.__waits || {};
+if (waits[name] && waits[name].observer) { waits[name].observer.disconnect(); }
+var w = waits[name] = {satisfiedAt: null, observer: null, index: -1, seen: -1, element: null};
+function check() {
+    var match = locate(candidates, mode);
+    w.seen = Math.max(w.seen, match[0]);
+    if (!match[1]) { return false; }
+    w.index = match[0];
+    w.element = match[1];
+    return true;
+}
+function satisfied() {
+    w.satisfiedAt = performance.timeOrigin + performance.now();
+    if (w.observer) { w.observer.disconnect(); }
+}
+if (check()) { satisfied(); return w.satisfiedAt; }
+var scheduled = false;
+w.observer = new MutationObserver(function () {
+    if (scheduled) { return; }
+    scheduled = true;
+    queueMicrotask(function () {
+        scheduled = false;
+        if (w.satisfiedAt === null && check()) { satisfied(); }
+    });
+});
+w.observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+return null;
+"""
+
+# undefined (-> None) means the document was replaced and the watcher must be reinstalled
+READ_CONDITION_JS = """
+var w = (window.__waits || {})[arguments[0]];
+return w ? (w.satisfiedAt === null ? -1 : w.satisfiedAt) : null;
+"""
+
+# [matched candidate, its element, highest candidate seen at all]
+READ_MATCH_JS = """
+var w = (window.__waits || {})[arguments[0]];
+return w ? [w.index, w.element, w.seen] : null;
+"""
+
+READ_NETWORK_JS = """
+var net = window.__net;
+if (!net) { return null; }
+return {inflight: net.inflight, lastActivity: performance.timeOrigin + net.lastActivity,
+        now: performance.timeOrigin + performance.now()};
+"""
+
+def enable_network_tracking(driver):
+    """Register the fetch/XHR tracker for every document this driver loads"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_JS})
+        return True
+    except Exception:
+        return False
+
+def poll_interval(config, step, default=None):
+    """Per-step polling interval: POLL_INTERVAL_<STEP> falling back to POLL_INTERVAL"""
+    value = config.get(f"POLL_INTERVAL_{step.upper()}", config.get('POLL_INTERVAL', default if default is not None else 0.25))
+    return float(value)
+
+class EventWait:
+    """Waits driven by in-page observers; records the browser-clock moment each condition became true
+
+    Python only polls a cheap flag, so the polling interval controls how fast the
+    harness reacts, not how accurately the event time is measured.
+    """
+
+    def __init__(self, driver, config, stop_event=None, locators=None):
+        self.driver = driver
+        self.config = config
+        self.stop_event = stop_event
+        self.locators = locators if locators is not None else LocatorRegistry(config)
+        self.events = {}
+
+    def _sleep(self, seconds):
+        if self.stop_event is not None:
+            if self.stop_event.wait(seconds):
+                raise TimeoutException("Run cancelled while waiting")
+        else:
+            time.sleep(seconds)
+
+    def until(self, step, target, mode='visible', timeout=30, poll=None, **params):
+        """Wait for a Locator (or a raw XPath) to be present/visible/clickable; returns (element, epoch seconds it became true)
+
+        Every candidate of a locator is watched; the one that matched goes into its registry's stats.
+        """
+        poll = poll if poll is not None else poll_interval(self.config, step)
+        locator = None if isinstance(target, str) else target
+        candidates = locator.resolve(params) if locator else [['xpath', target]]
+        started = time.monotonic()
+        deadline = started + timeout
+        installed = False
+        while True:
+            satisfied_at = self.driver.execute_script(READ_CONDITION_JS, step) if installed else None
+            if satisfied_at is None:
+                # First pass, or the page navigated and dropped the watcher
+                try:
+                    satisfied_at = self.driver.execute_script(WATCH_CONDITION_JS, step, candidates, mode)
+                except JavascriptException:
+                    satisfied_at = None
+                installed = True
+                satisfied_at = satisfied_at if satisfied_at is not None else -1
+            if satisfied_at != -1:
+                index, element, _ = self.driver.execute_script(READ_MATCH_JS, step) or (-1, None, -1)
+                if element is not None:
+                    ready_at = satisfied_at / 1000.0
+                    self.events[step] = ready_at
+                    if locator:
+                        locator.record_match(index, time.monotonic() - started)
+                    return element, ready_at
+                # Matched just before the document was replaced: watch the new one
+                installed = False
+                continue
+            if time.monotonic() >= deadline:
+                if locator:
+                    seen = (self.driver.execute_script(READ_MATCH_JS, step) or (-1, None, -1))[2]
+                    locator.record_timeout(seen, time.monotonic() - started)
+                raise TimeoutException(f"{step}: {mode} condition not met within {timeout}s for {target}")
+            self._sleep(min(poll, max(0.0, deadline - time.monotonic())))
+
+    def element(self, name, mode='clickable', timeout=30, poll=None, **params):
+        """Poll a named locator's candidate chain until one yields an element in `mode`; returns the element"""
+        poll = poll if poll is not None else poll_interval(self.config, 'element', 0.5)
+        return self.locators[name].wait(self.driver, mode, timeout, poll, self._sleep, **params)
+
+    def network_idle(self, step, idle=None, timeout=30, poll=None):
+        """Wait until no fetch/XHR is in flight for `idle` seconds; returns epoch seconds idle began
+
+        Falls back to document.readyState when the tracker is not installed. Returns
+        None if the page never went idle within `timeout` (callers decide whether that matters).
+        """
+        idle = idle if idle is not None else float(self.config.get('NETWORK_IDLE_TIME', 0.5))
+        poll = poll if poll is not None else poll_interval(self.config, step)
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.driver.execute_script(READ_NETWORK_JS)
+            if state is None:
+                if self.driver.execute_script("return document.readyState") == "complete":
+                    ready_at = time.time()
+                    self.events[step] = ready_at
+                    return ready_at
+            elif state['inflight'] <= 0 and (state['now'] - state['lastActivity']) / 1000.0 >= idle:
+                ready_at = state['lastActivity'] / 1000.0
+                self.events[step] = ready_at
+                return ready_at
+            if time.monotonic() >= deadline:
+                return None
+            self._sleep(min(poll, max(0.0, deadline - time.monotonic())))
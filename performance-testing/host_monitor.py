@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import csv
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import psutil
+
+class HostMonitor:
+    """Samples load-generator CPU, memory and browser RSS; throttles admission while the host is saturated
+
+    The admission limit starts at the configured concurrency. Each saturated sample
+    cuts it to HOST_BACKOFF_FACTOR x the sessions currently active; each sample with
+    clear headroom raises it by one, back up to the configured concurrency.
+    """
+
+    CPU_SMOOTHING = 3
+
+    def __init__(self, config, active_sessions, max_concurrency, csv_path=None):
+        self.interval = float(config.get('HOST_SAMPLE_INTERVAL', 2))
+        self.cpu_limit = float(config.get('HOST_CPU_LIMIT', 85))
+        self.memory_limit = float(config.get('HOST_MEMORY_LIMIT', 85))
+        self.backoff = float(config.get('HOST_BACKOFF_FACTOR', 0.8))
+        self.min_concurrency = int(config.get('HOST_MIN_CONCURRENCY', 1))
+        self.adaptive = str(config.get('HOST_ADAPTIVE_CONCURRENCY', 'true')).lower() == 'true'
+        self.active_sessions = active_sessions
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.csv_path = csv_path
+        self.cores = psutil.cpu_count() or 1
+        self.saturated = False
+        self.periods = []
+        self.samples = 0
+        self.saturated_samples = 0
+        self.peak_cpu = 0.0
+        self.peak_memory = 0.0
+        self.max_active_unsaturated = 0
+        self.min_limit = max_concurrency
+        self._cpu_window = deque(maxlen=self.CPU_SMOOTHING)
+        self._load_cores = 0.0
+        self._load_rss = 0
+        self._load_pss = 0
+        self._load_active = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+        # Slots granted by try_admit that session_started has not counted as active yet
+        self._admission_lock = threading.Lock()
+        self._reserved = 0
+
+    def start(self):
+        # Idle baseline so per-student cost excludes whatever else the host is running
+        self.baseline_cpu = psutil.cpu_percent(interval=0.5)
+        memory = psutil.virtual_memory()
+        self.baseline_memory = memory.total - memory.available
+        self.total_memory = memory.total
+        self.baseline_rss = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._run, name="host-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self.saturated:
+            self._end_period(time.time())
+
+    def _browser_memory(self):
+        """(RSS, PSS) of every process this harness started (chromedriver and its Chrome trees)
+
+        RSS counts pages shared between Chrome processes once per process; PSS splits them,
+        so it compares fairly between a Chrome per student and contexts in a shared Chrome.
+        """
+        rss = pss = 0
+        for child in self._process.children(recursive=True):
+            try:
+                info = child.memory_full_info()
+            except psutil.AccessDenied:
+                try:
+                    info = child.memory_info()
+                except psutil.Error:
+                    continue
+            except psutil.Error:
+                continue
+            rss += info.rss
+            pss += getattr(info, 'pss', info.rss)
+        return rss, pss
+
+    def _run(self):
+        writer = None
+        csv_file = open(self.csv_path, 'w', newline='') if self.csv_path else None
+        try:
+            if csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(['timestamp', 'cpu_percent', 'memory_percent', 'browser_rss_mb', 'browser_pss_mb', 'harness_rss_mb',
+                                 'active_sessions', 'admission_limit', 'saturated'])
+            while not self._stop.wait(self.interval):
+                sample = self.sample()
+                if writer:
+                    writer.writerow([datetime.fromtimestamp(sample['time']).isoformat(timespec='seconds'),
+                                     f"{sample['cpu']:.1f}", f"{sample['memory']:.1f}",
+                                     f"{sample['browser_rss'] / 2**20:.0f}", f"{sample['browser_pss'] / 2**20:.0f}",
+                                     f"{sample['harness_rss'] / 2**20:.0f}",
+                                     sample['active'], self.limit, int(self.saturated)])
+                    csv_file.flush()
+        finally:
+            if csv_file:
+                csv_file.close()
+
+    def sample(self):
+        """Take one sample, update the saturation state and the admission limit"""
+        now = time.time()
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory().percent
+        browser_rss, browser_pss = self._browser_memory()
+        harness_rss = self._process.memory_info().rss
+        active = self.active_sessions()
+        self._cpu_window.append(cpu)
+        smoothed_cpu = sum(self._cpu_window) / len(self._cpu_window)
+        saturated = smoothed_cpu >= self.cpu_limit or memory >= self.memory_limit
+
+        self.samples += 1
+        self.peak_cpu = max(self.peak_cpu, cpu)
+        self.peak_memory = max(self.peak_memory, memory)
+        if saturated:
+            self.saturated_samples += 1
+            self.limit = max(self.min_concurrency, min(self.limit, int(active * self.backoff)))
+            self.min_limit = min(self.min_limit, self.limit)
+            if not self.saturated:
+                self.periods.append({'start': now, 'end': None, 'peak_cpu': cpu, 'peak_memory': memory, 'min_limit': self.limit})
+                logging.warning(f"HOST_SATURATION_START: cpu={smoothed_cpu:.0f}%, memory={memory:.0f}%, active={active}, admission_limit={self.limit}")
+            period = self.periods[-1]
+            period['peak_cpu'] = max(period['peak_cpu'], cpu)
+            period['peak_memory'] = max(period['peak_memory'], memory)
+            period['min_limit'] = min(period['min_limit'], self.limit)
+        else:
+            if self.saturated:
+                self._end_period(now)
+            if smoothed_cpu < self.cpu_limit - 10 and memory < self.memory_limit - 5:
+                self.limit = min(self.max_concurrency, self.limit + 1)
+            if active:
+                # Per-student cost, only from samples where the host was not the bottleneck
+                self.max_active_unsaturated = max(self.max_active_unsaturated, active)
+                self._load_cores += max(0.0, cpu - self.baseline_cpu) / 100.0 * self.cores
+                self._load_rss += browser_rss or max(0, harness_rss - self.baseline_rss)
+                self._load_pss += browser_pss or max(0, harness_rss - self.baseline_rss)
+                self._load_active += active
+        self.saturated = saturated
+        return {'time': now, 'cpu': cpu, 'memory': memory, 'browser_rss': browser_rss,
+                'browser_pss': browser_pss, 'harness_rss': harness_rss, 'active': active}
+
+    def _end_period(self, now):
+        period = self.periods[-1]
+        period['end'] = now
+        start, end = datetime.fromtimestamp(period['start']), datetime.fromtimestamp(now)
+        logging.warning(f"HOST_SATURATION: start={start.strftime('%Y-%m-%dT%H:%M:%S')}, end={end.strftime('%Y-%m-%dT%H:%M:%S')}, "
+                        f"duration={now - period['start']:.0f}s, peak_cpu={period['peak_cpu']:.0f}%, "
+                        f"peak_memory={period['peak_memory']:.0f}%, min_limit={period['min_limit']}")
+
+    def try_admit(self):
+        """Reserve a slot if a new session fits under the admission limit
+
+        The check and the reservation happen under one lock, so concurrent workers
+        cannot all see the same free slot. The reservation is handed back by
+        admitted() once the session is counted in active_sessions.
+        """
+        with self._admission_lock:
+            if self.adaptive and self.active_sessions() + self._reserved >= self.limit:
+                return False
+            self._reserved += 1
+            return True
+
+    def admitted(self):
+        with self._admission_lock:
+            self._reserved = max(0, self._reserved - 1)
+
+    def wait_for_admission(self, stop_event):
+        """Block until a slot is reserved under the admission limit; False if the run was stopped"""
+        while not stop_event.is_set():
+            if self.try_admit():
+                return True
+            if stop_event.wait(self.interval / 2):
+                return False
+        return False
+
+    def summary(self):
+        """Saturation totals and per-student cost figures for capacity planning"""
+        saturated_seconds = sum((p['end'] or time.time()) - p['start'] for p in self.periods)
+        result = {
+            'cores': self.cores,
+            'samples': self.samples,
+            'saturated_samples': self.saturated_samples,
+            'saturation_periods': len(self.periods),
+            'saturated_seconds': round(saturated_seconds, 1),
+            'peak_cpu_percent': self.peak_cpu,
+            'peak_memory_percent': self.peak_memory,
+            'min_admission_limit': self.min_limit,
+            'max_active_unsaturated': self.max_active_unsaturated,
+            'cpu_cores_per_student': None,
+            'rss_mb_per_student': None,
+            'pss_mb_per_student': None,
+            'students_per_core': None,
+            'max_students_by_memory': None,
+        }
+        if self._load_active:
+            cores_per_student = self._load_cores / self._load_active
+            rss_per_student = self._load_rss / self._load_active
+            result['cpu_cores_per_student'] = round(cores_per_student, 4)
+            result['rss_mb_per_student'] = round(rss_per_student / 2**20, 1)
+            result['pss_mb_per_student'] = round(self._load_pss / self._load_active / 2**20, 1)
+            if cores_per_student > 0:
+                usable_cpu = max(0.0, self.cpu_limit - self.baseline_cpu) / 100.0
+                result['students_per_core'] = round(usable_cpu / cores_per_student, 1)
+            if rss_per_student > 0:
+                usable_memory = self.total_memory * self.memory_limit / 100.0 - self.baseline_memory
+                result['max_students_by_memory'] = max(0, int(usable_memory / rss_per_student))
+        return result
+
+def host_monitor_enabled(config):
+    return str(config.get('HOST_MONITOR', 'true')).lower() == 'true'
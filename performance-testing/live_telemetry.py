@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import csv
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from step_metrics import FAILURE_CATEGORIES, FAILURE_WRAP_SECONDS, STUDENT_STEPS, LatencyHistogram, parse_failure
+
+class LiveTelemetry:
+    """Rolling, in-process view of a running batch: gauges, rates, error rates and step p95
+
+    Rates and percentiles cover the last `window` seconds. Step latencies are kept in
+    per-slot histograms so memory stays bounded however long the run is.
+    """
+
+    SLOT_SECONDS = 5
+
+    def __init__(self, active_sessions, window=60):
+        self.active_sessions = active_sessions
+        self.window = window
+        self.started_total = 0
+        self.completed_total = {'success': 0, 'failure': 0}
+        self.failures_total = {}
+        self._starts = deque()
+        self._completions = deque()
+        self._failures = deque()
+        self._step_slots = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        for events in (self._starts, self._completions, self._failures):
+            while events and events[0][0] < cutoff:
+                events.popleft()
+        oldest_slot = int(cutoff // self.SLOT_SECONDS)
+        for slot in [slot for slot in self._step_slots if slot < oldest_slot]:
+            del self._step_slots[slot]
+
+    def record_start(self):
+        now = time.time()
+        with self._lock:
+            self.started_total += 1
+            self._starts.append((now, None))
+            self._prune(now)
+
+    def record_completion(self, success):
+        now = time.time()
+        outcome = 'success' if success else 'failure'
+        with self._lock:
+            self.completed_total[outcome] += 1
+            self._completions.append((now, outcome))
+            self._prune(now)
+
+    def record_failure(self, category):
+        now = time.time()
+        with self._lock:
+            self.failures_total[category] = self.failures_total.get(category, 0) + 1
+            self._failures.append((now, category))
+            self._prune(now)
+
+    def record_step(self, step, seconds):
+        slot = int(time.time() // self.SLOT_SECONDS)
+        with self._lock:
+            self._step_slots.setdefault(slot, {}).setdefault(step, LatencyHistogram()).record(seconds)
+
+    def snapshot(self):
+        """Current gauges and rolling-window figures as a plain dict"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            per_minute = 60.0 / self.window
+            completions = len(self._completions)
+            failures_by_category = {}
+            for _, category in self._failures:
+                failures_by_category[category] = failures_by_category.get(category, 0) + 1
+            failed = sum(1 for _, outcome in self._completions if outcome == 'failure')
+            step_p95 = {}
+            for steps in self._step_slots.values():
+                for step, hist in steps.items():
+                    step_p95.setdefault(step, LatencyHistogram()).merge(hist)
+            return {
+                'timestamp': now,
+                'active_sessions': self.active_sessions(),
+                'started_total': self.started_total,
+                'completed_total': dict(self.completed_total),
+                'failures_total': dict(self.failures_total),
+                'starts_per_minute': len(self._starts) * per_minute,
+                'completions_per_minute': completions * per_minute,
+                'completions_in_window': completions,
+                'error_rate': failed / completions if completions else 0.0,
+                'error_rate_by_category': {category: count / completions if completions else 0.0
+                                           for category, count in failures_by_category.items()},
+                'step_p95_seconds': {step: hist.percentile(95) / 1000.0 for step, hist in step_p95.items()},
+                'step_count': {step: hist.count for step, hist in step_p95.items()},
+            }
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format for one telemetry snapshot"""
+    lines = [
+        "# HELP ai_tutor_active_sessions Student sessions currently running",
+        "# TYPE ai_tutor_active_sessions gauge",
+        f"ai_tutor_active_sessions {snapshot['active_sessions']}",
+        "# HELP ai_tutor_students_started_total Student sessions started",
+        "# TYPE ai_tutor_students_started_total counter",
+        f"ai_tutor_students_started_total {snapshot['started_total']}",
+        "# HELP ai_tutor_students_completed_total Student sessions finished, by outcome",
+        "# TYPE ai_tutor_students_completed_total counter",
+    ]
+    for outcome, count in snapshot['completed_total'].items():
+        lines.append(f'ai_tutor_students_completed_total{{outcome="{outcome}"}} {count}')
+    lines += ["# HELP ai_tutor_failures_total FAILURE_STEP_* records, by category",
+              "# TYPE ai_tutor_failures_total counter"]
+    for category, count in sorted(snapshot['failures_total'].items()):
+        lines.append(f'ai_tutor_failures_total{{category="{category}"}} {count}')
+    lines += [
+        "# HELP ai_tutor_starts_per_minute Session starts per minute over the rolling window",
+        "# TYPE ai_tutor_starts_per_minute gauge",
+        f"ai_tutor_starts_per_minute {snapshot['starts_per_minute']:.3f}",
+        "# HELP ai_tutor_completions_per_minute Session completions per minute over the rolling window",
+        "# TYPE ai_tutor_completions_per_minute gauge",
+        f"ai_tutor_completions_per_minute {snapshot['completions_per_minute']:.3f}",
+        "# HELP ai_tutor_error_rate Failed share of sessions completed in the rolling window",
+        "# TYPE ai_tutor_error_rate gauge",
+        f"ai_tutor_error_rate {snapshot['error_rate']:.4f}",
+    ]
+    lines += ["# HELP ai_tutor_error_rate_by_category Share of sessions completed in the rolling window that failed at each step",
+              "# TYPE ai_tutor_error_rate_by_category gauge"]
+    for category, rate in sorted(snapshot['error_rate_by_category'].items()):
+        lines.append(f'ai_tutor_error_rate_by_category{{category="{category}"}} {rate:.4f}')
+    lines += ["# HELP ai_tutor_step_latency_p95_seconds Rolling p95 latency per journey step",
+              "# TYPE ai_tutor_step_latency_p95_seconds gauge"]
+    for step, seconds in sorted(snapshot['step_p95_seconds'].items()):
+        lines.append(f'ai_tutor_step_latency_p95_seconds{{step="{step}"}} {seconds:.4f}')
+    return "\n".join(lines) + "\n"
+
+class TelemetryLogHandler(logging.Handler):
+    """Feeds FAILURE_STEP_* log records into the telemetry failure counters
+
+    A failure re-raised as a wrapper logs a second record for the same student right
+    after the first; like run_report, only the first of such a burst is counted.
+    """
+
+    def __init__(self, telemetry):
+        super().__init__(level=logging.ERROR)
+        self.telemetry = telemetry
+        self._last_failure = {}
+
+    def emit(self, record):
+        failure = parse_failure(record.getMessage())
+        if failure:
+            category, email, _ = failure
+            previous = self._last_failure.get(email)
+            self._last_failure[email] = record.created
+            if previous is not None and record.created - previous <= FAILURE_WRAP_SECONDS:
+                return
+            self.telemetry.record_failure(category)
+
+class TelemetryExporter:
+    """Serves /metrics over HTTP and appends a time-series CSV row every `interval` seconds"""
+
+    def __init__(self, telemetry, port=0, csv_path=None, interval=15, host='127.0.0.1'):
+        self.telemetry = telemetry
+        self.port = port
+        self.csv_path = csv_path
+        self.interval = interval
+        self.host = host
+        self.server = None
+        self._stop = threading.Event()
+        self._writer_thread = None
+
+    def start(self):
+        if self.port:
+            telemetry = self.telemetry
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = render_prometheus(telemetry.snapshot()).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+            threading.Thread(target=self.server.serve_forever, name="telemetry-http", daemon=True).start()
+        if self.csv_path and self.interval > 0:
+            self._writer_thread = threading.Thread(target=self._write_csv, name="telemetry-csv", daemon=True)
+            self._writer_thread.start()
+        return self
+
+    def _write_csv(self):
+        header = (['timestamp', 'active_sessions', 'starts_per_minute', 'completions_per_minute', 'error_rate']
+                  + [f"error_rate_{category}" for category in FAILURE_CATEGORIES]
+                  + [f"p95_{step}_s" for step in STUDENT_STEPS])
+        with open(self.csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            while True:
+                stopping = self._stop.wait(self.interval)
+                snap = self.telemetry.snapshot()
+                p95 = snap['step_p95_seconds']
+                writer.writerow(
+                    [datetime.fromtimestamp(snap['timestamp']).isoformat(timespec='seconds'), snap['active_sessions'],
+                     f"{snap['starts_per_minute']:.2f}", f"{snap['completions_per_minute']:.2f}", f"{snap['error_rate']:.4f}"]
+                    + [f"{snap['error_rate_by_category'].get(category, 0.0):.4f}" for category in FAILURE_CATEGORIES]
+                    + [f"{p95[step]:.3f}" if step in p95 else '' for step in STUDENT_STEPS])
+                f.flush()
+                if stopping:
+                    break
+
+    def stop(self):
+        self._stop.set()
+        if self._writer_thread:
+            self._writer_thread.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
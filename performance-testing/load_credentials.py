@@ -1,58 +1,68 @@
 #!/usr/bin/env python3
 
-import csv
-import os
-import random
+from credential_store import open_credential_store
 
 def load_student_credentials():
-    """Load all student credentials from the saved file"""
-    credentials_file = "student_credentials.csv"
-    
-    if not os.path.exists(credentials_file):
-        print(f"Credentials file not found: {credentials_file}")
-        print("Please run create_students.py first to create students")
+    """Load all student credentials from the credential store"""
+    store = open_credential_store()
+    if not store:
         return []
     
-    credentials = []
-    with open(credentials_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            credentials.append({
-                'email': row['email'],
-                'password': row['password']
-            })
-    
-    return credentials
+    try:
+        return list(store.iter_accounts())
+    finally:
+        store.close()
 
 def get_random_student():
     """Get a random student credential for testing"""
-    credentials = load_student_credentials()
-    if not credentials:
+    store = open_credential_store()
+    if not store:
         return None
-    return random.choice(credentials)
+    try:
+        return store.random_account()
+    finally:
+        store.close()
 
 def get_student_batch(count=10):
     """Get a batch of student credentials for testing"""
-    credentials = load_student_credentials()
-    if not credentials:
+    store = open_credential_store()
+    if not store:
         return []
     
     # Return up to 'count' credentials, or all if less available
-    return credentials[:min(count, len(credentials))]
+    try:
+        return list(store.iter_accounts(limit=count))
+    finally:
+        store.close()
+
+def get_student(email):
+    """Look up one student's credentials and state by email"""
+    store = open_credential_store()
+    if not store:
+        return None
+    try:
+        return store.get(email)
+    finally:
+        store.close()
 
 if __name__ == "__main__":
     # Example usage
     print("Loading student credentials...")
     
-    credentials = load_student_credentials()
-    print(f"Found {len(credentials)} student accounts")
-    
-    if credentials:
-        print("\nExample credentials:")
-        for i, cred in enumerate(credentials[:3], 1):
-            print(f"  {i}. Email: {cred['email']}, Password: {cred['password']}")
-        
-        if len(credentials) > 3:
-            print(f"  ... and {len(credentials) - 3} more")
+    store = open_credential_store()
+    if store:
+        total = store.count()
+        print(f"Found {total} student accounts ({store.available()} not leased)")
         
-        print(f"\nRandom student: {get_random_student()}") 
\ No newline at end of file
+        if total:
+            print("\nExample credentials:")
+            for i, cred in enumerate(store.iter_accounts(limit=3), 1):
+                state = store.get(cred['email'])
+                print(f"  {i}. Email: {cred['email']}, Password: {cred['password']}, "
+                      f"onboarded: {bool(state['onboarded'])}, last failure: {state['last_failure'] or '-'}")
+            
+            if total > 3:
+                print(f"  ... and {total - 3} more")
+            
+            print(f"\nRandom student: {store.random_account()}")
+        store.close()
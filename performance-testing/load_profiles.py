@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import math
+import threading
+import time
+
+LOAD_PROFILES = ('none', 'constant', 'ramp', 'step', 'spike')
+
+def _float(config, key, default):
+    return float(config.get(key, default))
+
+def constant_schedule(rate, duration, max_users):
+    """Arrivals at a fixed rate (users/second) held for the whole duration"""
+    if rate <= 0:
+        return []
+    count = min(max_users, int(rate * duration))
+    return [i / rate for i in range(count)]
+
+def ramp_schedule(start_rate, end_rate, duration, max_users):
+    """Arrivals whose rate changes linearly from start_rate to end_rate over duration"""
+    # Cumulative arrivals N(t) = r0*t + (r1-r0)*t^2/(2d); invert it for each arrival
+    slope = (end_rate - start_rate) / duration if duration > 0 else 0
+    total = start_rate * duration + slope * duration * duration / 2
+    offsets = []
+    for i in range(min(max_users, int(total))):
+        if abs(slope) < 1e-12:
+            t = i / start_rate
+        else:
+            t = (-start_rate + math.sqrt(start_rate * start_rate + 2 * slope * i)) / slope
+        offsets.append(t)
+    return offsets
+
+def step_schedule(step_users, step_interval, duration, max_users):
+    """Bursts of step_users started together every step_interval seconds"""
+    offsets = []
+    step = 0
+    while len(offsets) < max_users and step * step_interval < max(duration, step_interval):
+        offsets.extend([step * step_interval] * min(step_users, max_users - len(offsets)))
+        step += 1
+    return offsets
+
+def spike_schedule(base_rate, duration, spike_at, spike_users, max_users):
+    """A constant background rate with spike_users arriving at once at spike_at"""
+    offsets = constant_schedule(base_rate, duration, max_users)
+    offsets.extend([spike_at] * spike_users)
+    offsets.sort()
+    return offsets[:max_users]
+
+def build_arrival_schedule(config, max_users):
+    """Build the list of start offsets (seconds from run start) for the configured LOAD_PROFILE"""
+    profile = config.get('LOAD_PROFILE', 'none').strip().lower()
+    duration = _float(config, 'PROFILE_DURATION', 600)
+
+    if profile == 'none':
+        return None
+    if profile == 'constant':
+        return constant_schedule(_float(config, 'ARRIVAL_RATE', 1), duration, max_users)
+    if profile == 'ramp':
+        return ramp_schedule(_float(config, 'RAMP_START_RATE', 0.1), _float(config, 'RAMP_END_RATE', 1),
+                             duration, max_users)
+    if profile == 'step':
+        step_users, step_interval = int(config.get('STEP_USERS', 10)), _float(config, 'STEP_INTERVAL', 60)
+        if step_users < 1:
+            raise ValueError(f"STEP_USERS must be at least 1, got {step_users}")
+        if step_interval <= 0:
+            raise ValueError(f"STEP_INTERVAL must be greater than 0, got {step_interval:g}")
+        return step_schedule(step_users, step_interval, duration, max_users)
+    if profile == 'spike':
+        return spike_schedule(_float(config, 'ARRIVAL_RATE', 1), duration,
+                              _float(config, 'SPIKE_AT', duration / 2), int(config.get('SPIKE_USERS', 50)),
+                              max_users)
+    raise ValueError(f"Unknown LOAD_PROFILE '{profile}' (expected one of: {', '.join(LOAD_PROFILES)})")
+
+def describe_schedule(offsets):
+    """One-line description of a schedule's size, span and target rate"""
+    if not offsets:
+        return "0 arrivals"
+    span = offsets[-1] - offsets[0]
+    if span <= 0:
+        return f"{len(offsets)} arrival{'s' if len(offsets) != 1 else ''} all at once at {offsets[0]:.1f}s"
+    return f"{len(offsets)} arrivals over {span:.1f}s (target {(len(offsets) - 1) / span:.2f} users/s)"
+
+class ArrivalTracker:
+    """Tracks scheduled vs actual student start times to detect a lagging harness"""
+
+    def __init__(self, start_time, lag_tolerance):
+        self.start_time = start_time
+        self.lag_tolerance = lag_tolerance
+        self.scheduled = 0
+        self.started = 0
+        self.late = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.first_start = None
+        self.last_start = None
+        self.behind = False
+        self._lock = threading.Lock()
+
+    def record_scheduled(self):
+        with self._lock:
+            self.scheduled += 1
+
+    def record_start(self, scheduled_offset):
+        """Record one actual start; returns the lag if it newly fell behind schedule, else None"""
+        now = time.monotonic()
+        lag = max(0.0, now - (self.start_time + scheduled_offset))
+        with self._lock:
+            self.started += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            if self.first_start is None:
+                self.first_start = now
+            self.last_start = now
+            if lag > self.lag_tolerance:
+                self.late += 1
+                if not self.behind:
+                    self.behind = True
+                    return lag
+            else:
+                self.behind = False
+        return None
+
+    def achieved_rate(self):
+        """Actual arrivals per second between the first and last start"""
+        with self._lock:
+            if self.started < 2 or self.last_start == self.first_start:
+                return 0.0
+            return (self.started - 1) / (self.last_start - self.first_start)
+
+    def summary(self):
+        with self._lock:
+            avg_lag = self.total_lag / self.started if self.started else 0.0
+            return {
+                'scheduled': self.scheduled,
+                'started': self.started,
+                'late': self.late,
+                'avg_lag': avg_lag,
+                'max_lag': self.max_lag,
+            }
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+import logging
+import re
+import threading
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from step_metrics import LatencyHistogram
+
+# In-page lookup shared by the polling and observer-driven waits: the first candidate that
+# matches an element decides, so a fallback is never used while the preferred one matches
+LOCATE_JS = """
+function locate(candidates, mode) {
+    for (var i = 0; i < candidates.length; i++) {
+        var el = null;
+        try {
+            el = candidates[i][0] === 'css' ? document.querySelector(candidates[i][1])
+                : document.evaluate(candidates[i][1], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        } catch (e) { continue; }
+        if (!el) { continue; }
+        if (mode === 'present') { return [i, el]; }
+        var rect = el.getBoundingClientRect(), style = getComputedStyle(el);
+        var visible = (rect.width > 0 || rect.height > 0) && style.visibility !== 'hidden' && style.display !== 'none';
+        return [i, (mode === 'visible' ? visible : visible && !el.disabled) ? el : null];
+    }
+    return [-1, null];
+}
+"""
+
+# One poll: [candidate index (-1 = none matched), element if it satisfies the mode, in-page query ms]
+FIND_JS = LOCATE_JS + """
+var started = performance.now();
+var match = locate(arguments[0], arguments[1]);
+return [match[0], match[1], performance.now() - started];
+"""
+
+class Untranslatable(Exception):
+    pass
+
+class XPathToCss:
+    """Recursive-descent translation of the XPath subset the config uses into an equivalent CSS selector list
+
+    Handles //tag and /tag steps, a leading position ([n] -> :nth-of-type), @attr, @attr='v',
+    contains() and starts-with() on attributes, and/or, and a (...)[1] wrapper (lookups take
+    the first match anyway). Text matches, axes and positions after a filter have no CSS
+    equivalent and raise Untranslatable.
+    """
+
+    NAME = re.compile(r"\*|[A-Za-z_][\w-]*")
+    ATTRIBUTE = re.compile(r"[A-Za-z_][\w-]*")
+    LITERAL = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+    POSITION = re.compile(r"\d+|\{\w+\}")
+    FUNCTION = re.compile(r"(contains|starts-with)\s*\(")
+
+    def __init__(self, xpath):
+        self.text = xpath.strip()
+        self.pos = 0
+
+    def _skip(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def _take(self, token):
+        self._skip()
+        if self.text.startswith(token, self.pos):
+            self.pos += len(token)
+            return True
+        return False
+
+    def _expect(self, token):
+        if not self._take(token):
+            raise Untranslatable(f"expected {token!r} at {self.pos}")
+
+    def _match(self, pattern):
+        self._skip()
+        match = pattern.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+        return match
+
+    def translate(self):
+        if self._take('('):
+            selectors = self._path()
+            self._expect(')')
+            self._expect('[')
+            self._expect('1')
+            self._expect(']')
+        else:
+            selectors = self._path()
+        self._skip()
+        if self.pos != len(self.text):
+            raise Untranslatable(f"unsupported syntax at {self.pos}")
+        return ", ".join(selectors)
+
+    def _path(self):
+        if not self.text.startswith('//', self.pos):
+            raise Untranslatable("only paths starting with // are translated")
+        selectors = ['']
+        while True:
+            if self._take('//'):
+                combinator = ' '
+            elif self._take('/'):
+                combinator = ' > '
+            else:
+                return selectors
+            name = self._match(self.NAME)
+            if not name or self.text.startswith(('(', '::'), self.pos):
+                raise Untranslatable("only element steps are translated")
+            tag = name.group(0)
+            alternatives = [tag]
+            first = True
+            while self._take('['):
+                alternatives = [a + b for a in alternatives for b in self._predicate(tag, first)]
+                self._expect(']')
+                first = False
+            selectors = [(s + combinator if s else '') + a for s in selectors for a in alternatives]
+
+    def _predicate(self, tag, first):
+        position = self._match(self.POSITION)
+        if position:
+            # A position after a filter counts among the filtered nodes: CSS cannot say that
+            if not first:
+                raise Untranslatable("position after a filter")
+            return [f":{'nth-child' if tag == '*' else 'nth-of-type'}({position.group(0)})"]
+        alternatives = [self._all()]
+        while self._take('or '):
+            alternatives.append(self._all())
+        return alternatives
+
+    def _all(self):
+        selector = self._term()
+        while self._take('and '):
+            selector += self._term()
+        return selector
+
+    def _term(self):
+        function = self._match(self.FUNCTION)
+        if function:
+            self._expect('@')
+            attribute = self._attribute()
+            self._expect(',')
+            value = self._literal()
+            self._expect(')')
+            if not value:
+                raise Untranslatable("empty substring")
+            return f"[{attribute}{'*=' if function.group(1) == 'contains' else '^='}{css_string(value)}]"
+        self._expect('@')
+        attribute = self._attribute()
+        if self._take('='):
+            return f"[{attribute}={css_string(self._literal())}]"
+        return f"[{attribute}]"
+
+    def _attribute(self):
+        match = self._match(self.ATTRIBUTE)
+        if not match:
+            raise Untranslatable("attribute name")
+        return match.group(0)
+
+    def _literal(self):
+        match = self._match(self.LITERAL)
+        if not match:
+            raise Untranslatable("string literal")
+        return match.group(1) if match.group(1) is not None else match.group(2)
+
+def css_string(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def css_escape(identifier):
+    """CSS.escape for one class name: Tailwind tokens like `[&_svg]:size-4` or `ring-[3px]` need it"""
+    escaped = []
+    for i, char in enumerate(identifier):
+        if char.isdigit() and (i == 0 or (i == 1 and identifier[0] == '-')):
+            escaped.append(f"\\{ord(char):x} ")
+        elif char.isalnum() or char in '-_' or ord(char) >= 0x80:
+            escaped.append(char)
+        else:
+            escaped.append('\\' + char)
+    return ''.join(escaped) if identifier != '-' else '\\-'
+
+def xpath_to_css(xpath):
+    """Exact CSS equivalent of a config XPath, or None when it has none"""
+    try:
+        return XPathToCss(xpath).translate()
+    except Untranslatable:
+        return None
+
+CLASS_XPATH = re.compile(r"^//([A-Za-z][\w-]*)\[@class=(?:'([^']*)'|\"([^\"]*)\")\]$")
+
+def class_token_selector(xpath):
+    """For //tag[@class='a b c']: tag.a.b.c, which still matches when classes are reordered or added"""
+    match = CLASS_XPATH.match(xpath.strip())
+    if not match:
+        return None
+    tokens = (match.group(2) if match.group(2) is not None else match.group(3)).split()
+    return match.group(1) + ''.join('.' + css_escape(token) for token in tokens) if tokens else None
+
+def parse_candidate(text):
+    """'css:...' or 'xpath:...'; unprefixed entries starting with / or ( are XPath, anything else CSS"""
+    text = text.strip()
+    for kind in ('css', 'xpath'):
+        if text.startswith(kind + ':'):
+            return kind, text[len(kind) + 1:].strip()
+    return ('xpath' if text.startswith(('/', '(')) else 'css'), text
+
+def compile_candidates(config, name):
+    """Ordered candidates for <NAME>_XPATH: its CSS equivalent (or the XPath), <NAME>_FALLBACKS, then the class-token form"""
+    xpath = config[f"{name}_XPATH"]
+    css = xpath_to_css(xpath) if str(config.get('LOCATOR_PREFER_CSS', 'true')).lower() == 'true' else None
+    candidates = [('css', css) if css else ('xpath', xpath)]
+    for entry in config.get(f"{name}_FALLBACKS", '').split('||'):
+        if entry.strip():
+            candidates.append(parse_candidate(entry))
+    if str(config.get('LOCATOR_CLASS_FALLBACK', 'true')).lower() == 'true':
+        tokens = class_token_selector(xpath)
+        if tokens:
+            candidates.append(('css', tokens))
+    unique = []
+    for candidate in candidates:
+        if candidate not in unique:
+            unique.append(candidate)
+    return unique
+
+class Locator:
+    """One element's ordered candidates, ('css', selector) or ('xpath', expression), preferred first"""
+
+    def __init__(self, name, candidates, registry=None):
+        self.name = name
+        self.candidates = candidates
+        self.registry = registry
+
+    def resolve(self, params=None):
+        """Candidates as [kind, query] lists for the page scripts, with {placeholders} filled in"""
+        return [[kind, query.format(**params) if params else query] for kind, query in self.candidates]
+
+    def record_match(self, index, seconds):
+        if self.registry:
+            self.registry.record_match(self, index, seconds)
+
+    def record_timeout(self, seen, seconds):
+        if self.registry:
+            self.registry.record_timeout(self, seen, seconds)
+
+    def wait(self, driver, mode='clickable', timeout=30, poll=0.5, sleep=time.sleep, **params):
+        """Poll until a candidate's element is present/visible/clickable and return it
+
+        Each poll is one script call that walks the whole chain in the page. Raises
+        TimeoutException like WebDriverWait, noting whether anything matched at all.
+        """
+        candidates = self.resolve(params)
+        started = time.monotonic()
+        deadline = started + timeout
+        seen = -1
+        while True:
+            try:
+                index, element, query_ms = driver.execute_script(FIND_JS, candidates, mode)
+            except JavascriptException:
+                # The document is being replaced; try again on the next poll
+                index, element, query_ms = -1, None, None
+            if query_ms is not None and self.registry:
+                self.registry.record_query(self, query_ms)
+            seen = max(seen, index)
+            if element is not None:
+                self.record_match(index, time.monotonic() - started)
+                return element
+            if time.monotonic() >= deadline:
+                self.record_timeout(seen, time.monotonic() - started)
+                state = "present but never " + mode if seen >= 0 else "no candidate matched"
+                raise TimeoutException(f"{self.name.lower()}: {state} within {timeout}s ({self})")
+            sleep(min(poll, max(0.0, deadline - time.monotonic())))
+
+    def __str__(self):
+        return " || ".join(f"{kind}:{query}" for kind, query in self.candidates)
+
+class LocatorRegistry:
+    """Every *_XPATH element locator in the config, compiled once per run, with lookup statistics
+
+    Stats per locator: lookups, which candidate matched, time until the element was
+    ready, in-page query cost per poll, and timeouts split into "nothing matched" and
+    "present but never ready". A lookup answered by a fallback means the configured
+    locator is broken, whatever the step latency says.
+    """
+
+    def __init__(self, config=None):
+        self.locators = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+        for key in sorted(config or {}):
+            if key.endswith('_XPATH') and config[key]:
+                name = key[:-len('_XPATH')]
+                self.locators[name] = Locator(name, compile_candidates(config, name), self)
+
+    def __getitem__(self, name):
+        return self.locators[name]
+
+    def _stat(self, name, candidates):
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = {'candidates': [f"{kind}:{query}" for kind, query in candidates], 'lookups': 0,
+                                       'matched': {}, 'timeouts': 0, 'not_ready': 0,
+                                       'wait': LatencyHistogram(), 'query': LatencyHistogram()}
+        return stat
+
+    def record_match(self, locator, index, seconds):
+        with self._lock:
+            stat = self._stat(locator.name, locator.candidates)
+            stat['lookups'] += 1
+            stat['matched'][str(index)] = stat['matched'].get(str(index), 0) + 1
+            stat['wait'].record(seconds)
+            first_fallback = index > 0 and stat['matched'][str(index)] == 1
+        if first_fallback:
+            kind, query = locator.candidates[index]
+            logging.warning(f"LOCATOR_FALLBACK: {locator.name} matched candidate {index} ({kind}:{query[:120]}) "
+                            f"- the preferred locator found nothing, update {locator.name}_XPATH")
+
+    def record_timeout(self, locator, seen, seconds):
+        with self._lock:
+            stat = self._stat(locator.name, locator.candidates)
+            stat['lookups'] += 1
+            stat['timeouts' if seen < 0 else 'not_ready'] += 1
+
+    def record_query(self, locator, query_ms):
+        with self._lock:
+            self._stat(locator.name, locator.candidates)['query'].record(query_ms / 1000.0)
+
+    def merge(self, other):
+        with self._lock:
+            for name, theirs in other.stats.items():
+                stat = self.stats.setdefault(name, {'candidates': theirs['candidates'], 'lookups': 0, 'matched': {},
+                                                    'timeouts': 0, 'not_ready': 0,
+                                                    'wait': LatencyHistogram(), 'query': LatencyHistogram()})
+                for key in ('lookups', 'timeouts', 'not_ready'):
+                    stat[key] += theirs[key]
+                for index, count in theirs['matched'].items():
+                    stat['matched'][index] = stat['matched'].get(index, 0) + count
+                stat['wait'].merge(theirs['wait'])
+                stat['query'].merge(theirs['query'])
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {name: dict(stat, wait=stat['wait'].to_dict(), query=stat['query'].to_dict())
+                    for name, stat in self.stats.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        registry = cls()
+        for name, stat in data.items():
+            registry.stats[name] = dict(stat, matched=dict(stat['matched']), wait=LatencyHistogram.from_dict(stat['wait']),
+                                        query=LatencyHistogram.from_dict(stat['query']))
+        return registry
+
+    def rows(self):
+        """One row per locator that was looked up, fallback users first"""
+        with self._lock:
+            rows = []
+            for name, stat in self.stats.items():
+                wait, query = stat['wait'].summary(), stat['query'].summary()
+                fallbacks = {int(index): count for index, count in stat['matched'].items() if index != '0'}
+                rows.append({
+                    'locator': name, 'lookups': stat['lookups'], 'primary': stat['matched'].get('0', 0),
+                    'fallback': sum(fallbacks.values()), 'timeouts': stat['timeouts'], 'not_ready': stat['not_ready'],
+                    'wait_p50_ms': wait.get('p50_ms'), 'wait_p95_ms': wait.get('p95_ms'),
+                    'query_p50_ms': query.get('p50_ms'), 'query_p95_ms': query.get('p95_ms'),
+                    'preferred': stat['candidates'][0],
+                    'fallbacks_matched': {stat['candidates'][index]: count for index, count in sorted(fallbacks.items())},
+                })
+        rows.sort(key=lambda r: (-r['fallback'], -r['timeouts'], r['locator']))
+        return rows
+
+def format_locator_row(row):
+    wait = (f"{row['wait_p50_ms']:>9.0f} {row['wait_p95_ms']:>9.0f}" if row['wait_p50_ms'] is not None
+            else f"{'-':>9} {'-':>9}")
+    query = f"{row['query_p95_ms']:>9.2f}" if row['query_p95_ms'] is not None else f"{'-':>9}"
+    return (f"{row['locator']:<28} {row['lookups']:>7} {row['primary']:>7} {row['fallback']:>8} "
+            f"{row['timeouts']:>8} {row['not_ready']:>9} {wait} {query}")
+
+LOCATOR_TABLE_HEADER = (f"{'locator':<28} {'lookups':>7} {'primary':>7} {'fallback':>8} {'timeouts':>8} {'not_ready':>9}"
+                        f" {'wait_p50':>9} {'wait_p95':>9} {'query_p95':>9}")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import atexit
+import contextvars
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import socket
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from step_metrics import STEP_LOG, parse_failure
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 'STEP_TIMINGS: ...', 'HOST_SUMMARY: {...}': machine-readable lines meant for the log files and run_report.py
+TAG = re.compile(r"^([A-Z][A-Z0-9_]+): ")
+
+# Record attributes copied into each JSON line when set (via log_context or `extra`)
+FIELDS = ('student', 'student_index', 'session', 'scenario', 'attempt', 'iteration', 'step', 'duration_ms', 'outcome', 'category')
+
+# Events written to the JSON-lines log only: too fine-grained for the text log and the console
+JSON_ONLY_EVENTS = ('step',)
+
+_context = contextvars.ContextVar('log_context', default={})
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields (student, attempt, ...) to every record logged inside the block
+
+    A context variable, so it follows the current thread or asyncio task.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Stamps the run ID and the current log context on each record
+
+    Attached to the queue handler, so it runs on the calling thread before the record is
+    queued; that is why the caller's log_context() contextvars are visible here.
+    """
+
+    def __init__(self, run_id):
+        super().__init__()
+        self.run_id = run_id
+
+    def filter(self, record):
+        record.run_id = self.run_id
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: run_id, event, student, step, duration_ms, outcome and the message
+
+    Tagged lines get their tag as the event; FAILURE_STEP_* lines are split into
+    step, student and detail so failures need no string parsing downstream.
+    """
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'level': record.levelname, 'run_id': getattr(record, 'run_id', None)}
+        tag = TAG.match(message)
+        entry['event'] = getattr(record, 'event', None) or (tag.group(1).lower() if tag else 'log')
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        failure = parse_failure(message) if record.levelno >= logging.ERROR else None
+        if failure:
+            category, email, detail = failure
+            entry.update(event='failure', category=category, student=email, outcome='failed', detail=detail)
+        else:
+            entry['message'] = message
+            # Tagged JSON payloads (STEP_LATENCY, HOST_SUMMARY, ...) are embedded as objects
+            if tag and message[tag.end():].startswith('{'):
+                try:
+                    entry['data'] = json.loads(message[tag.end():])
+                except ValueError:
+                    pass
+        return json.dumps(entry, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    """Plain message for progress output, level prefix for warnings and errors"""
+
+    def format(self, record):
+        message = record.getMessage()
+        return message if record.levelno < logging.WARNING else f"{record.levelname}: {message}"
+
+class ConsoleFilter(logging.Filter):
+    """Keeps the console readable; in quiet mode per-student and machine-tagged lines stay in the log files
+
+    Quiet mode still shows a progress line every `progress_interval` seconds.
+    """
+
+    def __init__(self, progress_interval=30):
+        super().__init__()
+        self.quiet = False
+        self.progress_interval = progress_interval
+        self._last_progress = 0.0
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event in JSON_ONLY_EVENTS:
+            return False
+        if not self.quiet:
+            return True
+        if event == 'progress':
+            if record.created - self._last_progress < self.progress_interval:
+                return False
+            self._last_progress = record.created
+            return True
+        if getattr(record, 'student', None) is not None:
+            return False
+        return record.levelno >= logging.WARNING or not TAG.match(record.getMessage())
+
+class TextFilter(logging.Filter):
+    def filter(self, record):
+        return getattr(record, 'event', None) not in JSON_ONLY_EVENTS
+
+def gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def rotating_handler(path, max_bytes, backups, compress):
+    """Size-rotated file: path, path.1[.gz], path.2[.gz], ... (higher numbers are older)"""
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+    if compress:
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = gzip_rotator
+    return handler
+
+class PipelineListener(QueueListener):
+    """QueueListener that also answers flush markers: an Event put on the queue is set once reached"""
+
+    def handle(self, record):
+        if isinstance(record, threading.Event):
+            record.set()
+            return
+        super().handle(record)
+
+class LogPipeline:
+    """Root logging through a queue: callers only enqueue, one background thread formats and writes
+
+    Writes the text log (TEXT_FORMAT, read by run_report.py), an optional JSON-lines
+    log and the console. Both files rotate at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT
+    older segments, gzip-compressed when LOG_COMPRESS is true.
+    """
+
+    def __init__(self, name, config=None):
+        config = config or {}
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        log_dir = config.get('LOG_DIR', 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+        self.run_id = f"{timestamp}-{socket.gethostname()}-{os.getpid()}"
+        self.log_file = os.path.join(log_dir, f"{name}_{timestamp}.log")
+        self.json_file = None
+        max_bytes = int(float(config.get('LOG_MAX_BYTES', 100 * 1024 * 1024)))
+        backups = int(config.get('LOG_BACKUP_COUNT', 20))
+        compress = str(config.get('LOG_COMPRESS', 'true')).lower() == 'true'
+
+        text = rotating_handler(self.log_file, max_bytes, backups, compress)
+        text.setFormatter(logging.Formatter(TEXT_FORMAT))
+        text.addFilter(TextFilter())
+        handlers = [text]
+        if str(config.get('LOG_JSON', 'true')).lower() == 'true':
+            self.json_file = os.path.join(log_dir, f"{name}_{timestamp}.jsonl")
+            structured = rotating_handler(self.json_file, max_bytes, backups, compress)
+            structured.setFormatter(JsonLinesFormatter())
+            handlers.append(structured)
+        self.console_filter = ConsoleFilter(float(config.get('LOG_PROGRESS_INTERVAL', 30)))
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(ConsoleFormatter())
+        console.addFilter(self.console_filter)
+        handlers.append(console)
+        # Per-step records only exist for the JSON log
+        STEP_LOG.setLevel(logging.INFO if self.json_file else logging.WARNING)
+
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = QueueHandler(self.queue)
+        self.queue_handler.addFilter(ContextFilter(self.run_id))
+        self.listener = PipelineListener(self.queue, *handlers, respect_handler_level=True)
+        self._started = False
+        self._stopped = threading.Event()
+
+    def start(self):
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(self.queue_handler)
+        self.listener.start()
+        self._started = True
+        atexit.register(self.stop)
+        return self
+
+    def add_handler(self, handler):
+        """Run a record consumer (failure counters, account state) on the writer thread instead of the caller's"""
+        self.listener.handlers = self.listener.handlers + (handler,)
+
+    def remove_handler(self, handler):
+        """Detach a consumer once it has seen every record logged so far"""
+        self.flush()
+        self.listener.handlers = tuple(h for h in self.listener.handlers if h is not handler)
+
+    def flush(self, timeout=10):
+        """Block until the writer thread has handled every record queued before this call"""
+        if not self._started or self._stopped.is_set():
+            return
+        reached = threading.Event()
+        self.queue.put(reached)
+        reached.wait(timeout)
+
+    def set_quiet(self, quiet):
+        self.console_filter.quiet = quiet
+
+    def stop(self):
+        """Drain the queue and close the files; safe to call more than once"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+def console_quiet(config, concurrency):
+    """LOG_CONSOLE: verbose, quiet, or auto (quiet from LOG_QUIET_CONCURRENCY parallel sessions up)"""
+    mode = str(config.get('LOG_CONSOLE', 'auto')).lower()
+    if mode == 'auto':
+        return concurrency >= int(config.get('LOG_QUIET_CONCURRENCY', 20))
+    return mode == 'quiet'
+
+def log_parts(path):
+    """A rotated log's segments, oldest first: path.N(.gz) ... path.1(.gz), path"""
+    parts = []
+    for candidate in os.listdir(os.path.dirname(path) or '.'):
+        match = re.fullmatch(re.escape(os.path.basename(path)) + r"\.(\d+)(\.gz)?", candidate)
+        if match:
+            parts.append((int(match.group(1)), os.path.join(os.path.dirname(path), candidate)))
+    return [p for _, p in sorted(parts, reverse=True)] + ([path] if os.path.exists(path) else [])
+
+def open_log(path):
+    """Text-mode reader for a plain or gzip-compressed log segment"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8', errors='replace')
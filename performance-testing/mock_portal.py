@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+from step_metrics import LatencyHistogram
+from student_ppt_viewer import apply_config_overrides, load_config
+
+# Injectable routes: MOCK_LATENCY_MS_<ROUTE> / MOCK_ERROR_RATE_<ROUTE> override the MOCK_LATENCY_MS / MOCK_ERROR_RATE defaults
+ROUTES = ('page', 'login', 'aspirations', 'units', 'sessions', 'ppt', 'chat', 'create_student')
+
+# Runtime-adjustable settings (POST /__mock/settings) and their defaults
+DEFAULT_SETTINGS = {
+    'MOCK_LATENCY_MS': 0, 'MOCK_LATENCY_JITTER_MS': 0, 'MOCK_ERROR_RATE': 0, 'MOCK_ERROR_STATUS': 503,
+    'MOCK_PPT_READY_SECONDS': 0, 'MOCK_CHAT_FIRST_TOKEN_MS': 800, 'MOCK_CHAT_CHUNKS': 20,
+    'MOCK_CHAT_CHUNK_INTERVAL_MS': 50, 'MOCK_CHAT_ERROR_REPLY_RATE': 0, 'MOCK_SESSIONS': 4,
+    'MOCK_ACCEPT_ANY_LOGIN': 'true',
+}
+
+CHAT_REPLY = ("An MBA broadens your view of how a business works as a whole, from finance and operations to "
+              "marketing and strategy, and builds the leadership and decision-making skills that senior roles "
+              "demand. It also gives you a network of peers and alumni and a structured way to test ideas. ")
+
+def xpath_attribute(xpath, name, default=''):
+    """Literal value of an exact `@name='...'` match in an XPath, e.g. the class a locator expects"""
+    match = re.search(r"@%s=(['\"])(.*)\1\]" % re.escape(name), xpath or '')
+    return match.group(2) if match else default
+
+# Single-page stand-in for the portal: only the elements, texts and attributes the
+# harness XPaths select, calling the same API routes the protocol engine replays.
+PAGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>AI Tutor (mock)</title>
+<style>
+body { font-family: sans-serif; margin: 0; } main { padding: 16px; } nav { padding: 8px 16px; background: #eee; }
+nav span { cursor: pointer; } textarea { width: 480px; height: 96px; display: block; }
+.slide { min-height: 240px; padding: 16px; position: relative; } .chat { min-height: 200px; border: 1px solid #ccc; }
+</style></head>
+<body><div id="app"></div>
+<script>
+var CONFIG = __CONFIG__;
+var app = document.getElementById('app');
+var token = localStorage.getItem('mock_token');
+
+function el(tag, attrs, text) {
+    var node = document.createElement(tag);
+    for (var key in attrs || {}) { node.setAttribute(key, attrs[key]); }
+    if (text) { node.textContent = text; }
+    return node;
+}
+function button(text, onclick, attrs) { var b = el('button', attrs, text); b.onclick = onclick; return b; }
+function url(path, params) {
+    for (var key in params || {}) { path = path.replace('{' + key + '}', encodeURIComponent(params[key])); }
+    return path;
+}
+function api(method, path, body) {
+    var headers = {'Content-Type': 'application/json'};
+    if (token) { headers['Authorization'] = 'Bearer ' + token; }
+    return fetch(path, {method: method, headers: headers, body: body ? JSON.stringify(body) : undefined})
+        .then(function (response) {
+            if (response.status === 401) { localStorage.removeItem('mock_token'); token = null; landing(); throw new Error('401'); }
+            return response.json().then(function (data) { return {status: response.status, data: data}; });
+        });
+}
+function show(nodes) { app.innerHTML = ''; nodes.forEach(function (node) { app.appendChild(node); }); }
+
+function landing() {
+    show([el('h1', {}, 'AI Tutor'), button('Faculty', function () {}), button('Student', loginForm)]);
+}
+function loginForm() {
+    var email = el('input', {type: 'email', placeholder: 'Enter your email'});
+    var password = el('input', {type: 'password', placeholder: 'Your password'});
+    var error = el('p');
+    show([email, password, button('Login', function () {
+        api('POST', CONFIG.endpoints.login, {email: email.value, password: password.value}).then(function (r) {
+            if (r.status !== 200) { error.textContent = 'Invalid credentials'; return; }
+            token = r.data[CONFIG.token_field];
+            localStorage.setItem('mock_token', token);
+            r.data.user.onboarded ? home() : aspirations();
+        });
+    }), error]);
+}
+function aspirations() {
+    var text = el('textarea', {name: 'background', placeholder: 'Share your background and aspirations'});
+    show([el('h2', {}, 'Tell us about yourself'), text, button('Submit Information', function () {
+        api('POST', CONFIG.endpoints.aspirations, {background: text.value}).then(home);
+    })]);
+}
+function home() {
+    var nav = el('nav');
+    var link = el('span', {}, 'Enrolled Units');
+    link.onclick = units;
+    nav.appendChild(link);
+    show([nav, el('main', {id: 'content'})]);
+}
+function content(nodes) {
+    var main = document.getElementById('content');
+    main.innerHTML = '';
+    nodes.forEach(function (node) { main.appendChild(node); });
+}
+function units() {
+    api('GET', CONFIG.endpoints.units).then(function (r) {
+        content(r.data.data.map(function (unit) {
+            var card = el('div', {}, unit.name);
+            card.appendChild(button('View Details', function () { sessions(unit.id); }, {'data-slot': 'button'}));
+            return card;
+        }));
+    });
+}
+function sessions(unitId) {
+    api('GET', url(CONFIG.endpoints.sessions, {unit_id: unitId})).then(function (r) {
+        var table = el('table'), body = el('tbody');
+        r.data.data.sessions.forEach(function (session, i) {
+            var row = el('tr');
+            [i + 1, session.title, session.duration, session.status, session.date].forEach(function (value) {
+                row.appendChild(el('td', {}, String(value)));
+            });
+            var cell = el('td');
+            cell.appendChild(button('Start', function () { ppt(session._id); }));
+            row.appendChild(cell);
+            body.appendChild(row);
+        });
+        table.appendChild(body);
+        content([table]);
+    });
+}
+function ppt(sessionId) {
+    content([el('p', {}, 'Generating presentation...')]);
+    api('GET', url(CONFIG.endpoints.ppt, {session_id: sessionId})).then(function (r) {
+        if (r.status === 202) { setTimeout(function () { ppt(sessionId); }, CONFIG.ppt_poll_ms); return; }
+        var viewer = el('div', {'class': CONFIG.classes.ppt_container});
+        var slide = el('div', {'class': 'slide'}, r.data.slides[0].title);
+        slide.appendChild(button('\\u25B6', function () { slide.setAttribute('data-playing', '1'); }, {'class': CONFIG.classes.ppt_play}));
+        slide.appendChild(button('\\u270B', function () { chat(sessionId); }, {title: 'Raise Hand / Ask AI'}));
+        viewer.appendChild(slide);
+        content([viewer]);
+    });
+}
+function chat(sessionId) {
+    if (document.getElementById('chat')) { return; }
+    var panel = el('div', {'class': CONFIG.classes.chat_container, id: 'chat'});
+    var messages = el('div', {'class': 'chat'});
+    var input = el('textarea', {placeholder: 'Type your message (max 700 characters)...', maxlength: '700'});
+    panel.appendChild(messages);
+    panel.appendChild(input);
+    panel.appendChild(button('Send', function () {
+        var question = input.value;
+        input.value = '';
+        messages.appendChild(el('p', {}, 'You: ' + question));
+        var reply = el('p');
+        messages.appendChild(reply);
+        var headers = {'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token};
+        fetch(url(CONFIG.endpoints.chat, {session_id: sessionId}), {method: 'POST', headers: headers,
+                body: JSON.stringify({message: question})}).then(function (response) {
+            if (!response.ok) { reply.textContent = 'Something went wrong. Please try again later.'; return; }
+            var reader = response.body.getReader(), decoder = new TextDecoder();
+            function read() {
+                return reader.read().then(function (chunk) {
+                    if (chunk.done) { return; }
+                    reply.textContent += decoder.decode(chunk.value, {stream: true});
+                    return read();
+                });
+            }
+            return read();
+        });
+    }));
+    document.getElementById('content').appendChild(panel);
+}
+
+token ? home() : landing();
+</script></body></html>
+"""
+
+class MockPortal:
+    """In-memory stand-in for the AI Tutor portal, its student API and the create-student admin API
+
+    Serves a page matching the harness XPaths (LOGIN_URL's path and /), the protocol
+    engine's PROTOCOL_*_ENDPOINT routes and API_ENDPOINT, with injected latency and
+    error rates per route. Server-side time per route is kept for the benchmark suite.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.settings = {key: config.get(key, default) for key, default in DEFAULT_SETTINGS.items()}
+        self.settings.update({key: value for key, value in config.items() if key.startswith('MOCK_')})
+        self.accounts = {}
+        self.tokens = {}
+        self.ppt_requested = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def setting(self, name, route=None):
+        value = self.settings.get(f"{name}_{route.upper()}") if route else None
+        return float(value if value is not None else self.settings[name])
+
+    def _record(self, route, seconds, status):
+        with self._lock:
+            stats = self.stats.setdefault(route, {'latency': LatencyHistogram(), 'statuses': {}, 'injected_errors': 0})
+            stats['latency'].record(seconds)
+            stats['statuses'][str(status)] = stats['statuses'].get(str(status), 0) + 1
+
+    def stats_summary(self):
+        with self._lock:
+            routes = {route: {**stats['latency'].summary(), 'statuses': dict(stats['statuses']),
+                              'injected_errors': stats['injected_errors']} for route, stats in self.stats.items()}
+        return {'routes': routes, 'accounts': len(self.accounts), 'logged_in': len(self.tokens),
+                'settings': dict(self.settings)}
+
+    @web.middleware
+    async def inject(self, request, handler):
+        """Injected latency and errors, then server-side time per named route"""
+        route = request.match_info.route.name
+        route = 'page' if route == 'login_page' else route
+        if route not in ROUTES:
+            return await handler(request)
+        started = time.perf_counter()
+        delay = self.setting('MOCK_LATENCY_MS', route) + random.uniform(-1, 1) * self.setting('MOCK_LATENCY_JITTER_MS', route)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if random.random() < self.setting('MOCK_ERROR_RATE', route):
+            with self._lock:
+                self.stats.setdefault(route, {'latency': LatencyHistogram(), 'statuses': {}, 'injected_errors': 0})['injected_errors'] += 1
+            response = web.json_response({'detail': 'Injected error'}, status=int(self.setting('MOCK_ERROR_STATUS')))
+        else:
+            try:
+                response = await handler(request)
+            except web.HTTPException as e:
+                self._record(route, time.perf_counter() - started, e.status)
+                raise
+        self._record(route, time.perf_counter() - started, response.status)
+        return response
+
+    def _student(self, request):
+        header = request.headers.get('Authorization', '')
+        email = self.tokens.get(header[7:]) if header.startswith('Bearer ') else None
+        if email is None:
+            raise web.HTTPUnauthorized(text=json.dumps({'detail': 'Not authenticated'}), content_type='application/json')
+        return email, self.accounts[email]
+
+    def page_config(self):
+        config = self.config
+        return {
+            'endpoints': {'login': config['PROTOCOL_LOGIN_ENDPOINT'], 'aspirations': config['PROTOCOL_ASPIRATIONS_ENDPOINT'],
+                          'units': config['PROTOCOL_UNITS_ENDPOINT'], 'sessions': config['PROTOCOL_SESSIONS_ENDPOINT'],
+                          'ppt': config['PROTOCOL_PPT_ENDPOINT'], 'chat': config['PROTOCOL_CHAT_ENDPOINT']},
+            'token_field': config.get('PROTOCOL_TOKEN_FIELD', 'access_token'),
+            'classes': {'ppt_container': xpath_attribute(config.get('PPT_CONTAINER_XPATH'), 'class', 'ppt-container'),
+                        'ppt_play': xpath_attribute(config.get('PPT_PLAY_BUTTON_XPATH'), 'class', 'ppt-play'),
+                        'chat_container': xpath_attribute(config.get('AI_CHAT_CONTAINER_XPATH'), 'class', 'chat-container')},
+            'ppt_poll_ms': 1000,
+        }
+
+    async def page(self, request):
+        html = PAGE_HTML.replace('__CONFIG__', json.dumps(self.page_config()))
+        return web.Response(text=html, content_type='text/html')
+
+    async def create_student(self, request):
+        data = await request.json()
+        missing = [field for field in ('email', 'full_name', 'program_id', 'cohort_id', 'academic_year_id', 'password')
+                   if not data.get(field)]
+        if missing:
+            return web.json_response({'success': False, 'message': f"Missing fields: {', '.join(missing)}"}, status=422)
+        email = data['email'].lower()
+        if email in self.accounts:
+            return web.json_response({'success': False, 'message': 'Student with this email already exists'}, status=400)
+        student_id = secrets.token_hex(12)
+        self.accounts[email] = {'password': data['password'], 'full_name': data['full_name'], 'onboarded': False,
+                                'student_id': student_id}
+        return web.json_response({
+            'success': True, 'message': 'Student profile created successfully', 'student_id': student_id, 'email_sent': True,
+            'details': {'program': {'id': data['program_id'], 'name': 'Doctor of Business Administration', 'code': 'DBA'},
+                        'cohort': {'id': data['cohort_id'], 'label': 'July', 'start_date': None, 'end_date': None},
+                        'year': {'id': data['academic_year_id'], 'label': '2025', 'ordinal': 6, 'description': '2025'}},
+        })
+
+    async def login(self, request):
+        data = await request.json()
+        email = str(data.get('email', '')).lower()
+        account = self.accounts.get(email)
+        if account is None and str(self.settings['MOCK_ACCEPT_ANY_LOGIN']).lower() == 'true' and data.get('password'):
+            # Accounts provisioned against the real API (student_credentials.csv) log in on first sight
+            account = self.accounts[email] = {'password': data['password'], 'full_name': email.split('@')[0],
+                                              'onboarded': False, 'student_id': secrets.token_hex(12)}
+        if account is None or account['password'] != data.get('password'):
+            return web.json_response({'detail': 'Invalid email or password'}, status=401)
+        token = secrets.token_hex(16)
+        self.tokens[token] = email
+        return web.json_response({self.config.get('PROTOCOL_TOKEN_FIELD', 'access_token'): token, 'token_type': 'bearer',
+                                  'user': {'email': email, 'full_name': account['full_name'], 'onboarded': account['onboarded']}})
+
+    async def aspirations(self, request):
+        _, account = self._student(request)
+        if account['onboarded']:
+            return web.json_response({'detail': 'Background already submitted'}, status=409)
+        await request.read()
+        account['onboarded'] = True
+        return web.json_response({'success': True})
+
+    async def units(self, request):
+        self._student(request)
+        return web.json_response({'data': [{'id': 'unit-1', 'name': 'Strategic Management'}]})
+
+    async def sessions(self, request):
+        self._student(request)
+        unit_id = request.match_info['unit_id']
+        sessions = [{'_id': f"{unit_id}-session-{i}", 'title': f"Session {i}", 'duration': '45 min', 'status': 'Available',
+                     'date': '2025-07-24'} for i in range(1, int(self.setting('MOCK_SESSIONS')) + 1)]
+        return web.json_response({'data': {'sessions': sessions}})
+
+    async def ppt(self, request):
+        """202 while the deck is 'generating' (MOCK_PPT_READY_SECONDS after a student first asks), then the slides"""
+        email, _ = self._student(request)
+        key = (email, request.match_info['session_id'])
+        first = self.ppt_requested.setdefault(key, time.monotonic())
+        if time.monotonic() - first < self.setting('MOCK_PPT_READY_SECONDS'):
+            return web.json_response({'status': 'generating'}, status=202)
+        return web.json_response({'status': 'ready', 'slides': [{'title': 'Introduction'}, {'title': 'Key concepts'}]})
+
+    async def chat(self, request):
+        """Streams the reply in chunks after MOCK_CHAT_FIRST_TOKEN_MS, like the tutor's token stream"""
+        self._student(request)
+        await request.read()
+        started = time.perf_counter()
+        response = web.StreamResponse(headers={'Content-Type': 'text/plain; charset=utf-8'})
+        await response.prepare(request)
+        await asyncio.sleep(self.setting('MOCK_CHAT_FIRST_TOKEN_MS') / 1000.0)
+        if random.random() < self.setting('MOCK_CHAT_ERROR_REPLY_RATE'):
+            chunks = ['Something went wrong. Please try again later.']
+        else:
+            count = max(1, int(self.setting('MOCK_CHAT_CHUNKS')))
+            words = (CHAT_REPLY * 2).split(' ')
+            size = -(-len(words) // count)
+            chunks = [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(self.setting('MOCK_CHAT_CHUNK_INTERVAL_MS') / 1000.0)
+            await response.write(chunk.encode('utf-8'))
+            if i == 0:
+                self._record('chat_first_token', time.perf_counter() - started, 200)
+        await response.write_eof()
+        return response
+
+    async def get_stats(self, request):
+        return web.json_response(self.stats_summary())
+
+    async def reset_stats(self, request):
+        with self._lock:
+            self.stats = {}
+        return web.json_response({'reset': True})
+
+    async def update_settings(self, request):
+        """Change MOCK_* settings of a running mock, e.g. {"MOCK_LATENCY_MS": 50}"""
+        data = await request.json()
+        unknown = [key for key in data if not key.startswith('MOCK_')]
+        if unknown:
+            return web.json_response({'detail': f"Not mock settings: {', '.join(unknown)}"}, status=400)
+        self.settings.update(data)
+        return web.json_response(self.settings)
+
+    def app(self):
+        config = self.config
+        login_path = urlparse(config['LOGIN_URL']).path if config.get('LOGIN_URL') else '/login'
+        app = web.Application(middlewares=[self.inject])
+        app.router.add_get('/', self.page, name='page')
+        if login_path not in ('', '/'):
+            app.router.add_get(login_path, self.page, name='login_page')
+        app.router.add_post(config['API_ENDPOINT'], self.create_student, name='create_student')
+        app.router.add_post(config['PROTOCOL_LOGIN_ENDPOINT'], self.login, name='login')
+        app.router.add_post(config['PROTOCOL_ASPIRATIONS_ENDPOINT'], self.aspirations, name='aspirations')
+        app.router.add_get(config['PROTOCOL_UNITS_ENDPOINT'], self.units, name='units')
+        app.router.add_get(config['PROTOCOL_SESSIONS_ENDPOINT'], self.sessions, name='sessions')
+        app.router.add_get(config['PROTOCOL_PPT_ENDPOINT'], self.ppt, name='ppt')
+        app.router.add_post(config['PROTOCOL_CHAT_ENDPOINT'], self.chat, name='chat')
+        app.router.add_get('/__mock/stats', self.get_stats)
+        app.router.add_post('/__mock/stats/reset', self.reset_stats)
+        app.router.add_post('/__mock/settings', self.update_settings)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the AI Tutor portal and create-student API')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, help='Port to listen on (overrides MOCK_PORT)')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='Override any config value, e.g. --set MOCK_LATENCY_MS=50 (repeatable)')
+    args = parser.parse_args()
+
+    config = apply_config_overrides(load_config(), args.set)
+    port = args.port or int(config.get('MOCK_PORT', 8765))
+    portal = MockPortal(config)
+    base = f"http://{args.host}:{port}"
+    print(f"Mock AI Tutor on {base}")
+    print(f"Point the harness at it: --set LOGIN_URL={base}{urlparse(config['LOGIN_URL']).path} "
+          f"--set PROTOCOL_BASE_URL={base} (create_students.py: API_BASE_URL={base})")
+    print(f"Server-side timings: {base}/__mock/stats")
+    web.run_app(portal.app(), host=args.host, port=port, print=None, access_log=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import threading
+from urllib.parse import urlsplit
+
+from step_metrics import LatencyHistogram
+
+# Per-request phases, from Chrome's ResourceTiming plus the loadingFinished timestamp
+NETWORK_PHASES = ('total', 'dns', 'connect', 'ssl', 'ttfb', 'download')
+
+# Path segments that identify a record rather than a route: numbers, Mongo ObjectIds,
+# UUIDs and long opaque tokens
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{24}|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|(?=[^/]*\d)[A-Za-z0-9_=-]{20,})$")
+# Build hashes in asset names, e.g. main.3f9c2a1b.js -> main.js
+ASSET_HASH = re.compile(r"[.-][0-9a-fA-F]{8,}(?=\.)")
+
+def network_capture_enabled(config):
+    return str(config.get('NETWORK_CAPTURE', 'false')).lower() == 'true'
+
+def enable_performance_logging(chrome_options):
+    """Ask chromedriver to buffer CDP Network events in the 'performance' log"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+def endpoint_template(method, url):
+    """'GET api.example.com/units/{id}/sessions' for a concrete request URL"""
+    parts = urlsplit(url)
+    segments = ['{id}' if ID_SEGMENT.match(segment) else ASSET_HASH.sub('', segment)
+                for segment in parts.path.split('/')]
+    return f"{method} {parts.netloc}{'/'.join(segments) or '/'}"
+
+class NetworkMetrics:
+    """Run-wide request latency histograms and error counts per endpoint template"""
+
+    COUNTERS = ('requests', 'failed', 'status_4xx', 'status_5xx', 'bytes')
+
+    def __init__(self, max_endpoints=500):
+        self.max_endpoints = max_endpoints
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, template):
+        entry = self.endpoints.get(template)
+        if entry is None:
+            # Cap cardinality: unexpected URL shapes collapse into one bucket
+            if len(self.endpoints) >= self.max_endpoints:
+                template = 'OTHER'
+                entry = self.endpoints.get(template)
+            if entry is None:
+                entry = {phase: LatencyHistogram() for phase in NETWORK_PHASES}
+                entry.update({counter: 0 for counter in self.COUNTERS})
+                self.endpoints[template] = entry
+        return entry
+
+    def record(self, template, phases, status=None, failed=False, size=0):
+        """phases maps NETWORK_PHASES names to seconds; phases that did not happen are left out"""
+        with self._lock:
+            entry = self._endpoint(template)
+            entry['requests'] += 1
+            entry['bytes'] += size
+            if failed:
+                entry['failed'] += 1
+            elif status and status >= 500:
+                entry['status_5xx'] += 1
+            elif status and status >= 400:
+                entry['status_4xx'] += 1
+            for phase, seconds in phases.items():
+                entry[phase].record(seconds)
+
+    def merge(self, other):
+        with self._lock:
+            for template, theirs in other.endpoints.items():
+                entry = self._endpoint(template)
+                for phase in NETWORK_PHASES:
+                    entry[phase].merge(theirs[phase])
+                for counter in self.COUNTERS:
+                    entry[counter] += theirs[counter]
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {'max_endpoints': self.max_endpoints,
+                    'endpoints': {template: dict(entry, **{phase: entry[phase].to_dict() for phase in NETWORK_PHASES})
+                                  for template, entry in self.endpoints.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls(data['max_endpoints'])
+        for template, entry in data['endpoints'].items():
+            metrics.endpoints[template] = dict(entry, **{phase: LatencyHistogram.from_dict(entry[phase])
+                                                         for phase in NETWORK_PHASES})
+        return metrics
+
+    def rows(self):
+        """One row per endpoint, slowest p95 first"""
+        with self._lock:
+            rows = []
+            for template, entry in self.endpoints.items():
+                row = {'endpoint': template}
+                row.update({counter: entry[counter] for counter in self.COUNTERS})
+                row['errors'] = entry['failed'] + entry['status_4xx'] + entry['status_5xx']
+                for phase in NETWORK_PHASES:
+                    hist = entry[phase]
+                    if hist.count:
+                        row[f'{phase}_p50_ms'] = round(hist.percentile(50), 1)
+                        row[f'{phase}_p95_ms'] = round(hist.percentile(95), 1)
+                rows.append(row)
+        rows.sort(key=lambda r: -r.get('total_p95_ms', 0))
+        return rows
+
+def format_network_row(row):
+    def ms(key):
+        value = row.get(key)
+        return f"{value:>8.0f}" if value is not None else f"{'-':>8}"
+    return (f"{row['endpoint'][:60]:<60} {row['requests']:>6} {row['errors']:>5} {ms('total_p50_ms')} {ms('total_p95_ms')}"
+            f" {ms('dns_p95_ms')} {ms('connect_p95_ms')} {ms('ttfb_p95_ms')} {ms('download_p95_ms')}")
+
+NETWORK_TABLE_HEADER = (f"{'endpoint':<60} {'reqs':>6} {'errs':>5} {'p50':>8} {'p95':>8}"
+                        f" {'dns_p95':>8} {'conn_p95':>8} {'ttfb_p95':>8} {'dl_p95':>8}")
+
+class NetworkCapture:
+    """Turns one driver's Chrome performance log into per-request timings
+
+    Only requests still in flight are held (template, start time, response timing);
+    request and response bodies are never read, so memory stays flat however many
+    students run. Call drain() periodically and before the driver is reused.
+    """
+
+    def __init__(self, driver, metrics, config):
+        self.driver = driver
+        self.metrics = metrics
+        types = config.get('NETWORK_CAPTURE_TYPES', '')
+        self.resource_types = {t.strip() for t in types.split(',') if t.strip()}
+        self.pending = {}
+        # A pooled driver still holds the previous student's entries
+        self.drain(record=False)
+
+    def drain(self, record=True):
+        """Process every buffered performance log entry; returns the number of requests recorded"""
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return 0
+        if not record:
+            self.pending.clear()
+            return 0
+        finished = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            finished += self._handle(message.get('method'), message.get('params', {}))
+        return finished
+
+    def _handle(self, method, params):
+        request_id = params.get('requestId')
+        if method == 'Network.requestWillBeSent':
+            finished = 0
+            if 'redirectResponse' in params and request_id in self.pending:
+                # The previous hop of a redirect chain ends where the next one starts
+                self._response(request_id, params['redirectResponse'])
+                finished = self._finish(request_id, params['timestamp'], 0)
+            request = params.get('request', {})
+            if not request.get('url', '').startswith(('http://', 'https://')):
+                return finished
+            if self.resource_types and params.get('type') not in self.resource_types:
+                return finished
+            self.pending[request_id] = {'template': endpoint_template(request.get('method', 'GET'), request['url']),
+                                        'start': params['timestamp'], 'status': None, 'timing': None}
+            return finished
+        if request_id not in self.pending:
+            return 0
+        if method == 'Network.responseReceived':
+            self._response(request_id, params.get('response', {}))
+        elif method == 'Network.loadingFinished':
+            return self._finish(request_id, params['timestamp'], params.get('encodedDataLength', 0))
+        elif method == 'Network.loadingFailed':
+            if params.get('canceled'):
+                del self.pending[request_id]
+                return 0
+            return self._finish(request_id, params['timestamp'], 0, failed=True)
+        return 0
+
+    def _response(self, request_id, response):
+        pending = self.pending[request_id]
+        pending['status'] = response.get('status')
+        pending['timing'] = response.get('timing')
+
+    def _finish(self, request_id, timestamp, size, failed=False):
+        pending = self.pending.pop(request_id)
+        phases = {'total': max(0.0, timestamp - pending['start'])}
+        timing = pending['timing']
+        if timing:
+            # ResourceTiming offsets are ms from requestTime; -1 means the phase did not
+            # happen (e.g. a reused connection skips dns/connect/ssl)
+            for phase, start, end in (('dns', 'dnsStart', 'dnsEnd'), ('connect', 'connectStart', 'connectEnd'),
+                                      ('ssl', 'sslStart', 'sslEnd'), ('ttfb', 'sendEnd', 'receiveHeadersEnd')):
+                if timing.get(start, -1) >= 0 and timing.get(end, -1) >= 0:
+                    phases[phase] = max(0.0, timing[end] - timing[start]) / 1000.0
+            if timing.get('receiveHeadersEnd', -1) >= 0 and not failed:
+                headers_at = timing['requestTime'] + timing['receiveHeadersEnd'] / 1000.0
+                phases['download'] = max(0.0, timestamp - headers_at)
+        self.metrics.record(pending['template'], phases, pending['status'], failed, int(size or 0))
+        return 1
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from student_ppt_viewer import abandon_retries, finish_soak_iteration, generate_background_aspirations, log_print, session_number_for
+from step_metrics import StepTimer
+from log_pipeline import log_context
+from chat_metrics import classify_reply
+from scenarios import builtin_journey
+
+class ProtocolStepError(Exception):
+    """A protocol-level journey step failed (bad status or unexpected payload)"""
+
+    def __init__(self, failure_step, message):
+        super().__init__(message)
+        self.failure_step = failure_step
+
+def extract_items(payload):
+    """List of records from a list payload or a dict wrapping one ({'data': [...]} etc.)"""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in ('data', 'items', 'results', 'units', 'sessions'):
+            value = payload.get(key)
+            if isinstance(value, list):
+                return value
+            if isinstance(value, dict):
+                nested = extract_items(value)
+                if nested:
+                    return nested
+    return []
+
+def item_id(item, id_field):
+    return item.get(id_field) or item.get('_id') or item.get('id')
+
+def endpoint(config, key, **params):
+    return config['PROTOCOL_BASE_URL'].rstrip('/') + config[key].format(**params)
+
+async def request_json(http, method, url, failure_step, expected=(200, 201), **kwargs):
+    """Issue one request and return (status, parsed JSON or None); raise ProtocolStepError otherwise"""
+    async with http.request(method, url, **kwargs) as response:
+        body = await response.read()
+        if response.status not in expected:
+            raise ProtocolStepError(failure_step, f"{method} {url} returned HTTP {response.status}")
+        try:
+            return response.status, await response.json(content_type=None) if body else None
+        except ValueError:
+            return response.status, None
+
+async def stream_chat_reply(http, url, question, config, run):
+    """Send the chat question and time the streamed reply the same way the browser observer does
+
+    The reply gets CHAT_RESPONSE_TIMEOUT rather than the per-request timeout; a reply
+    still streaming then is 'incomplete', one that never started is 'empty'.
+    """
+    active_at_send = run.active_sessions()
+    reply_timeout = aiohttp.ClientTimeout(total=float(config.get('CHAT_RESPONSE_TIMEOUT', 120)),
+                                          sock_connect=float(config.get('ELEMENT_WAIT_TIMEOUT', 30)))
+    sent_at = time.monotonic()
+    first_at = last_at = None
+    first_chars = chars = 0
+    tail = b''
+    timed_out = False
+    async with http.post(url, json={'message': question}, timeout=reply_timeout) as response:
+        if response.status >= 400:
+            raise ProtocolStepError('CHATBOT_ERROR', f"POST {url} returned HTTP {response.status}")
+        try:
+            async for chunk in response.content.iter_any():
+                if not chunk:
+                    continue
+                last_at = time.monotonic()
+                if first_at is None:
+                    first_at = last_at
+                    first_chars = len(chunk)
+                chars += len(chunk)
+                tail = (tail + chunk)[-500:]
+        except asyncio.TimeoutError:
+            timed_out = True
+    if first_at is None:
+        observation = {'outcome': 'empty', 'first_token': None, 'full_response': None, 'chars_per_second': None, 'chars': 0}
+    else:
+        streaming_time = last_at - first_at
+        observation = {
+            'outcome': 'incomplete' if timed_out else classify_reply(tail.decode('utf-8', errors='replace'), config),
+            'first_token': first_at - sent_at,
+            'full_response': last_at - sent_at,
+            'chars_per_second': (chars - first_chars) / streaming_time if streaming_time > 0 else None,
+            'chars': chars,
+        }
+    run.chat_metrics.record(observation, active_at_send)
+    return observation
+
+async def protocol_login(http, student, config, run, timer):
+    """Log in (keeping the bearer token on the session) and submit aspirations for a student not yet onboarded"""
+    with timer.step('login_submit'):
+        _, payload = await request_json(http, 'POST', endpoint(config, 'PROTOCOL_LOGIN_ENDPOINT'),
+                                        'LOGIN_FORM', json={'email': student['email'], 'password': student['password']})
+        token = (payload or {}).get(config.get('PROTOCOL_TOKEN_FIELD', 'access_token'))
+        if token:
+            http.headers['Authorization'] = f"Bearer {token}"
+
+    # An already-onboarded student gets a conflict instead of the form. Like a missing form in
+    # the browser, a rejected submission is skipped: the student carries on, not onboarded.
+    if not student.get('onboarded'):
+        started = time.perf_counter()
+        try:
+            await request_json(http, 'POST', endpoint(config, 'PROTOCOL_ASPIRATIONS_ENDPOINT'), 'NAVIGATION',
+                               expected=(200, 201, 204, 409), json={'background': generate_background_aspirations(config)})
+        except ProtocolStepError as e:
+            log_print(f"Aspirations skipped: {e}")
+            return
+        timer.record('aspirations', time.perf_counter() - started)
+        if run.accounts is not None:
+            run.accounts.mark_onboarded(student['email'])
+
+async def protocol_open_session(http, config, timer, session_number):
+    """Enrolled units, then the first unit's session list; returns the student's session ID"""
+    id_field = config.get('PROTOCOL_ID_FIELD', 'id')
+    with timer.step('enrolled_units'):
+        _, payload = await request_json(http, 'GET', endpoint(config, 'PROTOCOL_UNITS_ENDPOINT'), 'NAVIGATION')
+        units = extract_items(payload)
+        if not units:
+            raise ProtocolStepError('NAVIGATION', "No enrolled units returned")
+        unit_id = item_id(units[0], id_field)
+
+    with timer.step('session_list'):
+        _, payload = await request_json(http, 'GET', endpoint(config, 'PROTOCOL_SESSIONS_ENDPOINT', unit_id=unit_id), 'NAVIGATION')
+        sessions = extract_items(payload)
+        if len(sessions) < session_number:
+            raise ProtocolStepError('NAVIGATION', f"Session {session_number} not listed ({len(sessions)} sessions)")
+        return item_id(sessions[session_number - 1], id_field)
+
+async def protocol_view_ppt(http, config, timer, session_id, step):
+    """Poll until the deck is generated, then view it for the step's duration (PROTOCOL_VIEWING_DURATION by default)"""
+    # PPT generation answers 202 while the deck is still being built
+    ppt_timeout = float(config.get('PROTOCOL_PPT_TIMEOUT', 1200))
+    ppt_poll = float(config.get('PROTOCOL_PPT_POLL_INTERVAL', 5))
+    with timer.step('ppt_container'):
+        deadline = time.monotonic() + ppt_timeout
+        while True:
+            status, _ = await request_json(http, 'GET', endpoint(config, 'PROTOCOL_PPT_ENDPOINT', session_id=session_id),
+                                           'PPT_CONTAINER', expected=(200, 202))
+            if status == 200:
+                break
+            if time.monotonic() + ppt_poll > deadline:
+                raise ProtocolStepError('PPT_CONTAINER', f"PPT not ready after {ppt_timeout:.0f}s")
+            await asyncio.sleep(ppt_poll)
+
+    if step.duration is None:
+        viewing_duration = float(config.get('PROTOCOL_VIEWING_DURATION', config.get('PPT_VIEWING_DURATION', 300)))
+    else:
+        viewing_duration = step.duration()
+    await asyncio.sleep(viewing_duration)
+
+async def protocol_chat(http, config, run, timer, session_id, step):
+    """Hold the step's conversation, timing every streamed reply"""
+    for turn, chat_question in enumerate(step.conversation()):
+        if turn and step.think:
+            await asyncio.sleep(step.think())
+        with timer.step('chat_message'):
+            observation = await stream_chat_reply(http, endpoint(config, 'PROTOCOL_CHAT_ENDPOINT', session_id=session_id),
+                                                  chat_question, config, run)
+        if observation['first_token'] is not None:
+            timer.record('chat_first_token', observation['first_token'])
+            timer.record('chat_response', observation['full_response'])
+        if observation['outcome'] != 'ok':
+            raise ProtocolStepError('CHATBOT_RESPONSE', f"AI reply was {observation['outcome']} (chars={observation['chars']})")
+
+async def run_protocol_session(student, config, student_index, connector, run, timer=None, scenario=None):
+    """Replay one student's scenario as HTTP calls; mirrors run_student_session's steps and failure records"""
+    start_time = time.monotonic()
+    session_number = session_number_for(student, run.accounts)
+    timer = timer or StepTimer(run.step_metrics, session=session_number)
+    scenario = scenario or builtin_journey(config)
+    request_timeout = aiohttp.ClientTimeout(total=float(config.get('ELEMENT_WAIT_TIMEOUT', 30)))
+
+    # Own cookie jar per virtual student, shared connection pool across all of them
+    async with aiohttp.ClientSession(connector=connector, connector_owner=False, timeout=request_timeout) as http:
+        try:
+            session_id = None
+            for step in scenario.steps:
+                if step.kind == 'login':
+                    await protocol_login(http, student, config, run, timer)
+                elif step.kind == 'open_session':
+                    session_id = await protocol_open_session(http, config, timer, session_number)
+                elif step.kind == 'view_ppt':
+                    await protocol_view_ppt(http, config, timer, session_id, step)
+                elif step.kind == 'chat':
+                    await protocol_chat(http, config, run, timer, session_id, step)
+                else:
+                    await asyncio.sleep(step.think())
+
+            duration = time.monotonic() - start_time
+            step_timings = ", ".join(f"{step}={seconds:.2f}s" for step, seconds in timer.durations.items())
+            attempt = f"attempt={timer.attempt}, " if timer.attempt else ""
+            logging.info(f"STEP_TIMINGS: {student['email']} - session={session_number}, {attempt}{step_timings}")
+            log_print(f"Student {student_index + 1} completed ({duration:.1f}s)")
+            return True
+
+        except ProtocolStepError as e:
+            log_print(f"Student {student_index + 1} failed: {e}")
+            logging.error(f"FAILURE_STEP_{e.failure_step}: {student['email']} - {e}")
+            return False
+        except asyncio.TimeoutError as e:
+            log_print(f"Student {student_index + 1} timeout: {e}")
+            logging.error(f"FAILURE_STEP_TIMEOUT: {student['email']} - request timed out")
+            return False
+        except aiohttp.ClientError as e:
+            log_print(f"Student {student_index + 1} error: {e}")
+            logging.error(f"FAILURE_STEP_UNEXPECTED: {student['email']} - {type(e).__name__}: {e}")
+            return False
+        except Exception as e:
+            # e.g. a payload of an unexpected shape; recorded like the browser engine's unexpected errors
+            log_print(f"Student {student_index + 1} error: {e}")
+            logging.error(f"FAILURE_STEP_UNEXPECTED: {student['email']} - {type(e).__name__}: {e}")
+            return False
+
+async def _sleep_while_admitting(run, seconds):
+    """Sleep, waking early once admissions close; True if they did"""
+    until = time.monotonic() + seconds
+    while not run.admissions_closed.is_set():
+        left = until - time.monotonic()
+        if left <= 0:
+            return False
+        await asyncio.sleep(min(left, 0.5))
+    return True
+
+async def _protocol_worker(student, config, student_index, total_students, connector, limiter, run, scheduled_offset, attempt=0):
+    async with limiter:
+        if run.admissions_closed.is_set():
+            run.record_cancelled()
+            return None
+        
+        # Hold the start while the load generator itself is saturated
+        while run.host_monitor and not run.host_monitor.try_admit():
+            if run.admissions_closed.is_set():
+                run.record_cancelled()
+                return None
+            await asyncio.sleep(run.host_monitor.interval / 2)
+
+        if run.arrivals and scheduled_offset is not None:
+            lag = run.arrivals.record_start(scheduled_offset)
+            if lag is not None:
+                log_print(f"WARNING: Harness behind schedule - student {student_index+1} started {lag:.1f}s late")
+                logging.warning(f"SCHEDULE_LAG: student={student_index+1}, lag={lag:.1f}s")
+
+        # Picked from a hash of the student, so a retry repeats the same scenario and session
+        scenario = run.scenarios.assign(student, run.accounts)
+        with log_context(student=student['email'], student_index=student_index + 1, attempt=attempt, scenario=scenario.name):
+            retry = f" (retry {attempt})" if attempt else ""
+            log_print(f"Starting student {student_index+1}/{total_students}{retry}: {student['email']}")
+            if run.retries:
+                run.retries.failures.begin(student['email'], attempt)
+            try:
+                timer = run.new_timer(student, attempt)
+                run.session_started()
+                try:
+                    success = await run_protocol_session(student, config, student_index, connector, run, timer, scenario)
+                finally:
+                    run.session_finished()
+                # Checkpoint appends and retry bookkeeping block; keep them off the event loop
+                loop = asyncio.get_running_loop()
+                if not await loop.run_in_executor(None, run.finish_attempt, student, student_index, attempt, success, timer):
+                    return None
+                done, successful, failed = run.record_result(success, student)
+                progress = (done / total_students) * 100
+                log_print(f"Progress: {done}/{total_students} ({progress:.1f}%) - Success: {successful}, Failed: {failed}",
+                          event='progress', outcome='success' if success else 'failed')
+                return success
+            finally:
+                # Runs on deadline cancellation too, when the attempt is never classified
+                if run.retries:
+                    run.retries.failures.discard(student['email'], attempt)
+
+async def _run_protocol_batch(students, config, run, max_concurrency, schedule):
+    total_students = len(students) + run.restored
+    limiter = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, ttl_dns_cache=300)
+    tasks = []
+    try:
+        for i, student in enumerate(students):
+            if run.remaining() == 0 or run.admissions_closed.is_set():
+                break
+            if schedule is not None:
+                delay = run.start_time + schedule[i] - time.monotonic()
+                remaining = run.remaining()
+                if remaining is not None and delay > remaining:
+                    await _sleep_while_admitting(run, remaining)
+                    break
+                if delay > 0 and await _sleep_while_admitting(run, delay):
+                    break
+                run.arrivals.record_scheduled()
+            offset = schedule[i] if schedule is not None else None
+            attempt = run.prior_attempts.get(student['email'], 0)
+            tasks.append(asyncio.create_task(
+                _protocol_worker(student, config, run.restored + i, total_students, connector, limiter, run, offset, attempt)))
+        submitted = len(tasks)
+
+        # Wait for the students, starting queued retries as their backoff runs out
+        pending = set(tasks)
+        while True:
+            retrying = run.retries and not run.admissions_closed.is_set()
+            for student, index, attempt in (run.retries.pop_due() if retrying else []):
+                task = asyncio.create_task(
+                    _protocol_worker(student, config, index, total_students, connector, limiter, run, None, attempt))
+                tasks.append(task)
+                pending.add(task)
+            next_retry = run.retries.next_due_in() if retrying else None
+            remaining = run.remaining()
+            if (not pending and next_retry is None) or remaining == 0:
+                break
+            if not pending:
+                await asyncio.sleep(next_retry if remaining is None else min(next_retry, remaining))
+                continue
+            timeout = min([t for t in (remaining, next_retry) if t is not None], default=None)
+            _, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if pending:
+            log_print(f"Execution timeout reached: cancelling {len(pending)} unfinished students")
+            run.stop_event.set()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for _ in pending:
+                run.record_cancelled()
+        abandon_retries(run)
+        for _ in range(len(students) - submitted):
+            run.record_cancelled()
+    finally:
+        await connector.close()
+
+def run_protocol_batch(students, config, run, max_concurrency, schedule=None):
+    """Run every student as a browserless virtual student on one asyncio event loop"""
+    asyncio.run(_run_protocol_batch(students, config, run, max_concurrency, schedule))
+
+async def _protocol_soak_worker(student, config, student_index, total_students, connector, run):
+    iteration = 0
+    while not run.admissions_closed.is_set() and run.soak.remaining() > 0:
+        # Hold the next cycle while the load generator itself is saturated
+        if run.host_monitor and not run.host_monitor.try_admit():
+            await asyncio.sleep(run.host_monitor.interval / 2)
+            continue
+        iteration += 1
+        scenario = run.scenarios.assign(student, run.accounts, iteration)
+        with log_context(student=student['email'], student_index=student_index + 1, iteration=iteration, scenario=scenario.name):
+            log_print(f"Starting student {student_index+1}/{total_students} iteration {iteration}: {student['email']}")
+            started = time.monotonic()
+            run.session_started()
+            try:
+                success = await run_protocol_session(student, config, student_index, connector, run, scenario=scenario)
+            finally:
+                run.session_finished()
+            if not success and run.stop_event.is_set():
+                run.record_cancelled()
+                break
+            finish_soak_iteration(run, student, success, time.monotonic() - started)
+        await _sleep_while_admitting(run, run.soak.think_time())
+
+async def _run_protocol_soak(students, config, run):
+    connector = aiohttp.TCPConnector(limit=len(students), ttl_dns_cache=300)
+    try:
+        tasks = [asyncio.create_task(_protocol_soak_worker(student, config, i, len(students), connector, run))
+                 for i, student in enumerate(students)]
+        _, pending = await asyncio.wait(tasks, timeout=run.remaining())
+        if pending:
+            log_print(f"Soak drain timeout reached: cancelling {len(pending)} running iterations")
+            run.stop_event.set()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for _ in pending:
+                run.record_cancelled()
+    finally:
+        await connector.close()
+
+def run_protocol_soak(students, config, run):
+    """Cycle a fixed set of virtual students through the journey until SOAK_DURATION is over"""
+    asyncio.run(_run_protocol_soak(students, config, run))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+
+from step_metrics import parse_failure
+
+# Failure categories that usually clear up on their own: slow pages, a busy PPT or chat backend
+TRANSIENT_CATEGORIES = ('TIMEOUT', 'STUDENT_BUTTON', 'PPT_CONTAINER', 'CHATBOT_TIMEOUT', 'CHATBOT_ERROR')
+
+# Exception types (as logged in FAILURE_STEP_UNEXPECTED details) caused by the browser,
+# chromedriver or the network rather than by the account or the page itself
+TRANSIENT_EXCEPTIONS = re.compile(r"\b(TimeoutException|TimeoutError|WebDriverException|InvalidSessionIdException|"
+                                  r"StaleElementReferenceException|ConnectionError|ConnectionResetError|"
+                                  r"ClientConnectorError|ClientOSError|ServerDisconnectedError|ClientPayloadError)\b")
+
+# Throttling and server errors are worth another try whichever step they hit
+TRANSIENT_STATUS = re.compile(r"\bHTTP (429|5\d\d)\b")
+
+def classify_failure(category, detail='', transient_categories=TRANSIENT_CATEGORIES):
+    """'transient' or 'deterministic' for an attempt's first FAILURE_STEP_* record
+
+    A failed attempt with no record at all (e.g. Chrome did not start) is transient.
+    """
+    if category is None:
+        return 'transient'
+    if TRANSIENT_STATUS.search(detail or ''):
+        return 'transient'
+    if category == 'UNEXPECTED':
+        return 'transient' if TRANSIENT_EXCEPTIONS.search(detail or '') else 'deterministic'
+    return 'transient' if category in transient_categories else 'deterministic'
+
+class AttemptFailures(logging.Handler):
+    """Remembers the first FAILURE_STEP_* record of each student's current attempt"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.failures = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def begin(self, email, attempt=0):
+        with self._lock:
+            self.failures[email] = None
+            self._attempts[email] = attempt
+
+    def emit(self, record):
+        failure = parse_failure(record.getMessage())
+        if not failure:
+            return
+        category, email, detail = failure
+        with self._lock:
+            # Later records in the same attempt are re-raised wrappers of the first
+            if email in self.failures and self.failures[email] is None:
+                self.failures[email] = (category, detail)
+
+    def finish(self, email):
+        """(category, detail) of the attempt that just ended, or (None, '') if it logged none"""
+        with self._lock:
+            self._attempts.pop(email, None)
+            return self.failures.pop(email, None) or (None, '')
+
+    def discard(self, email, attempt=0):
+        """Forget an attempt that ended without being classified (a success, or cancelled by the deadline)
+
+        A retry of the same student may already have begun by the time the worker's
+        cleanup runs, so only the entry for `attempt` itself is dropped.
+        """
+        with self._lock:
+            if email in self._attempts and self._attempts[email] == attempt:
+                del self._attempts[email]
+                self.failures.pop(email, None)
+
+class RetryQueue:
+    """Failed students waiting out their backoff before another attempt
+
+    Only transient failures are queued, at most RETRY_MAX_ATTEMPTS retries per student,
+    with exponential backoff (RETRY_BACKOFF x RETRY_BACKOFF_FACTOR^n, capped at
+    RETRY_BACKOFF_MAX, with jitter so retried students do not arrive in lockstep).
+    """
+
+    def __init__(self, config):
+        self.max_attempts = int(config.get('RETRY_MAX_ATTEMPTS', 2))
+        self.backoff = float(config.get('RETRY_BACKOFF', 30))
+        self.factor = float(config.get('RETRY_BACKOFF_FACTOR', 2))
+        self.max_backoff = float(config.get('RETRY_BACKOFF_MAX', 300))
+        categories = config.get('RETRY_TRANSIENT_CATEGORIES')
+        self.transient_categories = (tuple(c.strip().upper() for c in categories.split(',') if c.strip())
+                                     if categories is not None else TRANSIENT_CATEGORIES)
+        self.failures = AttemptFailures()
+        self.queued = 0
+        self.by_class = {'transient': 0, 'deterministic': 0}
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        """Backoff before retry number `attempt` (1-based)"""
+        base = min(self.max_backoff, self.backoff * self.factor ** (attempt - 1))
+        return base * random.uniform(0.75, 1.25)
+
+    def classify(self, email):
+        """Classification and first failure record of the attempt that just ended"""
+        category, detail = self.failures.finish(email)
+        kind = classify_failure(category, detail, self.transient_categories)
+        with self._lock:
+            self.by_class[kind] += 1
+        return kind, category
+
+    def offer(self, student, index, attempt, kind):
+        """Queue a retry after a failed attempt; False when the failure is final"""
+        if kind != 'transient' or attempt >= self.max_attempts:
+            return False
+        due = time.monotonic() + self.delay(attempt + 1)
+        with self._lock:
+            heapq.heappush(self._heap, (due, next(self._order), student, index, attempt + 1))
+            self.queued += 1
+        return True
+
+    def pop_due(self):
+        """Every (student, index, attempt) whose backoff has elapsed"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, student, index, attempt = heapq.heappop(self._heap)
+                due.append((student, index, attempt))
+        return due
+
+    def next_due_in(self):
+        """Seconds until the next queued retry is due (None when the queue is empty)"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def drain(self):
+        """Remove and return everything still waiting, e.g. when the deadline passes"""
+        with self._lock:
+            pending = [(student, index, attempt) for _, _, student, index, attempt in self._heap]
+            self._heap.clear()
+        return pending
+
+def retries_enabled(config):
+    return int(config.get('RETRY_MAX_ATTEMPTS', 2)) > 0
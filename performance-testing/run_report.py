@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import html
+import json
+import math
+import os
+import re
+import sys
+from datetime import datetime
+
+from log_pipeline import log_parts, open_log
+from step_metrics import FAILURE_WRAP_SECONDS, PERCENTILES, STUDENT_STEPS, StepMetrics, normal_sf, parse_failure
+from student_ppt_viewer import apply_config_overrides, load_config
+
+LOG_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - (\w+) - (.*)$")
+STEP_TIMING = re.compile(r"(\w+)=([\d.]+)s")
+KEY_VALUE = re.compile(r"(\w+)=([^,\s]+)")
+
+def parse_key_values(text):
+    """{'total': '200', 'rate': '86.5%', ...} from 'total=200, rate=86.5%, ...'"""
+    return dict(KEY_VALUE.findall(text))
+
+def number(value):
+    return float(value.rstrip('%s'))
+
+class RunReport:
+    """Everything the report needs from one run, built by streaming its log line by line"""
+
+    def __init__(self):
+        self.sources = []
+        self.step_metrics = StepMetrics()
+        self.timing_metrics = StepMetrics()
+        self.metrics_files = []
+        self.failures_by_step = {}
+        self.failure_records = {}
+        self.throughput = {}
+        self.batch = {'total': 0, 'success': 0, 'failed': 0, 'cancelled': 0, 'concurrency': 0, 'duration': 0.0}
+        self.chat_rows = []
+        self.network_rows = []
+        self.saturation_periods = []
+        self.host = []
+        self.retries = []
+        self.soak_drift = []
+        self.sla = []
+        self.scenarios = []
+        self.locators = []
+        self.first_seen = None
+        self.last_seen = None
+        self._last_failure = {}
+
+    def _minute(self, stamp):
+        return self.throughput.setdefault(stamp[:16], {'started': 0, 'success': 0, 'failed': 0})
+
+    def add_line(self, line, source):
+        match = LOG_LINE.match(line)
+        if not match:
+            return
+        stamp, _, message = match.groups()
+        self.first_seen = self.first_seen or stamp
+        self.last_seen = stamp
+
+        if message.startswith("Starting student "):
+            self._minute(stamp)['started'] += 1
+        elif message.startswith("STEP_TIMINGS: "):
+            self._minute(stamp)['success'] += 1
+            session = re.search(r"session=(\d+)", message)
+            session = int(session.group(1)) if session else None
+            # Retried attempts are summarised separately (RETRY_SUMMARY)
+            if re.search(r"attempt=[1-9]", message):
+                return
+            for step, seconds in STEP_TIMING.findall(message.split(' - ', 1)[-1]):
+                self.timing_metrics.record(step, float(seconds), session)
+        elif message.startswith("FAILURE_STEP_"):
+            failure = parse_failure(message)
+            if failure:
+                self._add_failure(stamp, *failure)
+        elif message.startswith("BATCH_SUMMARY: "):
+            values = parse_key_values(message.split(': ', 1)[1])
+            for key in ('total', 'success', 'failed', 'cancelled', 'concurrency'):
+                self.batch[key] += int(number(values.get(key, '0')))
+            self.batch['duration'] = max(self.batch['duration'], number(values.get('duration', '0')))
+        elif message.startswith("CHAT_LATENCY: "):
+            row = json.loads(message.split(': ', 1)[1])
+            row['source'] = source
+            self.chat_rows.append(row)
+        elif message.startswith("LOCATOR_STATS: "):
+            self.locators.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("NETWORK_LATENCY: "):
+            row = json.loads(message.split(': ', 1)[1])
+            row['source'] = source
+            self.network_rows.append(row)
+        elif message.startswith("HOST_SATURATION: "):
+            period = parse_key_values(message.split(': ', 1)[1])
+            period['source'] = source
+            self.saturation_periods.append(period)
+        elif message.startswith("RETRY_SUMMARY: "):
+            self.retries.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("SLA_VERDICT: "):
+            self.sla.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("SCENARIO_SUMMARY: "):
+            self.scenarios.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("SOAK_DRIFT: "):
+            self.soak_drift.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("HOST_SUMMARY: "):
+            self.host.append(dict(json.loads(message.split(': ', 1)[1]), source=source))
+        elif message.startswith("Step metrics: "):
+            self.metrics_files.append(message.split(': ', 1)[1].strip())
+
+    def _add_failure(self, stamp, category, email, detail):
+        moment = datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S')
+        previous = self._last_failure.get(email)
+        self._last_failure[email] = moment
+        if previous and (moment - previous).total_seconds() <= FAILURE_WRAP_SECONDS:
+            return
+        self.failures_by_step[category] = self.failures_by_step.get(category, 0) + 1
+        self._minute(stamp)['failed'] += 1
+        example = self.failure_records.setdefault(category, [])
+        if len(example) < 5:
+            example.append({'time': stamp, 'email': email, 'detail': detail[:300]})
+
+    def add_log(self, path):
+        """Stream one log into the report, including its rotated (possibly gzipped) older segments"""
+        self.sources.append(path)
+        for part in log_parts(path):
+            with open_log(part) as f:
+                for line in f:
+                    self.add_line(line.rstrip('\n'), path)
+
+    def finish(self):
+        """Prefer the saved step histograms (they include failed students' completed steps) over STEP_TIMINGS"""
+        loaded = 0
+        for path in self.metrics_files:
+            if os.path.exists(path):
+                self.step_metrics.merge(StepMetrics.load(path))
+                loaded += 1
+        if not loaded:
+            self.step_metrics = self.timing_metrics
+        return self
+
+    def saturated_minutes(self):
+        """Minutes (as throughput keys) that overlap a load-generator saturation period"""
+        minutes = set()
+        for period in self.saturation_periods:
+            for minute in self.throughput:
+                if period['start'][:16].replace('T', ' ') <= minute <= period['end'][:16].replace('T', ' '):
+                    minutes.add(minute)
+        return minutes
+
+    def success_rate(self):
+        return self.batch['success'] / self.batch['total'] if self.batch['total'] else None
+
+    def to_dict(self):
+        saturated = self.saturated_minutes()
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'sources': self.sources,
+            'run_started': self.first_seen,
+            'run_ended': self.last_seen,
+            'batch': dict(self.batch, success_rate=self.success_rate()),
+            'step_latency': [row for row in self.step_metrics.rows() if row['session'] == 'all'],
+            'step_latency_by_session': [row for row in self.step_metrics.rows() if row['session'] != 'all'],
+            'failures_by_step': dict(sorted(self.failures_by_step.items(), key=lambda item: -item[1])),
+            'failure_examples': self.failure_records,
+            'throughput_per_minute': [dict(minute=minute, saturated=minute in saturated, **counts)
+                                      for minute, counts in sorted(self.throughput.items())],
+            'load_generator': {
+                'hosts': self.host,
+                'saturation_periods': self.saturation_periods,
+                'failures_while_saturated': sum(self.throughput[minute]['failed'] for minute in saturated),
+            },
+            'retries': self.retries,
+            'soak_drift': self.soak_drift,
+            'sla': self.sla,
+            'scenarios': self.scenarios,
+            'chat_latency': self.chat_rows,
+            'locators': self.locators,
+            'network_latency': self.network_rows,
+            'step_metrics': self.step_metrics.to_dict(),
+        }
+
+def success_rate_test(current, baseline):
+    """One-sided two-proportion z-test that the current success rate is lower; returns p-value"""
+    n1, n2 = current['total'], baseline['total']
+    if not n1 or not n2:
+        return None
+    p1, p2 = current['success'] / n1, baseline['success'] / n2
+    pooled = (current['success'] + baseline['success']) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    if se == 0:
+        return 1.0 if p1 >= p2 else 0.0
+    return normal_sf((p2 - p1) / se)
+
+def latency_shift_test(current, baseline):
+    """One-sided Mann-Whitney U test (normal approximation) that current latencies are higher
+
+    Works directly on the log buckets of two histograms, treating values in the
+    same bucket as ties, so no raw samples are needed. Returns the p-value.
+    """
+    n1, n2 = current.count, baseline.count
+    if not n1 or not n2:
+        return None
+    u = 0.0
+    below = 0
+    tie_term = 0
+    for index in sorted(set(current.buckets) | set(baseline.buckets)):
+        mine, theirs = current.buckets.get(index, 0), baseline.buckets.get(index, 0)
+        u += mine * (below + 0.5 * theirs)
+        below += theirs
+        tied = mine + theirs
+        tie_term += tied ** 3 - tied
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    return normal_sf((u - n1 * n2 / 2.0) / math.sqrt(variance))
+
+def compare_runs(current, baseline, config):
+    """Flag statistically significant regressions of the current report against a baseline report"""
+    alpha = float(config.get('REPORT_SIGNIFICANCE', 0.05))
+    min_change = float(config.get('REPORT_MIN_LATENCY_CHANGE', 0.10))
+    min_samples = int(config.get('REPORT_MIN_SAMPLES', 20))
+    comparison = {'baseline_sources': baseline['sources'], 'alpha': alpha, 'steps': [], 'regressions': []}
+
+    p_value = success_rate_test(current['batch'], baseline['batch'])
+    rate = {'metric': 'success_rate', 'current': current['batch']['success_rate'],
+            'baseline': baseline['batch']['success_rate'], 'p_value': p_value}
+    rate['regression'] = p_value is not None and p_value < alpha
+    comparison['success_rate'] = rate
+    if rate['regression']:
+        comparison['regressions'].append(f"success rate {rate['baseline']:.1%} -> {rate['current']:.1%} (p={p_value:.4f})")
+
+    ours = StepMetrics.from_dict(current['step_metrics']).histograms
+    theirs = StepMetrics.from_dict(baseline['step_metrics']).histograms
+    order = {step: i for i, step in enumerate(STUDENT_STEPS)}
+    for key in sorted(set(ours) & set(theirs), key=lambda k: (order.get(k.split('|')[0], len(order)), k)):
+        step, session = key.split('|', 1)
+        if session != 'all':
+            continue
+        now, before = ours[key], theirs[key]
+        row = {'step': step, 'current_count': now.count, 'baseline_count': before.count}
+        for pct in (50, 95):
+            row[f'current_p{pct}_ms'] = round(now.percentile(pct), 1)
+            row[f'baseline_p{pct}_ms'] = round(before.percentile(pct), 1)
+        changes = [row[f'current_p{pct}_ms'] / row[f'baseline_p{pct}_ms'] - 1
+                   for pct in (50, 95) if row[f'baseline_p{pct}_ms']]
+        row['change'] = round(max(changes), 3) if changes else None
+        row['p_value'] = latency_shift_test(now, before) if min(now.count, before.count) >= min_samples else None
+        row['regression'] = (row['p_value'] is not None and row['p_value'] < alpha
+                             and row['change'] is not None and row['change'] >= min_change)
+        comparison['steps'].append(row)
+        if row['regression']:
+            comparison['regressions'].append(
+                f"{step} p50 {row['baseline_p50_ms']:.0f} -> {row['current_p50_ms']:.0f} ms, "
+                f"p95 {row['baseline_p95_ms']:.0f} -> {row['current_p95_ms']:.0f} ms (p={row['p_value']:.4f})")
+    return comparison
+
+def _table(headers, rows, highlight=None):
+    cells = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    body = []
+    for row in rows:
+        css = ' class="bad"' if highlight and highlight(row) else ''
+        body.append(f"<tr{css}>" + "".join(f"<td>{html.escape('' if v is None else str(v))}</td>" for v in row) + "</tr>")
+    return f"<table><tr>{cells}</tr>{''.join(body)}</table>"
+
+def _throughput_svg(minutes):
+    if not minutes:
+        return "<p>No completions recorded.</p>"
+    width, height, bar = max(300, 14 * len(minutes)), 160, 12
+    peak = max(m['success'] + m['failed'] for m in minutes) or 1
+    bars = []
+    for i, m in enumerate(minutes):
+        if m.get('saturated'):
+            bars.append(f'<rect x="{i * 14 - 1}" y="0" width="14" height="{height}" fill="#ddd"><title>{m["minute"]}: load generator saturated</title></rect>')
+        ok_h = m['success'] / peak * (height - 20)
+        fail_h = m['failed'] / peak * (height - 20)
+        x = i * 14
+        bars.append(f'<rect x="{x}" y="{height - ok_h:.1f}" width="{bar}" height="{ok_h:.1f}" fill="#3a3"><title>{m["minute"]}: {m["success"]} ok</title></rect>')
+        bars.append(f'<rect x="{x}" y="{height - ok_h - fail_h:.1f}" width="{bar}" height="{fail_h:.1f}" fill="#c33"><title>{m["minute"]}: {m["failed"]} failed</title></rect>')
+    return (f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">{"".join(bars)}</svg>'
+            f'<p>{html.escape(minutes[0]["minute"])} to {html.escape(minutes[-1]["minute"])}, peak {peak} completions/minute'
+            f'{"; grey = load generator saturated" if any(m.get("saturated") for m in minutes) else ""}</p>')
+
+def render_html(report):
+    """Self-contained static HTML page for a report dict"""
+    batch = report['batch']
+    rate = f"{batch['success_rate']:.1%}" if batch['success_rate'] is not None else "n/a"
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>AI Tutor Load Test Report</title><style>",
+        "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin:1em 0}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}th{background:#eee}"
+        "tr.bad td{background:#fdd}.verdict{font-weight:bold}",
+        "</style></head><body>",
+        "<h1>AI Tutor Load Test Report</h1>",
+        f"<p>Run {html.escape(str(report['run_started']))} to {html.escape(str(report['run_ended']))}"
+        f" &middot; sources: {html.escape(', '.join(report['sources']))}</p>",
+        "<h2>Summary</h2>",
+        _table(['students', 'success', 'failed', 'cancelled', 'success rate', 'concurrency', 'duration (s)'],
+               [[batch['total'], batch['success'], batch['failed'], batch['cancelled'], rate,
+                 batch['concurrency'], batch['duration']]]),
+    ]
+    for mix in report.get('scenarios', []):
+        parts.append(f"<h2>Scenario mix ({html.escape(mix['file'])})</h2>")
+        parts.append(_table(['scenario', 'weight', 'share', 'success', 'failed', 'success rate'],
+                            [[r['scenario'], f"{r['weight']:.1%}", f"{r['share']:.1%}" if r['share'] is not None else None,
+                              r['success'], r['failed'], f"{r['success_rate']:.1%}" if r['success_rate'] is not None else None]
+                             for r in mix['scenarios']]))
+    for verdict in report.get('sla', []):
+        parts.append(f"<h2>SLA verdict: {html.escape(verdict['status'].upper())}</h2>")
+        if verdict['abort_reason']:
+            parts.append(f"<p class='verdict'>Aborted: {html.escape(verdict['abort_reason'])}</p>")
+        if verdict['failures']:
+            parts.append("<ul>" + "".join(f"<li>{html.escape(f)}</li>" for f in verdict['failures']) + "</ul>")
+        parts.append(_table(['threshold', 'limit', 'worst window', 'breached checks', 'longest streak', 'whole run'],
+                            [[name, (verdict['checks'].get(name) or verdict['overall'][name])['limit'],
+                              verdict['checks'].get(name, {}).get('worst'),
+                              f"{verdict['checks'][name]['breached_checks']}/{verdict['checks'][name]['checks']}" if name in verdict['checks'] else None,
+                              verdict['checks'].get(name, {}).get('longest_streak'), verdict['overall'].get(name, {}).get('value')]
+                             for name in sorted(set(verdict['checks']) | set(verdict['overall']))],
+                            lambda row: row[4] or verdict['overall'].get(row[0], {}).get('breached')))
+    comparison = report.get('comparison')
+    if comparison:
+        parts.append("<h2>Comparison with baseline</h2>")
+        verdict = "REGRESSION" if comparison['regressions'] else "No significant regression"
+        parts.append(f"<p class='verdict'>{verdict} (alpha={comparison['alpha']})</p>")
+        if comparison['regressions']:
+            parts.append("<ul>" + "".join(f"<li>{html.escape(r)}</li>" for r in comparison['regressions']) + "</ul>")
+        sr = comparison['success_rate']
+        parts.append(_table(['metric', 'baseline', 'current', 'p-value'],
+                            [[sr['metric'], sr['baseline'], sr['current'], sr['p_value'] and round(sr['p_value'], 4)]],
+                            lambda row: sr['regression']))
+        parts.append(_table(['step', 'baseline n', 'current n', 'baseline p50', 'current p50',
+                             'baseline p95', 'current p95', 'change', 'p-value'],
+                            [[r['step'], r['baseline_count'], r['current_count'], r['baseline_p50_ms'], r['current_p50_ms'],
+                              r['baseline_p95_ms'], r['current_p95_ms'],
+                              f"{r['change']:+.1%}" if r['change'] is not None else None,
+                              round(r['p_value'], 4) if r['p_value'] is not None else None]
+                             for r in comparison['steps']],
+                            lambda row: any(r['step'] == row[0] and r['regression'] for r in comparison['steps'])))
+    parts.append("<h2>Step latency (ms)</h2>")
+    parts.append(_table(['step', 'count', 'failures', 'mean'] + [f'p{p}' for p in PERCENTILES] + ['max'],
+                        [[r['step'], r['count'], r['failures'], r.get('mean_ms')] + [r.get(f'p{p}_ms') for p in PERCENTILES] + [r.get('max_ms')]
+                         for r in report['step_latency']]))
+    locators = report.get('locators', [])
+    if locators:
+        parts.append("<h2>Element locators (ms)</h2>")
+        broken = sorted({r['locator'] for r in locators if r['fallback']})
+        if broken:
+            parts.append(f"<p class='verdict'>Fallback locators used for {html.escape(', '.join(broken))}: the configured "
+                         f"locator found nothing there and needs updating. Those steps still timed the real element, "
+                         f"so their latency is not locator breakage.</p>")
+        parts.append(_table(['source', 'locator', 'lookups', 'primary', 'fallback', 'timeouts', 'not ready',
+                             'wait p50', 'wait p95', 'query p95', 'fallbacks matched'],
+                            [[r['source'], r['locator'], r['lookups'], r['primary'], r['fallback'], r['timeouts'], r['not_ready'],
+                              r['wait_p50_ms'], r['wait_p95_ms'], r['query_p95_ms'],
+                              '; '.join(f"{c} ({n})" for c, n in r['fallbacks_matched'].items()) or None]
+                             for r in locators],
+                            lambda row: row[4] or row[5]))
+    parts.append("<h2>Failures by step</h2>")
+    parts.append(_table(['category', 'students'], list(report['failures_by_step'].items())) if report['failures_by_step'] else "<p>No failures.</p>")
+    parts.append("<h2>Throughput (completions per minute)</h2>")
+    parts.append(_throughput_svg(report['throughput_per_minute']))
+    generator = report['load_generator']
+    if generator['hosts'] or generator['saturation_periods']:
+        parts.append("<h2>Load generator</h2>")
+        parts.append(_table(['source', 'browser mode', 'cores', 'peak CPU %', 'peak memory %', 'saturated s', 'cores/student',
+                             'RSS MB/student', 'PSS MB/student', 'students/core', 'students by memory'],
+                            [[h['source'], h.get('browser_mode'), h['cores'], h['peak_cpu_percent'], h['peak_memory_percent'],
+                              h['saturated_seconds'], h['cpu_cores_per_student'], h['rss_mb_per_student'],
+                              h.get('pss_mb_per_student'), h['students_per_core'], h['max_students_by_memory']]
+                             for h in generator['hosts']]))
+        if generator['saturation_periods']:
+            parts.append(f"<p class='verdict'>Load generator saturated - {generator['failures_while_saturated']} failures "
+                         f"fell in saturated minutes and may be caused by the harness.</p>")
+            parts.append(_table(['start', 'end', 'duration', 'peak CPU', 'peak memory', 'min admission limit'],
+                                [[p.get('start'), p.get('end'), p.get('duration'), p.get('peak_cpu'), p.get('peak_memory'),
+                                  p.get('min_limit')] for p in generator['saturation_periods']],
+                                lambda row: True))
+    if report.get('retries'):
+        parts.append("<h2>First attempts vs retries</h2>")
+        parts.append(_table(['source', 'first ok', 'first failed', 'retry ok', 'retry failed', 'transient', 'deterministic'],
+                            [[r['source'], r['first_attempts']['success'], r['first_attempts']['failed'],
+                              r['retries']['success'], r['retries']['failed'],
+                              r.get('failures_by_class', {}).get('transient'), r.get('failures_by_class', {}).get('deterministic')]
+                             for r in report['retries']]))
+        retry_steps = [dict(row, source=r['source']) for r in report['retries'] for row in r['step_latency']]
+        if retry_steps:
+            parts.append(_table(['source', 'retried step', 'count', 'failures', 'p50', 'p95'],
+                                [[row['source'], row['step'], row['count'], row['failures'], row.get('p50_ms'), row.get('p95_ms')]
+                                 for row in retry_steps]))
+    if report.get('soak_drift'):
+        parts.append("<h2>Soak drift (trend across time windows)</h2>")
+        drifting = [f"{r['step']} {r['metric']}" for r in report['soak_drift'] if r['drift']]
+        if drifting:
+            parts.append(f"<p class='verdict'>Significant drift in {html.escape(', '.join(drifting))}</p>")
+        parts.append(_table(['source', 'step', 'metric', 'windows', 'first', 'last', 'slope/hour', 'change', 'p-value'],
+                            [[r['source'], r['step'], r['metric'], r['windows'], r['first'], r['last'], r['slope_per_hour'],
+                              f"{r['change_pct']:+.0f}%" if r['change_pct'] is not None else r['change'], r['p_value']]
+                             for r in report['soak_drift']],
+                            lambda row: any(r['step'] == row[1] and r['metric'] == row[2] and r['drift'] for r in report['soak_drift'])))
+    if report['chat_latency']:
+        parts.append("<h2>AI chat responses (ms, by active sessions)</h2>")
+        parts.append(_table(['concurrency', 'ok', 'error', 'empty', 'incomplete', 'ttft p50', 'ttft p95', 'full p50', 'full p95'],
+                            [[r['concurrency'], r['ok'], r['error'], r['empty'], r['incomplete'],
+                              r.get('first_token_p50_ms'), r.get('first_token_p95_ms'),
+                              r.get('full_response_p50_ms'), r.get('full_response_p95_ms')] for r in report['chat_latency']]))
+    if report['network_latency']:
+        parts.append("<h2>Network requests by endpoint (ms)</h2>")
+        parts.append(_table(['endpoint', 'requests', 'errors', 'p50', 'p95', 'dns p95', 'connect p95', 'ttfb p95', 'download p95'],
+                            [[r['endpoint'], r['requests'], r['errors'], r.get('total_p50_ms'), r.get('total_p95_ms'),
+                              r.get('dns_p95_ms'), r.get('connect_p95_ms'), r.get('ttfb_p95_ms'), r.get('download_p95_ms')]
+                             for r in report['network_latency']],
+                            lambda row: row[2]))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+def latest_log():
+    logs = glob.glob(os.path.join("logs", "student_ppt_viewer_*.log"))
+    return max(logs, key=os.path.getmtime) if logs else None
+
+def main():
+    parser = argparse.ArgumentParser(description='AI Tutor Load Test - Run Report and Regression Check')
+    parser.add_argument('logs', nargs='*', help='Run log(s) to report on; several logs (e.g. distributed workers) are merged. Default: latest student_ppt_viewer log')
+    parser.add_argument('--baseline', default=os.path.join("results", "summary", "baseline.json"), help='Baseline report to compare against, if it exists')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline for later comparisons')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='Override any config value, e.g. --set REPORT_SIGNIFICANCE=0.01 (repeatable)')
+    args = parser.parse_args()
+
+    config = apply_config_overrides(load_config(), args.set)
+    logs = args.logs or [path for path in [latest_log()] if path]
+    if not logs:
+        print("ERROR: No run logs found in logs/")
+        return 1
+
+    run = RunReport()
+    for path in logs:
+        print(f"Reading {path}")
+        run.add_log(path)
+    report = run.finish().to_dict()
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare_runs(report, json.load(f), config)
+
+    stamp = (report['run_started'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S')).replace('-', '').replace(':', '').replace(' ', '_')
+    os.makedirs(os.path.join("results", "summary"), exist_ok=True)
+    os.makedirs(os.path.join("results", "reports"), exist_ok=True)
+    json_file = os.path.join("results", "summary", f"report_{stamp}.json")
+    html_file = os.path.join("results", "reports", f"report_{stamp}.html")
+    with open(json_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(html_file, 'w', encoding='utf-8') as f:
+        f.write(render_html(report))
+    print(f"JSON report: {json_file}")
+    print(f"HTML report: {html_file}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+
+    comparison = report.get('comparison')
+    if comparison:
+        if comparison['regressions']:
+            print("REGRESSIONS against baseline:")
+            for regression in comparison['regressions']:
+                print(f"  {regression}")
+            return 2
+        print("No significant regression against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
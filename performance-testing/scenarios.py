@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+import bisect
+import itertools
+import json
+import math
+import random
+import zlib
+
+# Journey actions a scenario strings together, in the order they can happen
+STEP_KINDS = ('login', 'open_session', 'view_ppt', 'chat', 'think')
+
+DEFAULT_QUESTION = 'how will mba benefit my career?'
+
+def unit_draw(key, seed=''):
+    """Deterministic number in [0, 1) for a key: the same student gets the same draw on every retry and resume"""
+    return zlib.crc32(f"{seed}:{key}".encode('utf-8')) / 4294967296.0
+
+def compile_distribution(spec, where):
+    """Zero-argument sampler in seconds for a think time or viewing duration
+
+    A number is a constant. Objects name a distribution:
+    {"dist": "uniform", "min": 5, "max": 30}, {"dist": "exponential", "mean": 10},
+    {"dist": "normal", "mean": 10, "stdev": 3}, {"dist": "lognormal", "median": 8, "sigma": 0.5}.
+    Samples are never negative, and an optional "cap" bounds the long tail.
+    """
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        value = max(0.0, float(spec))
+        return lambda: value
+    if not isinstance(spec, dict):
+        raise ValueError(f"{where}: expected a number of seconds or a distribution object, got {spec!r}")
+    try:
+        dist = spec.get('dist', 'constant')
+        if dist == 'constant':
+            value = float(spec['value'])
+            sample = lambda: value
+        elif dist == 'uniform':
+            low, high = float(spec['min']), float(spec['max'])
+            sample = lambda: random.uniform(low, high)
+        elif dist == 'exponential':
+            rate = 1.0 / float(spec['mean'])
+            sample = lambda: random.expovariate(rate)
+        elif dist == 'normal':
+            mean, stdev = float(spec['mean']), float(spec['stdev'])
+            sample = lambda: random.gauss(mean, stdev)
+        elif dist == 'lognormal':
+            mu, sigma = math.log(float(spec['median'])), float(spec['sigma'])
+            sample = lambda: random.lognormvariate(mu, sigma)
+        else:
+            raise ValueError(f"unknown distribution '{dist}' (constant, uniform, exponential, normal, lognormal)")
+    except KeyError as e:
+        raise ValueError(f"{where}: '{spec.get('dist', 'constant')}' needs {e}") from None
+    except (TypeError, ValueError, ZeroDivisionError) as e:
+        raise ValueError(f"{where}: {e}") from None
+    cap = float(spec['cap']) if 'cap' in spec else math.inf
+    return lambda: min(cap, max(0.0, sample()))
+
+class SessionDistribution:
+    """Which PPT session a student opens
+
+    batches: consecutive blocks of `batch_size` credential positions per session, the last
+    session taking the rest (the original 25/25/25/25 layout); round_robin: position modulo
+    `sessions`; weighted: {"weights": {"1": 70, "3": 30}}; fixed: everyone opens `session`,
+    which concentrates PPT generation load on one deck. Weighted draws, and students whose
+    position is unknown, use a hash of the student so a session is stable across retries.
+    """
+
+    STRATEGIES = ('batches', 'round_robin', 'weighted', 'fixed')
+
+    def __init__(self, spec=None, where='session_distribution'):
+        spec = spec or {}
+        self.strategy = spec.get('strategy', 'batches')
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError(f"{where}: unknown strategy '{self.strategy}' ({', '.join(self.STRATEGIES)})")
+        try:
+            self.sessions = int(spec.get('sessions', 4))
+            self.batch_size = int(spec.get('batch_size', 25))
+            self.session = int(spec.get('session', 1))
+            weights = {int(session): float(weight) for session, weight in spec.get('weights', {}).items()}
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"{where}: {e}") from None
+        if self.sessions < 1 or self.batch_size < 1 or self.session < 1:
+            raise ValueError(f"{where}: sessions, batch_size and session must be at least 1")
+        if self.strategy == 'weighted' and (not weights or min(weights) < 1 or sum(weights.values()) <= 0):
+            raise ValueError(f"{where}: weighted needs positive \"weights\" keyed by session number")
+        self.choices = sorted(weights)
+        self._cumulative = list(itertools.accumulate(weights[session] for session in self.choices))
+
+    def session_for(self, student, accounts, key, seed=''):
+        if self.strategy == 'fixed':
+            return self.session
+        if self.strategy == 'weighted':
+            draw = unit_draw(f"session:{key}", seed) * self._cumulative[-1]
+            return self.choices[bisect.bisect_right(self._cumulative, draw)]
+        position = student.get('index')
+        if position is None and accounts is not None:
+            position = accounts.position_of(student['email'])
+        if position is None:
+            return int(unit_draw(f"session:{key}", seed) * self.sessions) + 1
+        if self.strategy == 'round_robin':
+            return (position - 1) % self.sessions + 1
+        return min(self.sessions, (position - 1) // self.batch_size + 1)
+
+    def describe(self):
+        if self.strategy == 'fixed':
+            return f"all on session {self.session}"
+        if self.strategy == 'weighted':
+            total = self._cumulative[-1]
+            previous = [0.0] + self._cumulative[:-1]
+            return "sessions " + ", ".join(f"{session}: {(end - start) / total:.0%}"
+                                           for session, start, end in zip(self.choices, previous, self._cumulative))
+        if self.strategy == 'round_robin':
+            return f"round robin over {self.sessions} sessions"
+        return f"batches of {self.batch_size} over {self.sessions} sessions"
+
+class ScenarioStep:
+    """One compiled action: samplers and question lists are built once, sampled per student"""
+
+    __slots__ = ('kind', 'duration', 'think', 'turns', 'questions', 'sequential')
+
+    def __init__(self, kind, duration=None, think=None, turns=1, questions=(), sequential=False):
+        self.kind = kind
+        self.duration = duration
+        self.think = think
+        self.turns = turns
+        self.questions = questions
+        self.sequential = sequential
+
+    def conversation(self):
+        """The questions for one chat step: the bank in order, or a random pick without repeats while it lasts"""
+        if self.sequential or len(self.questions) == 1:
+            return [self.questions[i % len(self.questions)] for i in range(self.turns)]
+        if self.turns <= len(self.questions):
+            return random.sample(self.questions, self.turns)
+        return random.choices(self.questions, k=self.turns)
+
+class Scenario:
+    def __init__(self, name, weight, steps, sessions=None):
+        self.name = name
+        self.weight = weight
+        self.steps = steps
+        self.sessions = sessions
+
+def compile_step(spec, banks, config, where):
+    if isinstance(spec, str):
+        spec = {'step': spec}
+    if not isinstance(spec, dict) or spec.get('step') not in STEP_KINDS:
+        raise ValueError(f"{where}: a step is one of {', '.join(STEP_KINDS)} or an object with \"step\" set to one")
+    kind = spec['step']
+    if kind == 'think':
+        if 'time' not in spec:
+            raise ValueError(f"{where}: think needs \"time\"")
+        return ScenarioStep(kind, think=compile_distribution(spec['time'], f"{where}.time"))
+    if kind == 'view_ppt':
+        # Without a duration each engine keeps its configured viewing time
+        duration = compile_distribution(spec['duration'], f"{where}.duration") if 'duration' in spec else None
+        return ScenarioStep(kind, duration=duration)
+    if kind == 'chat':
+        if 'bank' in spec:
+            if spec['bank'] not in banks:
+                raise ValueError(f"{where}: unknown question bank '{spec['bank']}'")
+            questions = banks[spec['bank']]
+        else:
+            questions = tuple(spec.get('questions') or [config.get('AI_CHAT_QUESTION', DEFAULT_QUESTION)])
+        turns = int(spec.get('turns', 1))
+        if turns < 1:
+            raise ValueError(f"{where}: turns must be at least 1")
+        if spec.get('order', 'random') not in ('random', 'sequential'):
+            raise ValueError(f"{where}: order is random or sequential")
+        think = compile_distribution(spec['think'], f"{where}.think") if 'think' in spec else None
+        return ScenarioStep(kind, think=think, turns=turns, questions=questions, sequential=spec.get('order') == 'sequential')
+    return ScenarioStep(kind)
+
+def check_sequence(steps, where):
+    """Steps must follow the portal: log in first, open a session before the deck, open the deck before chatting"""
+    kinds = [step.kind for step in steps]
+    if not kinds or kinds[0] != 'login' or kinds.count('login') > 1:
+        raise ValueError(f"{where}: must start with login, once")
+    for kind in ('open_session', 'view_ppt'):
+        if kinds.count(kind) > 1:
+            raise ValueError(f"{where}: {kind} can appear only once")
+    for kind, needs in (('view_ppt', 'open_session'), ('chat', 'view_ppt')):
+        if kind in kinds and (needs not in kinds or kinds.index(needs) > kinds.index(kind)):
+            raise ValueError(f"{where}: {kind} needs {needs} before it")
+
+class ScenarioMix:
+    """The compiled workload mix: weighted scenarios and how students spread over sessions
+
+    Compiled once at startup; picking a scenario for an attempt is a hash and a bisect.
+    """
+
+    def __init__(self, scenarios, sessions, seed='', source=None, definition=None):
+        self.scenarios = scenarios
+        self.sessions = sessions
+        self.seed = seed
+        self.source = source
+        # The parsed scenario file, shipped as-is to distributed workers
+        self.definition = definition
+        self._cumulative = list(itertools.accumulate(scenario.weight for scenario in scenarios))
+
+    def pick(self, key):
+        if len(self.scenarios) == 1:
+            return self.scenarios[0]
+        draw = unit_draw(key, self.seed) * self._cumulative[-1]
+        return self.scenarios[bisect.bisect_right(self._cumulative, draw)]
+
+    def assign(self, student, accounts, iteration=None):
+        """Scenario and session for one attempt (per iteration in soak runs), kept on the student for the run's bookkeeping"""
+        key = student['email'] if iteration is None else f"{student['email']}#{iteration}"
+        scenario = self.pick(key)
+        student['session'] = (scenario.sessions or self.sessions).session_for(student, accounts, key, self.seed)
+        student['scenario'] = scenario.name
+        return scenario
+
+    def shares(self):
+        total = self._cumulative[-1]
+        return {scenario.name: scenario.weight / total for scenario in self.scenarios}
+
+    def describe(self):
+        mix = ", ".join(f"{name} {share:.0%}" for name, share in self.shares().items())
+        return f"{mix}; {self.sessions.describe()}"
+
+def builtin_journey(config):
+    """The single journey every student ran before scenarios: log in, open the session, view the deck, ask one question"""
+    return Scenario('journey', 1.0, (ScenarioStep('login'), ScenarioStep('open_session'), ScenarioStep('view_ppt'),
+                                     ScenarioStep('chat', questions=(config.get('AI_CHAT_QUESTION', DEFAULT_QUESTION),))))
+
+def compile_scenarios(definition, config, source=None):
+    """ScenarioMix from a parsed scenario file; raises ValueError naming the offending entry"""
+    if not isinstance(definition, dict) or not isinstance(definition.get('scenarios'), dict) or not definition['scenarios']:
+        raise ValueError("expected an object with a non-empty \"scenarios\" object")
+    banks = {}
+    for name, questions in definition.get('question_banks', {}).items():
+        if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+            raise ValueError(f"question_banks.{name}: expected a non-empty list of questions")
+        banks[name] = tuple(questions)
+    scenarios = []
+    for name, spec in definition['scenarios'].items():
+        where = f"scenarios.{name}"
+        try:
+            weight = float(spec.get('weight', 1))
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError(f"{where}: weight must be a number") from None
+        if weight <= 0:
+            continue
+        steps = tuple(compile_step(step, banks, config, f"{where}.steps[{i}]") for i, step in enumerate(spec.get('steps', [])))
+        check_sequence(steps, where)
+        sessions = SessionDistribution(spec['session_distribution'], f"{where}.session_distribution") \
+            if 'session_distribution' in spec else None
+        scenarios.append(Scenario(name, weight, steps, sessions))
+    if not scenarios:
+        raise ValueError("no scenario has a positive weight")
+    seed = config.get('SCENARIO_SEED') or str(definition.get('seed', ''))
+    return ScenarioMix(scenarios, SessionDistribution(definition.get('session_distribution')), seed, source, definition)
+
+def load_scenarios(config):
+    """The run's workload mix: SCENARIO_FILE, or the built-in journey with the 25-per-session batches"""
+    path = (config.get('SCENARIO_FILE') or '').strip()
+    if not path:
+        return ScenarioMix([builtin_journey(config)], SessionDistribution(), config.get('SCENARIO_SEED', ''))
+    try:
+        with open(path) as f:
+            definition = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read scenario file {path}: {e}") from None
+    try:
+        return compile_scenarios(definition, config, path)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+def scenario_rows(mix, results):
+    """Outcomes per scenario next to the share of the mix it was given"""
+    total = sum(counts['success'] + counts['failed'] for counts in results.values())
+    rows = []
+    for name, share in mix.shares().items():
+        counts = results.get(name, {'success': 0, 'failed': 0})
+        finished = counts['success'] + counts['failed']
+        rows.append({'scenario': name, 'weight': round(share, 4), 'share': round(finished / total, 4) if total else None,
+                     'success': counts['success'], 'failed': counts['failed'],
+                     'success_rate': round(counts['success'] / finished, 4) if finished else None})
+    return rows
+
+def format_scenario_row(row):
+    share = f"{row['share']:.1%}" if row['share'] is not None else "-"
+    rate = f"{row['success_rate']:.1%}" if row['success_rate'] is not None else "-"
+    return (f"{row['scenario']:<18} {row['weight']:>7.1%} {share:>7} {row['success']:>8} {row['failed']:>7} {rate:>8}")
+
+SCENARIO_TABLE_HEADER = f"{'scenario':<18} {'weight':>7} {'share':>7} {'success':>8} {'failed':>7} {'rate':>8}"
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import base64
+import json
+import re
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+from driver_pool import origin_of
+
+# Fields Network.setCookies accepts from a Network.getAllCookies entry
+COOKIE_PARAMS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires',
+                 'priority', 'sourceScheme', 'sourcePort', 'partitionKey')
+
+JWT = re.compile(r"eyJ[\w-]+\.([\w-]+)\.[\w-]+")
+
+# Registered for new documents while a cached session is restored: puts the saved
+# localStorage entries in place before the app's own scripts read them
+INJECT_STORAGE_JS = """
+(function () {
+    var origin = %s, items = %s;
+    if (location.origin !== origin || sessionStorage.getItem('__sessionCacheApplied')) { return; }
+    for (var key in items) { localStorage.setItem(key, items[key]); }
+    sessionStorage.setItem('__sessionCacheApplied', '1');
+})();
+"""
+
+READ_STORAGE_JS = """
+var items = {};
+for (var i = 0; i < localStorage.length; i++) { var key = localStorage.key(i); items[key] = localStorage.getItem(key); }
+return [location.origin, items];
+"""
+
+def session_cache_enabled(config):
+    return str(config.get('SESSION_CACHE', 'false')).lower() == 'true'
+
+def jwt_expiry(value):
+    """Earliest 'exp' claim of any JWT embedded in a string, or None"""
+    earliest = None
+    for payload in JWT.findall(value or ''):
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        except (ValueError, TypeError):
+            continue
+        exp = claims.get('exp') if isinstance(claims, dict) else None
+        if isinstance(exp, (int, float)):
+            earliest = exp if earliest is None else min(earliest, exp)
+    return earliest
+
+def session_expiry(cookies, local_storage, default_ttl):
+    """When a captured login stops being usable: the earliest cookie or token expiry, capped at default_ttl"""
+    expiries = [time.time() + default_ttl]
+    for cookie in cookies:
+        if cookie.get('expires', -1) > 0 and not cookie.get('session'):
+            expiries.append(cookie['expires'])
+        token_exp = jwt_expiry(cookie.get('value'))
+        if token_exp:
+            expiries.append(token_exp)
+    for value in local_storage.values():
+        token_exp = jwt_expiry(value)
+        if token_exp:
+            expiries.append(token_exp)
+    return min(expiries)
+
+class SessionCache:
+    """Logs each account in through the UI once, then restores its cookies and localStorage in later drivers
+
+    Entries live in the credential store's auth_sessions table. An entry is used only
+    while it has at least SESSION_CACHE_MIN_REMAINING seconds left; an expired or
+    rejected entry falls back to the UI login, whose fresh state replaces it.
+    """
+
+    def __init__(self, store, config):
+        self.store = store
+        self.landing_url = config.get('SESSION_CACHE_LANDING_URL') or origin_of(config['LOGIN_URL']) + '/'
+        self.timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
+        self.ttl = float(config.get('SESSION_CACHE_TTL', 3600))
+        self.min_remaining = float(config.get('SESSION_CACHE_MIN_REMAINING', 300))
+        self.counts = {'hit': 0, 'miss': 0, 'expired': 0, 'rejected': 0, 'stored': 0, 'store_failed': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def restore(self, driver, student, waiter, timer):
+        """Land on the portal already logged in; False when there is no usable entry or the server rejects it"""
+        entry = self.store.get_auth_session(student['email'])
+        if entry is None:
+            self._count('miss')
+            return False
+        if entry['expires_at'] - time.time() < self.min_remaining:
+            self._count('expired')
+            return False
+
+        script_id = None
+        started_at = time.time()
+        try:
+            if entry['cookies']:
+                driver.execute_cdp_cmd('Network.setCookies', {'cookies': [
+                    {key: cookie[key] for key in COOKIE_PARAMS if key in cookie and not (key == 'expires' and cookie[key] <= 0)}
+                    for cookie in entry['cookies']]})
+            if entry['local_storage']:
+                source = INJECT_STORAGE_JS % (json.dumps(entry['origin']), json.dumps(entry['local_storage']))
+                script_id = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': source})['identifier']
+            driver.get(self.landing_url)
+            _, ready_at = waiter.until('session_restore', waiter.locators['NAVIGATION_ENROLLED_UNITS'], 'present', self.timeout)
+        except TimeoutException:
+            # Server no longer accepts this login: drop it and start the UI login from a clean slate
+            self._count('rejected')
+            self.store.invalidate_auth_session(student['email'])
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_script("localStorage.clear(); sessionStorage.clear();")
+            return False
+        finally:
+            if script_id:
+                driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': script_id})
+        timer.record('session_restore', max(0.0, ready_at - started_at))
+        self._count('hit')
+        return True
+
+    def save(self, driver, student):
+        """Capture the logged-in browser's cookies and localStorage for the next run of this account"""
+        try:
+            cookies = driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+            origin, local_storage = driver.execute_script(READ_STORAGE_JS)
+        except Exception:
+            self._count('store_failed')
+            return False
+        expires_at = session_expiry(cookies, local_storage, self.ttl)
+        self.store.put_auth_session(student['email'], origin, cookies, local_storage, expires_at)
+        self._count('stored')
+        return True
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts['hit'] + counts['miss'] + counts['expired'] + counts['rejected']
+        counts['lookups'] = lookups
+        counts['hit_rate'] = round(counts['hit'] / lookups, 3) if lookups else None
+        return counts
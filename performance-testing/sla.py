@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+
+from live_telemetry import LiveTelemetry
+from step_metrics import STUDENT_STEPS
+
+# Exit codes of a run judged against its SLA (setup errors exit with 1)
+EXIT_SLA_FAILED = 2
+EXIT_SLA_ABORTED = 3
+
+def step_limits(config):
+    """Per-step p95 limits in ms: SLA_P95_<STEP>, plus the chatbot reply limits"""
+    limits = {}
+    for step in STUDENT_STEPS:
+        value = float(config.get(f"SLA_P95_{step.upper()}", 0) or 0)
+        if value > 0:
+            limits[step] = value
+    for step, key in (('chat_first_token', 'SLA_MAX_CHAT_FIRST_TOKEN_MS'), ('chat_response', 'SLA_MAX_CHAT_RESPONSE_MS')):
+        value = float(config.get(key, 0) or 0)
+        if value > 0:
+            limits[step] = value
+    return limits
+
+def sla_enabled(config):
+    return bool(step_limits(config)) or float(config.get('SLA_MIN_SUCCESS_RATE', 0) or 0) > 0 \
+        or float(config.get('SLA_ABORT_ERROR_RATE', 0) or 0) > 0
+
+class SlaMonitor:
+    """Checks the run against its SLA over a sliding window while it is running
+
+    Every SLA_CHECK_INTERVAL seconds the last SLA_WINDOW seconds are compared with
+    the step p95 limits and SLA_MIN_SUCCESS_RATE (once SLA_MIN_SAMPLES values are in
+    the window). A threshold breached in SLA_BREACH_CHECKS consecutive checks fails
+    the run. When the window's error rate reaches SLA_ABORT_ERROR_RATE in
+    SLA_ABORT_CHECKS consecutive checks the circuit breaker trips: `on_abort(reason)`
+    is called to stop admitting students and let the running ones drain.
+    """
+
+    def __init__(self, config, active_sessions, on_abort):
+        self.limits = step_limits(config)
+        self.min_success_rate = float(config.get('SLA_MIN_SUCCESS_RATE', 0) or 0)
+        self.interval = float(config.get('SLA_CHECK_INTERVAL', 15))
+        self.min_samples = int(config.get('SLA_MIN_SAMPLES', 20))
+        self.breach_checks = max(1, int(config.get('SLA_BREACH_CHECKS', 3)))
+        self.abort_error_rate = float(config.get('SLA_ABORT_ERROR_RATE', 0) or 0)
+        self.abort_min_completions = int(config.get('SLA_ABORT_MIN_COMPLETIONS', 20))
+        self.abort_checks = max(1, int(config.get('SLA_ABORT_CHECKS', 2)))
+        self.window = LiveTelemetry(active_sessions, window=float(config.get('SLA_WINDOW', 300)))
+        self.on_abort = on_abort
+        self.abort_reason = None
+        self.checks = {}
+        self._abort_streak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sla-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.evaluate()
+
+    def _check(self, name, value, limit, breached):
+        """Track one threshold across checks; logs when it starts and stops breaching"""
+        check = self.checks.setdefault(name, {'limit': limit, 'checks': 0, 'breached_checks': 0,
+                                              'streak': 0, 'longest_streak': 0, 'worst': None})
+        check['checks'] += 1
+        if breached:
+            check['breached_checks'] += 1
+            check['streak'] += 1
+            check['longest_streak'] = max(check['longest_streak'], check['streak'])
+            if check['streak'] == 1:
+                logging.warning(f"SLA_BREACH: {name}={value:g} limit={limit:g}")
+        elif check['streak']:
+            check['streak'] = 0
+            logging.info(f"SLA_RECOVERED: {name}={value:g} limit={limit:g}")
+        if value is not None and (check['worst'] is None or
+                                  (value < check['worst'] if name == 'success_rate' else value > check['worst'])):
+            check['worst'] = value
+
+    def evaluate(self):
+        """One check of the sliding window; returns the snapshot it used"""
+        snapshot = self.window.snapshot()
+        completions = snapshot['completions_in_window']
+        if self.min_success_rate > 0 and completions >= self.min_samples:
+            success_rate = 1.0 - snapshot['error_rate']
+            self._check('success_rate', round(success_rate, 4), self.min_success_rate, success_rate < self.min_success_rate)
+        for step, limit in self.limits.items():
+            if snapshot['step_count'].get(step, 0) >= self.min_samples:
+                p95_ms = round(snapshot['step_p95_seconds'][step] * 1000, 1)
+                self._check(f"{step}_p95_ms", p95_ms, limit, p95_ms > limit)
+
+        # Circuit breaker: a sustained error rate this high means the rest of the run is wasted
+        if self.abort_error_rate > 0 and self.abort_reason is None:
+            if completions >= self.abort_min_completions and snapshot['error_rate'] >= self.abort_error_rate:
+                self._abort_streak += 1
+            else:
+                self._abort_streak = 0
+            if self._abort_streak >= self.abort_checks:
+                self.abort_reason = (f"error rate {snapshot['error_rate']:.0%} over the last {self.window.window:.0f}s "
+                                     f"({completions} students) reached SLA_ABORT_ERROR_RATE {self.abort_error_rate:.0%}")
+                logging.error(f"SLA_ABORT: {self.abort_reason}")
+                self.on_abort(self.abort_reason)
+        return snapshot
+
+    def verdict(self, step_metrics, successful, failed):
+        """Machine-readable pass/fail: window checks plus the whole run's success rate and step p95"""
+        failures = [f"{name} breached in {check['longest_streak']} consecutive checks (worst {check['worst']:g}, limit {check['limit']:g})"
+                    for name, check in sorted(self.checks.items()) if check['longest_streak'] >= self.breach_checks]
+        overall = {}
+        finished = successful + failed
+        if self.min_success_rate > 0 and finished:
+            overall['success_rate'] = {'value': round(successful / finished, 4), 'limit': self.min_success_rate,
+                                       'breached': successful / finished < self.min_success_rate}
+        all_rows = {row['step']: row for row in step_metrics.rows() if row['session'] == 'all'}
+        for step, limit in self.limits.items():
+            row = all_rows.get(step)
+            if row and row['count'] >= self.min_samples:
+                overall[f"{step}_p95_ms"] = {'value': row['p95_ms'], 'limit': limit, 'breached': row['p95_ms'] > limit}
+        failures += [f"whole run {name} {result['value']:g} (limit {result['limit']:g})"
+                     for name, result in overall.items() if result['breached']]
+
+        status = 'aborted' if self.abort_reason else 'fail' if failures else 'pass'
+        return {'status': status, 'abort_reason': self.abort_reason, 'failures': failures,
+                'window_seconds': self.window.window, 'checks': {name: {key: value for key, value in check.items() if key != 'streak'}
+                                                                 for name, check in self.checks.items()},
+                'overall': overall, 'evaluated_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def verdict_exit_code(verdict):
+    if verdict is None or verdict['status'] == 'pass':
+        return 0
+    return EXIT_SLA_ABORTED if verdict['status'] == 'aborted' else EXIT_SLA_FAILED
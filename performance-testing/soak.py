@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import math
+import random
+import re
+import threading
+import time
+
+from step_metrics import STUDENT_STEPS, LatencyHistogram, normal_sf
+
+DURATION = re.compile(r"^\s*([\d.]+)\s*([smhd]?)\s*$")
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_duration(value):
+    """Seconds from '3600', '90m', '8h' or '1.5d'"""
+    match = DURATION.match(str(value).lower())
+    if not match:
+        raise ValueError(f"Invalid duration '{value}' (expected e.g. 3600, 90m, 8h)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+def soak_enabled(config):
+    return parse_duration(config.get('SOAK_DURATION', 0)) > 0
+
+def mann_kendall(values):
+    """Mann-Kendall trend test: (S, two-sided p-value); normal approximation with tie correction"""
+    n = len(values)
+    s = 0
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            s += (values[j] > values[i]) - (values[j] < values[i])
+    ties = {}
+    for value in values:
+        ties[value] = ties.get(value, 0) + 1
+    variance = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in ties.values())) / 18.0
+    if variance <= 0:
+        return s, 1.0
+    z = (s - 1) / math.sqrt(variance) if s > 0 else (s + 1) / math.sqrt(variance) if s < 0 else 0.0
+    return s, min(1.0, 2 * normal_sf(abs(z)))
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def theil_sen(xs, ys):
+    """Median of pairwise slopes: a trend estimate that one noisy window cannot drag around"""
+    return median([(ys[j] - ys[i]) / (xs[j] - xs[i])
+                   for i in range(len(xs)) for j in range(i + 1, len(xs)) if xs[j] != xs[i]])
+
+class SoakWindows:
+    """Step latency, step failures and iteration outcomes bucketed into fixed time windows"""
+
+    def __init__(self, window_seconds, started_at=None):
+        self.window_seconds = window_seconds
+        self.started_at = started_at or time.time()
+        self.windows = {}
+        self._lock = threading.Lock()
+
+    def _window(self, now=None):
+        index = int(((now or time.time()) - self.started_at) // self.window_seconds)
+        return self.windows.setdefault(index, {'iterations': 0, 'failed': 0, 'duration': LatencyHistogram(),
+                                               'steps': {}, 'step_failures': {}})
+
+    def record_step(self, step, seconds):
+        with self._lock:
+            self._window()['steps'].setdefault(step, LatencyHistogram()).record(seconds)
+
+    def record_step_failure(self, step, session=None):
+        with self._lock:
+            failures = self._window()['step_failures']
+            failures[step] = failures.get(step, 0) + 1
+
+    def record_iteration(self, success, seconds):
+        with self._lock:
+            window = self._window()
+            window['iterations'] += 1
+            window['duration'].record(seconds)
+            if not success:
+                window['failed'] += 1
+
+    def rows(self, until=None):
+        """One row per window in time order; the window still open at `until` is marked partial"""
+        until = until or time.time()
+        with self._lock:
+            rows = []
+            for index in sorted(self.windows):
+                window = self.windows[index]
+                start = index * self.window_seconds
+                row = {'window': index, 'start_s': start, 'iterations': window['iterations'], 'failed': window['failed'],
+                       'error_rate': round(window['failed'] / window['iterations'], 4) if window['iterations'] else None,
+                       'partial': self.started_at + start + self.window_seconds > until + 1,
+                       'iteration_p50_ms': None, 'iteration_p95_ms': None, 'steps': {}}
+                if window['duration'].count:
+                    row['iteration_p50_ms'] = round(window['duration'].percentile(50), 1)
+                    row['iteration_p95_ms'] = round(window['duration'].percentile(95), 1)
+                for step in set(window['steps']) | set(window['step_failures']):
+                    hist = window['steps'].get(step, LatencyHistogram())
+                    failures = window['step_failures'].get(step, 0)
+                    row['steps'][step] = {'count': hist.count, 'failures': failures,
+                                          'error_rate': round(failures / (hist.count + failures), 4),
+                                          'p50_ms': round(hist.percentile(50), 1) if hist.count else None,
+                                          'p95_ms': round(hist.percentile(95), 1) if hist.count else None}
+                rows.append(row)
+        return rows
+
+def drift_analysis(rows, config):
+    """Latency (p50, p95) and error-rate trends per step across complete windows
+
+    A trend is flagged as drift when it is getting worse, the Mann-Kendall test is
+    significant at SOAK_DRIFT_SIGNIFICANCE, and the fitted change over the soak is at
+    least SOAK_MIN_LATENCY_DRIFT (relative) or SOAK_MIN_ERROR_DRIFT (absolute rate).
+    """
+    alpha = float(config.get('SOAK_DRIFT_SIGNIFICANCE', 0.05))
+    min_latency_drift = float(config.get('SOAK_MIN_LATENCY_DRIFT', 0.10))
+    min_error_drift = float(config.get('SOAK_MIN_ERROR_DRIFT', 0.02))
+    min_samples = int(config.get('SOAK_MIN_WINDOW_SAMPLES', 5))
+    min_windows = int(config.get('SOAK_MIN_WINDOWS', 4))
+    complete = [row for row in rows if not row['partial']]
+
+    series = {}
+    for row in complete:
+        hours = row['start_s'] / 3600.0
+        if row['iterations'] >= min_samples:
+            series.setdefault(('iteration', 'error_rate'), []).append((hours, row['error_rate']))
+        for step, stats in row['steps'].items():
+            if stats['count'] >= min_samples:
+                series.setdefault((step, 'p50_ms'), []).append((hours, stats['p50_ms']))
+                series.setdefault((step, 'p95_ms'), []).append((hours, stats['p95_ms']))
+            if stats['count'] + stats['failures'] >= min_samples:
+                series.setdefault((step, 'error_rate'), []).append((hours, stats['error_rate']))
+
+    order = {step: i for i, step in enumerate(['iteration'] + STUDENT_STEPS)}
+    results = []
+    for (step, metric), points in sorted(series.items(), key=lambda item: (order.get(item[0][0], len(order)), item[0])):
+        if len(points) < min_windows:
+            continue
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        slope = theil_sen(xs, ys)
+        _, p_value = mann_kendall(ys)
+        # Fitted level at the first window (Theil-Sen intercept), so one odd early window cannot skew the ratio
+        start_level = median([y - slope * x for x, y in zip(xs, ys)]) + slope * xs[0]
+        change = slope * (xs[-1] - xs[0])
+        if metric == 'error_rate':
+            relative = None
+            large = change >= min_error_drift
+        else:
+            relative = change / start_level if start_level > 0 else None
+            large = relative is not None and relative >= min_latency_drift
+        results.append({'step': step, 'metric': metric, 'windows': len(points), 'first': ys[0], 'last': ys[-1],
+                        'slope_per_hour': round(slope, 4), 'change': round(change, 4),
+                        'change_pct': round(relative * 100, 1) if relative is not None else None,
+                        'p_value': round(p_value, 4), 'drift': slope > 0 and p_value < alpha and large})
+    return results
+
+def format_drift_row(row):
+    unit = "/h" if row['metric'] == 'error_rate' else " ms/h"
+    change = f"{row['change_pct']:+.0f}%" if row['change_pct'] is not None else f"{row['change']:+.3f}"
+    return (f"{row['step']:<18} {row['metric']:<10} {row['windows']:>7} {row['first']:>9} {row['last']:>9} "
+            f"{row['slope_per_hour']:>+12.3f}{unit:<5} {change:>8} {row['p_value']:>7.3f}  {'DRIFT' if row['drift'] else ''}")
+
+DRIFT_TABLE_HEADER = (f"{'step':<18} {'metric':<10} {'windows':>7} {'first':>9} {'last':>9} "
+                      f"{'slope':>12}{'':<5} {'change':>8} {'p':>7}")
+
+class Soak:
+    """A soak run: the same virtual students cycle through the journey until SOAK_DURATION ends"""
+
+    def __init__(self, config):
+        self.duration = parse_duration(config.get('SOAK_DURATION', 0))
+        self.think_min = float(config.get('SOAK_THINK_TIME_MIN', 5))
+        self.think_max = max(self.think_min, float(config.get('SOAK_THINK_TIME_MAX', 30)))
+        self.drain = parse_duration(config.get('SOAK_DRAIN_TIMEOUT', 1800))
+        self.started_at = time.time()
+        self.ends_at = self.started_at + self.duration
+        self.windows = SoakWindows(parse_duration(config.get('SOAK_WINDOW', 300)), self.started_at)
+
+    def remaining(self):
+        return max(0.0, self.ends_at - time.time())
+
+    def think_time(self):
+        """Randomised pause between a virtual student's iterations, never past the end of the soak"""
+        return min(random.uniform(self.think_min, self.think_max), self.remaining())
+
+    def attach(self, step_metrics):
+        step_metrics.listeners.append(self.windows.record_step)
+        step_metrics.failure_listeners.append(self.windows.record_step_failure)
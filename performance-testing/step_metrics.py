@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-step records for the JSON-lines log; log_pipeline enables this logger only when that log is on
+STEP_LOG = logging.getLogger('steps')
+
+# Journey stages timed in run_student_session, in the order they happen
+STUDENT_STEPS = [
+    'session_restore',
+    'initial_page_load',
+    'student_button',
+    'login_submit',
+    'aspirations',
+    'enrolled_units',
+    'session_list',
+    'ppt_container',
+    'chatbot_open',
+    'chat_message',
+    'chat_first_token',
+    'chat_response',
+]
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Categories used in FAILURE_STEP_<CATEGORY>: <email> - <detail> log records
+FAILURE_CATEGORIES = [
+    'STUDENT_BUTTON',
+    'LOGIN_FORM',
+    'NAVIGATION',
+    'PPT_CONTAINER',
+    'CHATBOT_TIMEOUT',
+    'CHATBOT_ERROR',
+    'CHATBOT_RESPONSE',
+    'TIMEOUT',
+    'ELEMENT_NOT_FOUND',
+    'UNEXPECTED',
+]
+
+# A second record for the same student this soon after the first is a re-raised wrapper
+# (e.g. UNEXPECTED around PPT_CONTAINER), not a new failure
+FAILURE_WRAP_SECONDS = 5
+
+FAILURE_PATTERN = re.compile(r"^FAILURE_STEP_([A-Z_]+): (\S+)(?: - (.*))?$", re.DOTALL)
+
+def parse_failure(message):
+    """(category, email, detail) for a FAILURE_STEP_* log message, or None"""
+    match = FAILURE_PATTERN.match(message)
+    if not match:
+        return None
+    return match.group(1), match.group(2), match.group(3) or ''
+
+def normal_sf(z):
+    """P(Z > z) for a standard normal"""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (~2% relative error) that can be merged across workers and runs"""
+
+    GROWTH = 1.02
+    MIN_MS = 0.01
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value_ms):
+        return int(math.ceil(math.log(max(value_ms, self.MIN_MS) / self.MIN_MS, self.GROWTH)))
+
+    def _bucket_value(self, index):
+        return self.MIN_MS * self.GROWTH ** index
+
+    def record(self, seconds):
+        value_ms = seconds * 1000.0
+        index = self._bucket(value_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, pct):
+        """Latency in milliseconds at the given percentile (0-100)"""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(pct / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Clamp to the observed range so p100 == max and tiny samples stay exact
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        result = {'count': self.count}
+        if self.count:
+            result['mean_ms'] = round(self.total / self.count, 2)
+            for pct in PERCENTILES:
+                result[f'p{pct}_ms'] = round(self.percentile(pct), 2)
+            result['max_ms'] = round(self.max, 2)
+        return result
+
+    def to_dict(self):
+        return {'buckets': {str(k): v for k, v in self.buckets.items()}, 'count': self.count,
+                'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls()
+        hist.buckets = {int(k): v for k, v in data['buckets'].items()}
+        hist.count = data['count']
+        hist.total = data['total']
+        hist.min = data['min']
+        hist.max = data['max']
+        return hist
+
+class StepMetrics:
+    """Thread-safe per-step latency histograms, overall and broken down by session number"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.failures = {}
+        self.listeners = []
+        self.failure_listeners = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(step, session):
+        return f"{step}|{session if session is not None else 'all'}"
+
+    def record(self, step, seconds, session=None):
+        keys = [self._key(step, None)]
+        if session is not None:
+            keys.append(self._key(step, session))
+        with self._lock:
+            for key in keys:
+                self.histograms.setdefault(key, LatencyHistogram()).record(seconds)
+        for listener in self.listeners:
+            listener(step, seconds)
+
+    def record_failure(self, step, session=None):
+        with self._lock:
+            key = self._key(step, None)
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if session is not None:
+                key = self._key(step, session)
+                self.failures[key] = self.failures.get(key, 0) + 1
+        for listener in self.failure_listeners:
+            listener(step, session)
+
+    def merge(self, other):
+        with self._lock:
+            for key, hist in other.histograms.items():
+                self.histograms.setdefault(key, LatencyHistogram()).merge(hist)
+            for key, count in other.failures.items():
+                self.failures[key] = self.failures.get(key, 0) + count
+        return self
+
+    def rows(self):
+        """Summary rows sorted by journey order then session ('all' first)"""
+        with self._lock:
+            keys = set(self.histograms) | set(self.failures)
+            rows = []
+            for key in keys:
+                step, session = key.split('|', 1)
+                hist = self.histograms.get(key, LatencyHistogram())
+                row = {'step': step, 'session': session, 'failures': self.failures.get(key, 0)}
+                row.update(hist.summary())
+                rows.append(row)
+        order = {step: i for i, step in enumerate(STUDENT_STEPS)}
+        rows.sort(key=lambda r: (order.get(r['step'], len(order)), r['step'],
+                                 r['session'] != 'all', r['session']))
+        return rows
+
+    def to_dict(self):
+        with self._lock:
+            return {'histograms': {k: h.to_dict() for k, h in self.histograms.items()},
+                    'failures': dict(self.failures)}
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls()
+        metrics.histograms = {k: LatencyHistogram.from_dict(h) for k, h in data['histograms'].items()}
+        metrics.failures = dict(data['failures'])
+        return metrics
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'summary': self.rows(), 'raw': self.to_dict()}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f)['raw'])
+
+def format_step_row(row):
+    """Render one summary row as a fixed-width table line"""
+    if not row['count']:
+        return f"{row['step']:<18} {row['session']:>7} {0:>6} {row['failures']:>5}"
+    return (f"{row['step']:<18} {row['session']:>7} {row['count']:>6} {row['failures']:>5} "
+            f"{row['p50_ms']:>9.0f} {row['p90_ms']:>9.0f} {row['p95_ms']:>9.0f} "
+            f"{row['p99_ms']:>9.0f} {row['max_ms']:>9.0f}")
+
+STEP_TABLE_HEADER = (f"{'step':<18} {'session':>7} {'count':>6} {'fail':>5} "
+                     f"{'p50_ms':>9} {'p90_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}")
+
+class StepTimer:
+    """Times the steps of one student session and feeds them into shared StepMetrics"""
+
+    def __init__(self, metrics=None, session=None, attempt=0):
+        self.metrics = metrics
+        self.session = session
+        self.attempt = attempt
+        self.durations = {}
+        self.failed_step = None
+
+    def record(self, step, seconds):
+        self.durations[step] = seconds
+        if self.metrics is not None:
+            self.metrics.record(step, seconds, self.session)
+        self._log(step, seconds, 'ok')
+
+    def _log(self, step, seconds, outcome):
+        if STEP_LOG.isEnabledFor(logging.INFO):
+            STEP_LOG.info(f"{step} {outcome} {seconds * 1000:.0f}ms",
+                          extra={'event': 'step', 'step': step, 'duration_ms': round(seconds * 1000, 1),
+                                 'outcome': outcome, 'session': self.session, 'attempt': self.attempt})
+
+    @contextmanager
+    def step(self, name):
+        """Time the enclosed block; an exception counts as a failure of this step
+
+        The block may set `clock.ready_at` (epoch seconds) to the exact moment the
+        step's condition became true, e.g. from an in-page observer; otherwise the
+        step ends when the block exits.
+        """
+        clock = StepClock()
+        start = time.perf_counter()
+        try:
+            yield clock
+        except BaseException:
+            self.failed_step = self.failed_step or name
+            if self.metrics is not None:
+                self.metrics.record_failure(name, self.session)
+            self._log(name, time.perf_counter() - start, 'failed')
+            raise
+        if clock.ready_at is not None:
+            self.record(name, max(0.0, clock.ready_at - clock.started_at))
+        else:
+            self.record(name, time.perf_counter() - start)
+
+class StepClock:
+    """Wall-clock anchor for a timed step, so browser-side event times can end it precisely"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready_at = None
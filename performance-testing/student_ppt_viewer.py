@@ -1,45 +1,80 @@
-
-import sys
 import os
-import csv
+import sys
+import json
 import time
 import random
+import shutil
+import socket
 import argparse
 import logging
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_for_futures
 from datetime import datetime
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from load_profiles import ArrivalTracker, build_arrival_schedule, describe_schedule
+from step_metrics import STEP_TABLE_HEADER, StepMetrics, StepTimer, format_step_row
+from driver_pool import DriverPool, origin_of, reset_driver
+from event_waits import EventWait, enable_network_tracking, poll_interval
+from network_metrics import (NETWORK_TABLE_HEADER, NetworkCapture, NetworkMetrics, enable_performance_logging,
+                             format_network_row, network_capture_enabled)
+from credential_store import (CREDENTIALS_DB, AccountFailureHandler, CredentialStore, QueuedAccounts, lease_owner,
+                              open_credential_store)
+from host_monitor import HostMonitor, host_monitor_enabled
+from live_telemetry import LiveTelemetry, TelemetryExporter, TelemetryLogHandler
+from session_cache import SessionCache, session_cache_enabled
+from checkpoint import RunCheckpoint, latest_checkpoint, load_checkpoint, restore_run
+from retry_policy import RetryQueue, retries_enabled
+from log_pipeline import LogPipeline, console_quiet, log_context
+from sla import SlaMonitor, sla_enabled, verdict_exit_code
+from soak import DRIFT_TABLE_HEADER, Soak, drift_analysis, format_drift_row, parse_duration, soak_enabled
+from browser_contexts import (LEAN_CHROME_ARGS, BrowserContexts, apply_browser_conditions, contexts_per_browser,
+                              describe_browser_mode, lean_mode_enabled)
+from chat_metrics import CHAT_TABLE_HEADER, ChatMetrics, format_chat_row, install_chat_observer, mark_chat_sent, wait_for_chat_response
+from locators import LOCATOR_TABLE_HEADER, LocatorRegistry, format_locator_row
+from scenarios import SCENARIO_TABLE_HEADER, builtin_journey, format_scenario_row, load_scenarios, scenario_rows
+
+LOG_PIPELINE = None
+
+def setup_logging(name="student_ppt_viewer", config=None):
+    """Start the queued logging pipeline (text log, JSON-lines log, console) and return the text log path"""
+    global LOG_PIPELINE
+    if config is None:
+        config = load_config() if os.path.exists("test_config.properties") else {}
+    LOG_PIPELINE = LogPipeline(name, config).start()
+    return LOG_PIPELINE.log_file
+
+def quiet_console(config, concurrency):
+    """Switch the console to quiet output for large runs (LOG_CONSOLE); True when it did"""
+    if LOG_PIPELINE is None or not console_quiet(config, concurrency):
+        return False
+    LOG_PIPELINE.set_quiet(True)
+    return True
+
+def attach_log_handler(handler):
+    """Feed log records to `handler` on the pipeline's writer thread (the root logger when there is no pipeline)"""
+    if LOG_PIPELINE is None:
+        logging.getLogger().addHandler(handler)
+    else:
+        LOG_PIPELINE.add_handler(handler)
+
+def detach_log_handler(handler):
+    if LOG_PIPELINE is None:
+        logging.getLogger().removeHandler(handler)
+    else:
+        LOG_PIPELINE.remove_handler(handler)
+
+def flush_logs():
+    """Wait until handlers attached with attach_log_handler have seen every record logged so far"""
+    if LOG_PIPELINE is not None:
+        LOG_PIPELINE.flush()
 
-def setup_logging():
-    """Setup logging to both console and file"""
-    # Create logs directory if it doesn't exist
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
-    
-    # Create log filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_file = os.path.join(log_dir, f"student_ppt_viewer_{timestamp}.log")
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
-    return log_file
-
-def log_print(message):
-    """Print to console and log to file"""
-    print(message)
-    logging.info(message)
+def log_print(message, **fields):
+    """Log to the console and the log files; `fields` (event, outcome, ...) go into the JSON-lines record"""
+    logging.info(message, extra=fields or None)
 
 def load_config():
     """Load configuration from test_config.properties"""
@@ -59,25 +94,15 @@ def load_config():
     
     return config
 
-def load_student_credentials():
-    """Load student credentials from the saved CSV file"""
-    credentials_file = "student_credentials.csv"
-    
-    if not os.path.exists(credentials_file):
-        print(f"Credentials file not found: {credentials_file}")
-        print("Please run create_students.py first to create students")
-        return []
-    
-    credentials = []
-    with open(credentials_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            credentials.append({
-                'email': row['email'],
-                'password': row['password']
-            })
-    
-    return credentials
+def apply_config_overrides(config, overrides):
+    """Apply KEY=VALUE overrides from the command line on top of the properties file"""
+    for override in overrides or []:
+        if '=' not in override:
+            print(f"Ignoring malformed override (expected KEY=VALUE): {override}")
+            continue
+        key, value = override.split('=', 1)
+        config[key.strip()] = value.strip()
+    return config
 
 def generate_background_aspirations(config):
     """Generate simple 200-300 word background aspirations using business keywords from config"""
@@ -95,319 +120,889 @@ def generate_background_aspirations(config):
     
     return paragraph
 
-def get_session_number(student_email, credentials_list):
+def get_session_for_index(student_index):
+    """Session number for a 1-based position in the full credentials list (batches of 25, 1-4)"""
+    if student_index <= 25:
+        return 1
+    elif student_index <= 50:
+        return 2
+    elif student_index <= 75:
+        return 3
+    else:
+        return 4
+
+def get_session_number(student_email, accounts):
     """Determine session number based on batches of 25 students (1-4)"""
-    # Find student position in the credentials list
-    try:
-        # Find the index of current student in the list
-        for i, cred in enumerate(credentials_list):
-            if cred['email'] == student_email:
-                student_index = i + 1  # 1-based index
-                break
-        else:
-            # If not found, use random
-            return random.randint(1, 4)
-        
-        # Assign sessions based on batches of 25
-        if student_index <= 25:
-            return 1
-        elif student_index <= 50:
-            return 2
-        elif student_index <= 75:
-            return 3
-        else:
-            return 4
-            
-    except:
-        # Fallback to random session if anything fails
+    # Indexed lookup of the student's position in the credential store
+    position = accounts.position_of(student_email) if accounts is not None else None
+    if position is None:
+        # If not found, use random
         return random.randint(1, 4)
+    
+    # Assign sessions based on batches of 25
+    return get_session_for_index(position)
+
+def session_number_for(student, accounts):
+    """Session number for a student: the one its scenario assigned, else from the position it was leased with"""
+    if 'session' in student:
+        return student['session']
+    if 'index' in student:
+        return get_session_for_index(student['index'])
+    return get_session_number(student['email'], accounts)
+
+class RunState:
+    """Shared, thread-safe state for one batch run across all worker threads"""
+
+    def __init__(self, accounts, timeout=None):
+        self.accounts = accounts
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time + timeout if timeout else None
+        self.stop_event = threading.Event()
+        # Set with stop_event, or alone by the SLA circuit breaker: no new students, running ones finish
+        self.admissions_closed = threading.Event()
+        self.successful = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.arrivals = None
+        self.step_metrics = StepMetrics()
+        self.retry_step_metrics = StepMetrics()
+        self.attempts = {'first': {'success': 0, 'failed': 0}, 'retry': {'success': 0, 'failed': 0}}
+        self.retries = None
+        self.checkpoint = None
+        self.restored = 0
+        self.prior_attempts = {}
+        self.driver_pool = None
+        self.browser_contexts = None
+        self.chat_metrics = ChatMetrics()
+        self.network_metrics = NetworkMetrics()
+        self.telemetry = None
+        self.host_monitor = None
+        self.session_cache = None
+        self.soak = None
+        self.sla = None
+        self.sla_verdict = None
+        self.scenarios = None
+        self.scenario_results = {}
+        self.locators = None
+        self.active = 0
+        self._lock = threading.Lock()
+        self._drivers = set()
+
+    def remaining(self):
+        """Seconds left before the global deadline (None when unbounded)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def record_result(self, success, student=None):
+        """Count one finished student and return a (done, success, failed) snapshot"""
+        with self._lock:
+            if success:
+                self.successful += 1
+            else:
+                self.failed += 1
+            snapshot = self.successful + self.failed, self.successful, self.failed
+            if student is not None and 'scenario' in student:
+                counts = self.scenario_results.setdefault(student['scenario'], {'success': 0, 'failed': 0})
+                counts['success' if success else 'failed'] += 1
+        if self.telemetry:
+            self.telemetry.record_completion(success)
+        if self.sla:
+            self.sla.window.record_completion(success)
+        if student is not None and self.accounts is not None:
+            self.accounts.record_result(student['email'], success, session_number_for(student, self.accounts))
+        return snapshot
+
+    def new_timer(self, student, attempt=0):
+        """Step timer for one attempt; retries feed their own metrics so first attempts stay comparable"""
+        metrics = self.step_metrics if attempt == 0 else self.retry_step_metrics
+        return StepTimer(metrics, session=session_number_for(student, self.accounts), attempt=attempt)
+    
+    def count_attempt(self, attempt, success):
+        with self._lock:
+            self.attempts['first' if attempt == 0 else 'retry']['success' if success else 'failed'] += 1
+    
+    def finish_attempt(self, student, student_index, attempt, success, timer):
+        """Checkpoint one attempt; False when a transient failure was queued for retry instead of finishing"""
+        self.count_attempt(attempt, success)
+        kind = category = None
+        queued = False
+        if not success and self.retries:
+            # The attempt's FAILURE_STEP_* records reach AttemptFailures on the log writer thread
+            flush_logs()
+            kind, category = self.retries.classify(student['email'])
+            queued = self.retries.offer(student, student_index, attempt, kind)
+        if self.checkpoint:
+            self.checkpoint.record(student, attempt, success, not queued, timer, category, kind)
+        if queued:
+            log_print(f"Student {student_index+1} will be retried ({category or 'no failure record'} is transient, retry {attempt+1} of {self.retries.max_attempts})")
+            logging.info(f"RETRY_QUEUED: {student['email']} - attempt={attempt + 1}, category={category}")
+        return not queued
+
+    def session_started(self):
+        with self._lock:
+            self.active += 1
+        # The session now counts as active, so the admission slot it reserved is no longer needed
+        if self.host_monitor:
+            self.host_monitor.admitted()
+        if self.telemetry:
+            self.telemetry.record_start()
+
+    def session_finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def active_sessions(self):
+        with self._lock:
+            return self.active
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def register_driver(self, driver):
+        with self._lock:
+            self._drivers.add(driver)
+
+    def unregister_driver(self, driver):
+        with self._lock:
+            self._drivers.discard(driver)
+
+    def close_admissions(self, reason):
+        """Admit no more students (queued ones are cancelled) and let the running ones finish"""
+        if self.admissions_closed.is_set():
+            return
+        self.admissions_closed.set()
+        log_print(f"Stopping admissions: {reason} - draining {self.active_sessions()} running sessions")
+    
+    def cancel_all(self):
+        """Stop admitting students and tear down every browser still running"""
+        self.admissions_closed.set()
+        self.stop_event.set()
+        with self._lock:
+            drivers = list(self._drivers)
+            self._drivers.clear()
+        for driver in drivers:
+            teardown_driver(driver)
+
+
+def get_free_port():
+    """Ask the OS for a free local TCP port for Chrome remote debugging"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
 
 def setup_driver(config):
     """Setup Chrome WebDriver in headless mode"""
     chrome_options = Options()
     
+    # Each driver gets its own debugging port and profile so parallel browsers don't collide
+    debug_port = get_free_port()
+    profile_dir = tempfile.mkdtemp(prefix="chrome_profile_")
+    
     # Always run in headless mode
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-images")
     chrome_options.add_argument("--disable-plugins")
     chrome_options.add_argument("--disable-background-timer-throttling")
     chrome_options.add_argument("--disable-backgrounding-occluded-windows")
     chrome_options.add_argument("--disable-renderer-backgrounding")
-    chrome_options.add_argument("--remote-debugging-port=9222")
+    chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
+    chrome_options.add_argument(f"--user-data-dir={profile_dir}")
     
     window_size = config.get('WINDOW_SIZE', '1920,1080')
     chrome_options.add_argument(f"--window-size={window_size}")
     chrome_options.add_argument("--disable-web-security")
     chrome_options.add_argument("--allow-running-insecure-content")
     
+    # Lean mode: skip Chrome's own background services; fonts/analytics are blocked per tab over CDP
+    # (--disable-images is ignored by current Chrome, so asset blocking goes through BROWSER_BLOCK_URLS)
+    if lean_mode_enabled(config):
+        for arg in LEAN_CHROME_ARGS:
+            chrome_options.add_argument(arg)
+    
+    # Per-request network timings come from the CDP events in Chrome's performance log
+    if network_capture_enabled(config):
+        enable_performance_logging(chrome_options)
+    
     try:
         driver = webdriver.Chrome(options=chrome_options)
+        driver.profile_dir = profile_dir
+        driver.debug_port = debug_port
+        prepare_driver(driver, config)
         return driver
     except Exception as e:
-        print(f"Error setting up Chrome driver: {e}")
-        print("Make sure ChromeDriver is installed and in PATH")
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        log_print(f"Error setting up Chrome driver: {e}")
+        log_print("Make sure ChromeDriver is installed and in PATH")
         return None
 
-def run_student_session(student, config, student_index, total_students):
-    """Run a single student session"""
-    start_time = datetime.now()
-    
-    # Setup WebDriver
+def attach_driver(config, debug_port):
+    """WebDriver session on a shared Chrome that is already running (lean mode contexts)"""
+    chrome_options = Options()
+    chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{debug_port}")
+    if network_capture_enabled(config):
+        enable_performance_logging(chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+def launch_shared_browser(config):
+    """Start a Chrome that lean mode contexts attach to: (driver, debug_port), or None"""
     driver = setup_driver(config)
-    if not driver:
-        print(f"ERROR: Failed to setup WebDriver for student {student_index + 1}")
-        return False
-    
+    return (driver, driver.debug_port) if driver else None
+
+def prepare_driver(driver, config):
+    """Per-tab setup: fetch/XHR tracker, URL blocking and network throttling"""
+    enable_network_tracking(driver)
+    apply_browser_conditions(driver, config)
+
+def new_driver(config, run=None):
+    """A browser for one student: its own Chrome, or an isolated context in a shared Chrome in lean mode"""
+    if run and run.browser_contexts:
+        return run.browser_contexts.create()
+    return setup_driver(config)
+
+def teardown_driver(driver):
+    """Quit the browser and remove its temporary profile directory"""
+    contexts = getattr(driver, 'browser_contexts', None)
+    if contexts:
+        # A context in a shared Chrome: close the context, the browser stays up for the others
+        contexts.close(driver)
+        return
     try:
-        
-        # Step 1: Navigate to AI Tutor URL
-        login_url = config['LOGIN_URL']
-        print(f"Navigating to: {login_url}")
+        driver.quit()
+    except Exception:
+        pass
+    profile_dir = getattr(driver, 'profile_dir', None)
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+def pause(run, seconds):
+    """Sleep for a viewing or think time, waking early if the run is cancelled so stragglers exit promptly"""
+    if seconds <= 0:
+        return
+    if run:
+        run.stop_event.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+def browser_login(driver, student, config, run, timer, waiter):
+    """Restore a cached login when enabled; otherwise (or if it was rejected) log in through the UI"""
+    element_timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
+    session_cache = run.session_cache if run else None
+    if session_cache is not None and session_cache.restore(driver, student, waiter, timer):
+        return
+    
+    # Step 1: Navigate to AI Tutor URL
+    login_url = config['LOGIN_URL']
+    log_print(f"Navigating to: {login_url}")
+    
+    # Load initial page and click Student button
+    initial_timeout = int(config.get('INITIAL_PAGE_TIMEOUT', 30))
+    wait = WebDriverWait(driver, initial_timeout, poll_frequency=poll_interval(config, 'element', 0.5))
+    
+    with timer.step('initial_page_load'):
         driver.get(login_url)
-        
-        # Load initial page and click Student button
-        initial_timeout = int(config.get('INITIAL_PAGE_TIMEOUT', 30))
-        wait = WebDriverWait(driver, initial_timeout)
-        
         # Explicit wait for page ready
         wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
-        
-        try:
+    
+    try:
+        with timer.step('student_button'):
             # Explicit wait for Student button
-            student_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['STUDENT_BUTTON_XPATH'])))
+            student_button = waiter.element('STUDENT_BUTTON', 'clickable', initial_timeout)
             student_button.click()
-            
-            # Explicit wait for page transition
-            time.sleep(3)
-        except TimeoutException as e:
-            print(f"Student button not found: {e}")
-            logging.error(f"FAILURE_STEP_STUDENT_BUTTON: {student['email']} - {e}")
-            raise
         
-        # Fill login form with explicit waits
-        element_timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
-        wait = WebDriverWait(driver, element_timeout)
+        # Wait for the login form's requests to settle instead of a fixed sleep
+        if waiter.network_idle('student_button_settle', timeout=initial_timeout) is None:
+            log_print("Page still busy after Student button; continuing")
+    except TimeoutException as e:
+        log_print(f"Student button not found: {e}")
+        logging.error(f"FAILURE_STEP_STUDENT_BUTTON: {student['email']} - {e}")
+        raise
+    
+    # Fill login form with explicit waits
+    try:
+        # Explicit wait for email field
+        email_field = waiter.element('EMAIL_FIELD', 'clickable', element_timeout)
+        email_field.clear()
+        email_field.send_keys(student['email'])
         
-        try:
-            # Explicit wait for email field
-            email_field = wait.until(EC.element_to_be_clickable((By.XPATH, config['EMAIL_FIELD_XPATH'])))
-            email_field.clear()
-            email_field.send_keys(student['email'])
-            
-            # Explicit wait for password field
-            password_field = wait.until(EC.element_to_be_clickable((By.XPATH, config['PASSWORD_FIELD_XPATH'])))
-            password_field.clear()
-            password_field.send_keys(student['password'])
-            
-            # Explicit wait for login button
-            login_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['LOGIN_BUTTON_XPATH'])))
-            login_button.click()
-            print("Login completed")
-            
-        except TimeoutException as e:
-            print(f"Login failed: {e}")
-            logging.error(f"FAILURE_STEP_LOGIN_FORM: {student['email']} - {e}")
-            raise
+        # Explicit wait for password field
+        password_field = waiter.element('PASSWORD_FIELD', 'clickable', element_timeout)
+        password_field.clear()
+        password_field.send_keys(student['password'])
         
-        # Check for aspirations page with explicit wait
-        aspirations_timeout = int(config.get('ASPIRATIONS_WAIT_TIMEOUT', 10))
-        aspirations_wait = WebDriverWait(driver, aspirations_timeout)
+        # Explicit wait for login button
+        login_button = waiter.element('LOGIN_BUTTON', 'clickable', element_timeout)
+        with timer.step('login_submit') as clock:
+            login_button.click()
+            # Login is done once the next page (aspirations form or main navigation) is present
+            next_page_xpath = f"{config['BACKGROUND_ASPIRATIONS_XPATH']} | {config['NAVIGATION_ENROLLED_UNITS_XPATH']}"
+            _, clock.ready_at = waiter.until('login_submit', next_page_xpath, 'present', element_timeout)
+        log_print("Login completed")
+    
+    except TimeoutException as e:
+        log_print(f"Login failed: {e}")
+        logging.error(f"FAILURE_STEP_LOGIN_FORM: {student['email']} - {e}")
+        raise
+    
+    # Check for aspirations page with explicit wait (a single check for accounts already onboarded)
+    aspirations_timeout = 0 if student.get('onboarded') else int(config.get('ASPIRATIONS_WAIT_TIMEOUT', 10))
+    try:
+        # Explicit wait for aspirations field
+        aspirations_field = waiter.element('BACKGROUND_ASPIRATIONS', 'clickable', aspirations_timeout)
+        aspirations_started = time.perf_counter()
+        aspirations_field.click()
         
-        try:
-            # Explicit wait for aspirations field
-            aspirations_field = aspirations_wait.until(EC.element_to_be_clickable((By.XPATH, config['BACKGROUND_ASPIRATIONS_XPATH'])))
-            aspirations_field.click()
-            
-            aspirations_text = generate_background_aspirations(config)
-            aspirations_field.clear()
-            aspirations_field.send_keys(aspirations_text)
-            
-            # Explicit wait for submit button
-            submit_button = aspirations_wait.until(EC.element_to_be_clickable((By.XPATH, config['SUBMIT_INFORMATION_BUTTON_XPATH'])))
-            submit_button.click()
-            print("Aspirations completed")
-            
-        except TimeoutException:
-            print("Aspirations skipped")
+        aspirations_text = generate_background_aspirations(config)
+        aspirations_field.clear()
+        aspirations_field.send_keys(aspirations_text)
         
-        # Navigate to sessions with explicit waits
-        try:
+        # Explicit wait for submit button
+        submit_button = waiter.element('SUBMIT_INFORMATION_BUTTON', 'clickable', aspirations_timeout)
+        submit_button.click()
+        timer.record('aspirations', time.perf_counter() - aspirations_started)
+        log_print("Aspirations completed")
+        if run and run.accounts is not None:
+            run.accounts.mark_onboarded(student['email'])
+    
+    except TimeoutException:
+        log_print("Aspirations skipped")
+        # Logged in without being asked: this account is past onboarding
+        if run and run.accounts is not None and not student.get('onboarded'):
+            run.accounts.mark_onboarded(student['email'])
+    
+    if session_cache is not None:
+        session_cache.save(driver, student)
+
+def browser_open_session(driver, student, config, timer, waiter, session_number):
+    """Enrolled units, the unit's session list, then the student's session"""
+    element_timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
+    
+    # Navigate to sessions with explicit waits
+    try:
+        with timer.step('enrolled_units'):
             # Explicit wait for navigation link
-            nav_link = wait.until(EC.element_to_be_clickable((By.XPATH, config['NAVIGATION_ENROLLED_UNITS_XPATH'])))
+            nav_link = waiter.element('NAVIGATION_ENROLLED_UNITS', 'clickable', element_timeout)
             nav_link.click()
             
             # Explicit wait for View Details button
-            view_details_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['VIEW_DETAILS_BUTTON_XPATH'])))
+            view_details_button = waiter.element('VIEW_DETAILS_BUTTON', 'clickable', element_timeout)
+        
+        with timer.step('session_list') as clock:
             view_details_button.click()
             
-            # Explicit wait for sessions list
-            wait.until(EC.presence_of_element_located((By.XPATH, "//tbody/tr[1]/td[6]/button[1]")))
-            
-            # Explicit wait for session button
-            session_number = get_session_number(student['email'], credentials)
-            session_xpath = config['SESSION_BUTTON_XPATH'].format(session_number=session_number)
-            session_button = wait.until(EC.element_to_be_clickable((By.XPATH, session_xpath)))
-            session_button.click()
-            print(f"Session {session_number} selected")
-            
-        except TimeoutException as e:
-            print(f"Navigation failed: {e}")
-            logging.error(f"FAILURE_STEP_NAVIGATION: {student['email']} - {e}")
-            raise
+            # Event-driven wait for sessions list
+            _, clock.ready_at = waiter.until('session_list', "//tbody/tr[1]/td[6]/button[1]", 'present', element_timeout)
         
-        # View PPT presentation with fluent wait for container
-        try:
-            # Fluent wait for PPT container - 20 minutes with 2-minute polling
-            ppt_fluent_wait = WebDriverWait(driver, timeout=1200, poll_frequency=120)
-            ppt_container = ppt_fluent_wait.until(
-                EC.visibility_of_element_located((By.XPATH, config['PPT_CONTAINER_XPATH']))
-            )
-            
-            # Explicit wait for PPT play button
-            ppt_play_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['PPT_PLAY_BUTTON_XPATH'])))
-            ppt_play_button.click()
-            
-            viewing_duration = int(config.get('PPT_VIEWING_DURATION', 300))
-            print(f"PPT viewing started ({viewing_duration}s)")
-            time.sleep(viewing_duration)
-            print("PPT viewing completed")
-            
-            # Open AI chatbot with explicit waits
-            try:
+        # Explicit wait for session button
+        session_button = waiter.element('SESSION_BUTTON', 'clickable', element_timeout, session_number=session_number)
+        session_button.click()
+        log_print(f"Session {session_number} selected")
+        
+    except TimeoutException as e:
+        log_print(f"Navigation failed: {e}")
+        logging.error(f"FAILURE_STEP_NAVIGATION: {student['email']} - {e}")
+        raise
+
+def browser_view_ppt(driver, student, config, run, timer, waiter, capture, step):
+    """Wait for the generated deck, play it and view it for the step's duration (PPT_VIEWING_DURATION by default)"""
+    element_timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
+    
+    # View PPT presentation with fluent wait for container
+    try:
+        with timer.step('ppt_container') as clock:
+            # Observer-driven wait: the ready time is exact whatever POLL_INTERVAL_PPT_CONTAINER is
+            ppt_timeout = int(config.get('PPT_CONTAINER_TIMEOUT', 1200))
+            ppt_container, clock.ready_at = waiter.until('ppt_container', waiter.locators['PPT_CONTAINER'], 'visible', ppt_timeout)
+        
+        # Explicit wait for PPT play button
+        ppt_play_button = waiter.element('PPT_PLAY_BUTTON', 'clickable', element_timeout)
+        ppt_play_button.click()
+    except TimeoutException:
+        log_print("PPT container not found")
+        logging.error(f"FAILURE_STEP_PPT_CONTAINER: {student['email']}")
+        raise Exception("PPT_CONTAINER_NOT_FOUND: PPT container could not be loaded")
+    
+    viewing_duration = int(config.get('PPT_VIEWING_DURATION', 300)) if step.duration is None else step.duration()
+    log_print(f"PPT viewing started ({viewing_duration:.0f}s)")
+    pause(run, viewing_duration)
+    log_print("PPT viewing completed")
+    if capture:
+        capture.drain()
+
+def browser_ask(driver, student, config, run, timer, waiter, question, chat_open):
+    """Type and send one question, opening the chatbot first if needed; returns (observing, active_at_send)"""
+    element_timeout = int(config.get('ELEMENT_WAIT_TIMEOUT', 30))
+    try:
+        if chat_open:
+            message_textarea = waiter.element('AI_MESSAGE_TEXTAREA', 'clickable', element_timeout)
+            chat_container = waiter.element('AI_CHAT_CONTAINER', 'present', element_timeout)
+        else:
+            with timer.step('chatbot_open'):
                 # Explicit wait for Raise Hand button
-                raise_hand_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['RAISE_HAND_BUTTON_XPATH'])))
+                raise_hand_button = waiter.element('RAISE_HAND_BUTTON', 'clickable', element_timeout)
                 raise_hand_button.click()
                 
-                # Explicit wait for chat container
-                wait.until(EC.visibility_of_element_located((By.XPATH, config['AI_CHAT_CONTAINER_XPATH'])))
+                # Event-driven wait for chat container
+                chat_container, _ = waiter.until('chatbot_open', waiter.locators['AI_CHAT_CONTAINER'], 'visible', element_timeout)
                 
                 # Explicit wait for message textarea
-                message_textarea = wait.until(EC.element_to_be_clickable((By.XPATH, config['AI_MESSAGE_TEXTAREA_XPATH'])))
-                
-                chat_question = config.get('AI_CHAT_QUESTION', 'how will mba benefit my career?')
-                message_textarea.click()
-                message_textarea.clear()
-                message_textarea.send_keys(chat_question)
-                
-                # Explicit wait for send button
-                send_button = wait.until(EC.element_to_be_clickable((By.XPATH, config['AI_SEND_BUTTON_XPATH'])))
-                send_button.click()
-                
-                print("Chatbot interaction completed")
-                
-            except TimeoutException as e:
-                print(f"Chatbot failed: {e}")
-                logging.error(f"FAILURE_STEP_CHATBOT_TIMEOUT: {student['email']} - {e}")
-                raise Exception("CHATBOT_OPEN_FAILURE: AI chatbot could not be opened after PPT viewing")
-            except Exception as e:
-                print(f"Chatbot error: {e}")
-                logging.error(f"FAILURE_STEP_CHATBOT_ERROR: {student['email']} - {e}")
-                raise Exception(f"CHATBOT_OPEN_FAILURE: {str(e)}")
-            
-        except TimeoutException:
-            print("PPT container not found")
-            logging.error(f"FAILURE_STEP_PPT_CONTAINER: {student['email']}")
-            raise Exception("PPT_CONTAINER_NOT_FOUND: PPT container could not be loaded")
+                message_textarea = waiter.element('AI_MESSAGE_TEXTAREA', 'clickable', element_timeout)
+        
+        message_textarea.click()
+        message_textarea.clear()
+        message_textarea.send_keys(question)
+        
+        # Explicit wait for send button
+        send_button = waiter.element('AI_SEND_BUTTON', 'clickable', element_timeout)
+        
+        # Watch the chat container so the AI reply can be timed from the moment of sending
+        observing = install_chat_observer(driver, chat_container, question, config)
+        if observing:
+            mark_chat_sent(driver)
+        active_at_send = run.active_sessions() if run else 1
+        send_button.click()
+        
+        log_print("Chatbot interaction completed")
+        return observing, active_at_send
+        
+    except TimeoutException as e:
+        log_print(f"Chatbot failed: {e}")
+        logging.error(f"FAILURE_STEP_CHATBOT_TIMEOUT: {student['email']} - {e}")
+        raise Exception("CHATBOT_OPEN_FAILURE: AI chatbot could not be opened after PPT viewing")
+    except Exception as e:
+        log_print(f"Chatbot error: {e}")
+        logging.error(f"FAILURE_STEP_CHATBOT_ERROR: {student['email']} - {e}")
+        raise Exception(f"CHATBOT_OPEN_FAILURE: {str(e)}")
 
+def browser_chat(driver, student, config, run, timer, waiter, step, chat_open):
+    """Hold the step's conversation one turn at a time, timing every reply; returns whether the chatbot is open"""
+    for turn, question in enumerate(step.conversation()):
+        if turn and step.think:
+            pause(run, step.think())
+        observing, active_at_send = browser_ask(driver, student, config, run, timer, waiter, question, chat_open)
+        chat_open = True
+        if not observing:
+            continue
+        
+        # Wait for the AI tutor's reply and measure it
+        observation = wait_for_chat_response(driver, config, run.stop_event if run else None)
+        if run:
+            run.chat_metrics.record(observation, active_at_send)
+        if observation['first_token'] is not None:
+            timer.record('chat_first_token', observation['first_token'])
+            timer.record('chat_response', observation['full_response'])
+        if observation['outcome'] != 'ok':
+            log_print(f"Chatbot reply {observation['outcome']}")
+            logging.error(f"FAILURE_STEP_CHATBOT_RESPONSE: {student['email']} - outcome={observation['outcome']}, chars={observation['chars']}")
+            raise Exception(f"CHATBOT_RESPONSE_FAILURE: AI reply was {observation['outcome']}")
+        log_print(f"Chatbot replied: first content {observation['first_token']:.1f}s, complete {observation['full_response']:.1f}s")
+    return chat_open
+
+def run_student_session(student, config, student_index, total_students, run=None, timer=None, scenario=None):
+    """Run a single student session: the scenario's steps in order (the built-in journey when none is given)"""
+    start_time = datetime.now()
+    session_number = session_number_for(student, run.accounts if run else None)
+    timer = timer or StepTimer(run.step_metrics if run else None, session=session_number)
+    scenario = scenario or builtin_journey(config)
+    pool = run.driver_pool if run else None
+    
+    # Setup WebDriver (checked out warm from the pool when one is configured)
+    driver = pool.acquire() if pool else new_driver(config, run)
+    if not driver:
+        log_print(f"ERROR: Failed to setup WebDriver for student {student_index + 1}")
+        return False
+    if run:
+        run.register_driver(driver)
+    
+    waiter = EventWait(driver, config, run.stop_event if run else None, run.locators if run else None)
+    capture = NetworkCapture(driver, run.network_metrics, config) if run and network_capture_enabled(config) else None
+    
+    try:
+        chat_open = False
+        for step in scenario.steps:
+            if step.kind == 'login':
+                browser_login(driver, student, config, run, timer, waiter)
+            elif step.kind == 'open_session':
+                browser_open_session(driver, student, config, timer, waiter, session_number)
+            elif step.kind == 'view_ppt':
+                browser_view_ppt(driver, student, config, run, timer, waiter, capture, step)
+            elif step.kind == 'chat':
+                chat_open = browser_chat(driver, student, config, run, timer, waiter, step, chat_open)
+            else:
+                pause(run, step.think())
+        
         # Session completed
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        print(f"Student {student_index + 1} completed ({duration:.1f}s)")
+        step_timings = ", ".join(f"{step}={seconds:.2f}s" for step, seconds in timer.durations.items())
+        attempt = f"attempt={timer.attempt}, " if timer.attempt else ""
+        logging.info(f"STEP_TIMINGS: {student['email']} - session={session_number}, {attempt}{step_timings}")
+        log_print(f"Student {student_index + 1} completed ({duration:.1f}s)")
         return True
     
     except TimeoutException as e:
-        print(f"Student {student_index + 1} timeout: {e}")
+        log_print(f"Student {student_index + 1} timeout: {e}")
         logging.error(f"FAILURE_STEP_TIMEOUT: {student['email']} - {e}")
         return False
     except NoSuchElementException as e:
-        print(f"Student {student_index + 1} element not found: {e}")
+        log_print(f"Student {student_index + 1} element not found: {e}")
         logging.error(f"FAILURE_STEP_ELEMENT_NOT_FOUND: {student['email']} - {e}")
         return False
     except Exception as e:
-        print(f"Student {student_index + 1} error: {e}")
-        logging.error(f"FAILURE_STEP_UNEXPECTED: {student['email']} - {e}")
+        log_print(f"Student {student_index + 1} error: {e}")
+        # The exception type lets the retry policy tell a crashed browser from a broken page
+        logging.error(f"FAILURE_STEP_UNEXPECTED: {student['email']} - {type(e).__name__}: {e}")
         return False
     
     finally:
-        driver.quit()
+        if capture:
+            capture.drain()
+        if run:
+            run.unregister_driver(driver)
+        if pool:
+            pool.release(driver)
+        else:
+            teardown_driver(driver)
 
-def main():
-    """Main function to run batch student sessions"""
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description='AI Tutor Student PPT Viewer - Headless Batch Processing')
-    parser.add_argument('--students', type=int, help='Number of students to test (overrides config)')
-    args = parser.parse_args()
+def run_student_worker(student, config, student_index, total_students, run, scheduled_offset=None, attempt=0):
+    """Pool worker: run one attempt of a student unless the batch has already been stopped"""
+    if run.admissions_closed.is_set():
+        run.record_cancelled()
+        return None
     
-    # Setup logging first
-    log_file = setup_logging()
+    # Hold the start while the load generator itself is saturated
+    if run.host_monitor and not run.host_monitor.wait_for_admission(run.admissions_closed):
+        run.record_cancelled()
+        return None
     
-    log_print("AI Tutor Student PPT Viewer - Headless Batch Processing")
-    log_print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    log_print(f"Log file: {log_file}")
+    if run.arrivals and scheduled_offset is not None:
+        lag = run.arrivals.record_start(scheduled_offset)
+        if lag is not None:
+            log_print(f"WARNING: Harness behind schedule - student {student_index+1} started {lag:.1f}s late (all workers busy?)")
+            logging.warning(f"SCHEDULE_LAG: student={student_index+1}, lag={lag:.1f}s")
     
-    # Load configuration and credentials
-    config = load_config()
-    credentials = load_student_credentials()
+    # Picked from a hash of the student, so a retry repeats the same scenario and session
+    scenario = run.scenarios.assign(student, run.accounts)
+    with log_context(student=student['email'], student_index=student_index + 1, attempt=attempt, scenario=scenario.name):
+        retry = f" (retry {attempt})" if attempt else ""
+        log_print(f"Starting student {student_index+1}/{total_students}{retry}: {student['email']}")
+        if run.retries:
+            run.retries.failures.begin(student['email'], attempt)
+        try:
+            timer = run.new_timer(student, attempt)
+            run.session_started()
+            try:
+                success = run_student_session(student, config, student_index, total_students, run, timer, scenario)
+            finally:
+                run.session_finished()
+        
+            # A session torn down by the deadline is a cancellation, not a tutor failure
+            if not success and run.stop_event.is_set():
+                run.record_cancelled()
+                log_print(f"Student {student_index+1} cancelled (execution timeout reached)")
+                return None
+        
+            if not run.finish_attempt(student, student_index, attempt, success, timer):
+                return None
+            done, successful, failed = run.record_result(success, student)
+            progress = (done / total_students) * 100
+            log_print(f"Progress: {done}/{total_students} ({progress:.1f}%) - Success: {successful}, Failed: {failed}",
+                      event='progress', outcome='success' if success else 'failed')
+            return success
+        finally:
+            # Successful and cancelled attempts are never classified; drop their entry
+            if run.retries:
+                run.retries.failures.discard(student['email'], attempt)
+
+def run_parallel_batch(students, config, run, max_workers, schedule=None):
+    """Run students on a bounded thread pool, enforcing the global execution deadline
     
-    if not credentials:
-        log_print("ERROR: No student credentials found")
-        return
+    Without a schedule students are admitted as fast as the pool allows. With a
+    schedule (list of start offsets in seconds) each student is released at its
+    offset from the run start, regardless of how many sessions are still active.
+    """
+    # A resumed run numbers its students after the ones the checkpoint already finished
+    total_students = len(students) + run.restored
+    request_delay = float(config.get('REQUEST_DELAY', 0.1))
     
-    # Determine execution parameters
-    if args.students:
-        total_students = args.students
-        log_print(f"Command line override: {total_students} students")
-    else:
-        total_students = int(config.get('TOTAL_STUDENTS', len(credentials)))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="student")
+    futures = []
+    submitted = 0
+    try:
+        for i, student in enumerate(students):
+            if run.admissions_closed.is_set() or run.remaining() == 0:
+                break
+            index = run.restored + i
+            attempt = run.prior_attempts.get(student['email'], 0)
+            
+            if schedule is not None:
+                # Sleep until this arrival is due, waking early if the run is stopped
+                delay = run.start_time + schedule[i] - time.monotonic()
+                if delay > 0 and run.admissions_closed.wait(delay):
+                    break
+                run.arrivals.record_scheduled()
+                futures.append(executor.submit(run_student_worker, student, config, index, total_students, run, schedule[i], attempt))
+                submitted += 1
+                continue
+            
+            futures.append(executor.submit(run_student_worker, student, config, index, total_students, run, None, attempt))
+            submitted += 1
+            
+            # Stagger browser launches while the pool is filling up
+            if request_delay > 0 and i < min(max_workers, len(students)) - 1:
+                time.sleep(request_delay)
+        
+        # Wait for the students, submitting queued retries as their backoff runs out
+        not_done = set(futures)
+        while not run.stop_event.is_set():
+            retrying = run.retries and not run.admissions_closed.is_set()
+            for student, index, attempt in (run.retries.pop_due() if retrying else []):
+                future = executor.submit(run_student_worker, student, config, index, total_students, run, None, attempt)
+                futures.append(future)
+                not_done.add(future)
+            next_retry = run.retries.next_due_in() if retrying else None
+            remaining = run.remaining()
+            if (not not_done and next_retry is None) or remaining == 0:
+                break
+            timeout = min([t for t in (remaining, next_retry) if t is not None], default=None)
+            if not not_done:
+                run.admissions_closed.wait(timeout)
+                continue
+            _, not_done = wait_for_futures(not_done, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not_done:
+            log_print(f"Execution timeout reached: cancelling {len(not_done)} unfinished students")
+            for future in not_done:
+                future.cancel()
+            run.cancel_all()
+    finally:
+        executor.shutdown(wait=True)
+    abandon_retries(run)
     
-    # Validate student count
-    if total_students > len(credentials):
-        total_students = len(credentials)
-        log_print(f"WARNING: Limited to {total_students} students (available credentials)")
+    # Students never submitted because the deadline passed first
+    for _ in range(len(students) - submitted):
+        run.record_cancelled()
+    for future in futures:
+        if future.cancelled():
+            run.record_cancelled()
+
+def run_soak_worker(student, config, student_index, total_students, run):
+    """Soak worker: cycle one virtual student through the journey until the soak ends, drawing a scenario per iteration"""
+    iteration = 0
+    while not run.admissions_closed.is_set() and run.soak.remaining() > 0:
+        if run.host_monitor and not run.host_monitor.wait_for_admission(run.admissions_closed):
+            break
+        iteration += 1
+        scenario = run.scenarios.assign(student, run.accounts, iteration)
+        with log_context(student=student['email'], student_index=student_index + 1, iteration=iteration, scenario=scenario.name):
+            log_print(f"Starting student {student_index+1}/{total_students} iteration {iteration}: {student['email']}")
+            started = time.monotonic()
+            run.session_started()
+            try:
+                success = run_student_session(student, config, student_index, total_students, run, scenario=scenario)
+            finally:
+                run.session_finished()
+            if not success and run.stop_event.is_set():
+                run.record_cancelled()
+                break
+            finish_soak_iteration(run, student, success, time.monotonic() - started)
+        
+        # Think time before the next cycle, cut short when the run is stopped
+        if run.admissions_closed.wait(run.soak.think_time()):
+            break
+
+def finish_soak_iteration(run, student, success, seconds):
+    """Count one soak iteration; later iterations of an onboarded student skip the aspirations wait"""
+    run.soak.windows.record_iteration(success, seconds)
+    if success:
+        student['onboarded'] = True
+    done, successful, failed = run.record_result(success, student)
+    elapsed = (run.soak.duration - run.soak.remaining()) / 60
+    log_print(f"Soak progress: {elapsed:.1f}/{run.soak.duration / 60:.1f} min - {done} iterations, Success: {successful}, Failed: {failed}",
+              event='progress', outcome='success' if success else 'failed')
+
+def run_soak_batch(students, config, run):
+    """Run a fixed set of looping virtual students, one thread each, until the soak duration is over"""
+    request_delay = float(config.get('REQUEST_DELAY', 0.1))
+    executor = ThreadPoolExecutor(max_workers=len(students), thread_name_prefix="soak")
+    futures = []
+    try:
+        for i, student in enumerate(students):
+            if run.admissions_closed.is_set():
+                break
+            futures.append(executor.submit(run_soak_worker, student, config, i, len(students), run))
+            if request_delay > 0:
+                time.sleep(request_delay)
+        
+        # In-flight iterations may finish after the soak ends, until the run deadline
+        _, not_done = wait_for_futures(futures, timeout=run.remaining())
+        if not_done:
+            log_print(f"Soak drain timeout reached: cancelling {len(not_done)} running iterations")
+            run.cancel_all()
+    finally:
+        executor.shutdown(wait=True)
+
+def abandon_retries(run):
+    """Retries still waiting when the run ends keep their last (failed) outcome"""
+    if not run.retries:
+        return
+    for student, index, attempt in run.retries.drain():
+        log_print(f"Student {index+1} retry {attempt} not started before the run ended - counted as failed")
+        run.record_result(False, student)
+
+def execute_batch(config, accounts, students, max_workers, execution_timeout, schedule=None, checkpoint=None, resume=None,
+                  scenarios=None):
+    """Run `students` with the configured engine and return the finished RunState
+
+    With a checkpoint every finished attempt is appended to it; `resume` is a loaded
+    checkpoint whose finished students are restored into the run's counters and metrics.
+    `scenarios` is the compiled workload mix (SCENARIO_FILE is loaded when not given).
+    """
+    engine = config.get('ENGINE', 'browser')
     
-    log_print(f"Target: {total_students} students")
-    log_print(f"Available credentials: {len(credentials)} students")
-    log_print("Execution mode: Headless (server optimized)")
-    log_print(f"Request delay: {config.get('REQUEST_DELAY', 0.1)}s between students")
+    # Lean mode can pack several students into one Chrome, each in its own browser context
+    browser_contexts = None
+    per_browser = contexts_per_browser(config)
+    if per_browser > 1 and engine == 'browser':
+        browser_contexts = BrowserContexts(lambda: launch_shared_browser(config), lambda port: attach_driver(config, port),
+                                           lambda driver: prepare_driver(driver, config), teardown_driver, per_browser)
+    if engine == 'browser':
+        log_print(f"Browser mode: {describe_browser_mode(config)}")
     
-    # Track results
-    successful_sessions = 0
-    failed_sessions = 0
-    start_time = datetime.now()
+    # Pre-launch warm browsers so Chrome startup is paid once, not once per student
+    driver_pool = None
+    pool_size = min(int(config.get('DRIVER_POOL_SIZE', 0)), max_workers)
+    if pool_size > 0 and engine == 'browser':
+        driver_pool = DriverPool(browser_contexts.create if browser_contexts else lambda: setup_driver(config), teardown_driver,
+                                 pool_size, origins=[origin_of(config['LOGIN_URL']), origin_of(config['API_BASE_URL'])],
+                                 max_reuse=int(config.get('DRIVER_MAX_REUSE', 0)),
+                                 reset=browser_contexts.reset if browser_contexts else reset_driver)
+        log_print(f"Driver pool: warming {pool_size} browsers...")
+        log_print(f"Driver pool: {driver_pool.warm()} browsers ready")
     
-    # Process students sequentially
-    for i in range(total_students):
-        student = credentials[i]
-        
-        log_print(f"Starting student {i+1}/{total_students}: {student['email']}")
-        
-        success = run_student_session(student, config, i, total_students)
-        
-        if success:
-            successful_sessions += 1
+    # One event loop runs every protocol student: account writes go through a writer thread instead of blocking it
+    if engine == 'protocol' and isinstance(accounts, CredentialStore):
+        accounts = QueuedAccounts(accounts)
+    
+    # Run students on the bounded worker pool
+    run = RunState(accounts, timeout=execution_timeout or None)
+    run.driver_pool = driver_pool
+    run.browser_contexts = browser_contexts
+    run.checkpoint = checkpoint
+    run.scenarios = scenarios or load_scenarios(config)
+    run.locators = LocatorRegistry(config)
+    if resume is not None:
+        restore_run(run, resume)
+    if soak_enabled(config):
+        # Each iteration is a fresh attempt anyway, so soak runs neither retry nor checkpoint
+        run.soak = Soak(config)
+        run.soak.attach(run.step_metrics)
+        run.checkpoint = None
+    elif retries_enabled(config):
+        run.retries = RetryQueue(config)
+        attach_log_handler(run.retries.failures)
+    run.chat_metrics = ChatMetrics(int(config.get('CHAT_CONCURRENCY_BAND', 10)))
+    run.network_metrics = NetworkMetrics(int(config.get('NETWORK_MAX_ENDPOINTS', 500)))
+    if schedule is not None:
+        run.arrivals = ArrivalTracker(run.start_time, float(config.get('SCHEDULE_LAG_TOLERANCE', 5)))
+    exporter, telemetry_handler = start_live_telemetry(config, run)
+    if sla_enabled(config):
+        run.sla = SlaMonitor(config, run.active_sessions, run.close_admissions)
+        run.step_metrics.listeners.append(run.sla.window.record_step)
+        run.sla.start()
+        abort = f", abort at {float(config['SLA_ABORT_ERROR_RATE']):.0%} errors" if run.sla.abort_error_rate > 0 else ""
+        log_print(f"SLA: checking the last {run.sla.window.window:.0f}s every {run.sla.interval:.0f}s{abort}")
+    account_handler = AccountFailureHandler(accounts) if accounts is not None else None
+    if account_handler:
+        attach_log_handler(account_handler)
+    if host_monitor_enabled(config):
+        os.makedirs(os.path.join("results", "raw"), exist_ok=True)
+        host_csv = os.path.join("results", "raw", f"host_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        run.host_monitor = HostMonitor(config, run.active_sessions, max_workers, host_csv).start()
+        log_print(f"Host monitor: {run.host_monitor.cores} cores, CPU limit {run.host_monitor.cpu_limit:.0f}%, "
+                  f"memory limit {run.host_monitor.memory_limit:.0f}%, samples in {host_csv}")
+    if session_cache_enabled(config) and engine == 'browser':
+        # Distributed workers only hold an AccountUpdates buffer; they keep a cache database of their own
+        cache_store = accounts if isinstance(accounts, CredentialStore) else CredentialStore(config.get('CREDENTIALS_DB', CREDENTIALS_DB))
+        run.session_cache = SessionCache(cache_store, config)
+        log_print(f"Session cache: restoring stored logins from {cache_store.path}")
+    try:
+        if engine == 'protocol':
+            from protocol_student import run_protocol_batch, run_protocol_soak
+            if run.soak:
+                run_protocol_soak(students, config, run)
+            else:
+                run_protocol_batch(students, config, run, max_workers, schedule)
+        elif run.soak:
+            run_soak_batch(students, config, run)
         else:
-            failed_sessions += 1
-        
-        # Progress update
-        progress = ((i + 1) / total_students) * 100
-        log_print(f"Progress: {i+1}/{total_students} ({progress:.1f}%) - Success: {successful_sessions}, Failed: {failed_sessions}")
-        
-        # Add delay between students
-        request_delay = float(config.get('REQUEST_DELAY', 0.1))
-        if request_delay > 0 and i < total_students - 1:
-            time.sleep(request_delay)
+            run_parallel_batch(students, config, run, max_workers, schedule)
+    finally:
+        if driver_pool:
+            driver_pool.close()
+        if browser_contexts:
+            browser_contexts.shutdown()
+        if exporter:
+            exporter.stop()
+            detach_log_handler(telemetry_handler)
+        if run.host_monitor:
+            run.host_monitor.stop()
+        if run.sla:
+            run.sla.stop()
+        if account_handler:
+            detach_log_handler(account_handler)
+        if isinstance(accounts, QueuedAccounts):
+            accounts.close()
+        if run.retries:
+            detach_log_handler(run.retries.failures)
+    return run
+
+def start_live_telemetry(config, run):
+    """Attach live telemetry to the run and start its /metrics endpoint and CSV writer, if configured"""
+    port = int(config.get('TELEMETRY_PORT', 0))
+    interval = float(config.get('TELEMETRY_CSV_INTERVAL', 0))
+    if not port and interval <= 0:
+        return None, None
+    
+    run.telemetry = LiveTelemetry(run.active_sessions, window=float(config.get('TELEMETRY_WINDOW', 60)))
+    run.step_metrics.listeners.append(run.telemetry.record_step)
+    telemetry_handler = TelemetryLogHandler(run.telemetry)
+    attach_log_handler(telemetry_handler)
+    
+    csv_path = None
+    if interval > 0:
+        os.makedirs(os.path.join("results", "raw"), exist_ok=True)
+        csv_path = os.path.join("results", "raw", f"telemetry_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    exporter = TelemetryExporter(run.telemetry, port=port, csv_path=csv_path, interval=interval,
+                                 host=config.get('TELEMETRY_HOST', '127.0.0.1'))
+    try:
+        exporter.start()
+    except OSError as e:
+        log_print(f"WARNING: Telemetry endpoint not started on port {port}: {e}")
+        exporter.port = 0
+        exporter.start()
+    if exporter.server:
+        log_print(f"Live metrics: http://{exporter.host}:{exporter.server.server_address[1]}/metrics")
+    if csv_path:
+        log_print(f"Live telemetry CSV: {csv_path} (every {interval:g}s)")
+    return exporter, telemetry_handler
+
+def log_run_summary(run, config, total_students, max_workers, start_time, end_time, log_file, schedule=None):
+    """Print and log the end-of-run summary, step latency and chat tables"""
+    successful_sessions = run.successful
+    failed_sessions = run.failed
+    driver_pool = run.driver_pool
     
     # Final summary
-    end_time = datetime.now()
     total_duration = (end_time - start_time).total_seconds()
     
     log_print(f"\nBATCH EXECUTION SUMMARY")
     log_print(f"Successful sessions: {successful_sessions}")
     log_print(f"Failed sessions: {failed_sessions}")
+    log_print(f"Cancelled sessions: {run.cancelled}")
     log_print(f"Success rate: {(successful_sessions/total_students)*100:.1f}%")
     log_print(f"Total duration: {total_duration:.1f} seconds")
     log_print(f"Average per student: {total_duration/total_students:.1f} seconds")
@@ -415,12 +1010,381 @@ def main():
     log_print(f"Log file: {log_file}")
     
     # Log summary for parsing
-    logging.info(f"BATCH_SUMMARY: total={total_students}, success={successful_sessions}, failed={failed_sessions}, rate={(successful_sessions/total_students)*100:.1f}%, duration={total_duration:.1f}s")
+    logging.info(f"BATCH_SUMMARY: total={total_students}, success={successful_sessions}, failed={failed_sessions}, cancelled={run.cancelled}, concurrency={max_workers}, rate={(successful_sessions/total_students)*100:.1f}%, duration={total_duration:.1f}s")
+    
+    if run.arrivals:
+        arrivals = run.arrivals.summary()
+        log_print(f"Achieved arrival rate: {run.arrivals.achieved_rate():.2f} users/s ({describe_schedule(schedule)})")
+        log_print(f"Schedule lag: avg {arrivals['avg_lag']:.2f}s, max {arrivals['max_lag']:.2f}s, {arrivals['late']} late starts")
+        logging.info(f"SCHEDULE_SUMMARY: profile={config['LOAD_PROFILE']}, scheduled={arrivals['scheduled']}, started={arrivals['started']}, achieved_rate={run.arrivals.achieved_rate():.3f}/s, avg_lag={arrivals['avg_lag']:.2f}s, max_lag={arrivals['max_lag']:.2f}s, late={arrivals['late']}")
+        if arrivals['late']:
+            log_print("WARNING: Harness fell behind the target schedule - raise MAX_CONCURRENT_STUDENTS or add load generators")
+    
+    # Outcomes per workload scenario, against the mix SCENARIO_FILE asked for
+    if run.scenarios and run.scenarios.source:
+        log_print(f"\nSCENARIO MIX ({run.scenarios.describe()})")
+        log_print(SCENARIO_TABLE_HEADER)
+        rows = scenario_rows(run.scenarios, run.scenario_results)
+        for row in rows:
+            log_print(format_scenario_row(row))
+        logging.info(f"SCENARIO_SUMMARY: {json.dumps({'file': run.scenarios.source, 'scenarios': rows})}")
+    
+    if driver_pool:
+        pool_stats = driver_pool.summary()
+        log_print(f"Driver pool: size {pool_stats['size']}, launched {pool_stats['created']}, replaced {pool_stats['replaced']}, reused {pool_stats['reused']}")
+        if pool_stats['wait_count']:
+            log_print(f"Driver pool wait (ms): p50={pool_stats['wait_p50_ms']:.0f} p95={pool_stats['wait_p95_ms']:.0f} max={pool_stats['wait_max_ms']:.0f}")
+            if pool_stats['wait_p95_ms'] > 1000:
+                log_print("WARNING: Students waited for a browser - DRIVER_POOL_SIZE is smaller than the load needs")
+        logging.info(f"DRIVER_POOL_SUMMARY: {json.dumps(pool_stats)}")
+    
+    # Load generator saturation and capacity calibration
+    if run.browser_contexts:
+        contexts = run.browser_contexts.summary()
+        log_print(f"Browser contexts: {contexts['contexts_created']} contexts in at most {contexts['peak_browsers']} Chrome processes "
+                  f"({contexts['contexts_per_browser']} per process)")
+    if run.host_monitor:
+        host = run.host_monitor.summary()
+        host['browser_mode'] = describe_browser_mode(config) if config.get('ENGINE', 'browser') == 'browser' else 'protocol'
+        log_print(f"Load generator: peak CPU {host['peak_cpu_percent']:.0f}%, peak memory {host['peak_memory_percent']:.0f}%, "
+                  f"saturated {host['saturated_seconds']:.0f}s in {host['saturation_periods']} periods")
+        if host['students_per_core'] is not None:
+            log_print(f"Capacity: {host['cpu_cores_per_student']:.3f} cores and {host['rss_mb_per_student']:.0f} MB per student "
+                      f"-> ~{host['students_per_core']:.1f} students per core, ~{host['max_students_by_memory']} students by memory")
+        if host['pss_mb_per_student'] is not None:
+            log_print(f"Memory per student: {host['pss_mb_per_student']:.0f} MB PSS, {host['rss_mb_per_student']:.0f} MB RSS ({host['browser_mode']})")
+        if host['saturation_periods']:
+            log_print("WARNING: Load generator was saturated - timeouts in those periods may be the harness, not the tutor")
+        logging.info(f"HOST_SUMMARY: {json.dumps(host)}")
+    
+    # Cached logins restored instead of going through the login UI
+    if run.session_cache:
+        cache = run.session_cache.summary()
+        hit_rate = f"{cache['hit_rate']:.0%}" if cache['hit_rate'] is not None else "n/a"
+        log_print(f"Session cache: {cache['hit']} hits of {cache['lookups']} lookups ({hit_rate}), {cache['miss']} missing, "
+                  f"{cache['expired']} expired, {cache['rejected']} rejected, {cache['stored']} stored")
+        logging.info(f"SESSION_CACHE_SUMMARY: {json.dumps(cache)}")
+    
+    # Per-step latency percentiles, overall and per session
+    step_rows = run.step_metrics.rows()
+    if step_rows:
+        log_print("\nSTEP LATENCY (ms)")
+        log_print(STEP_TABLE_HEADER)
+        for row in step_rows:
+            log_print(format_step_row(row))
+            logging.info(f"STEP_LATENCY: {json.dumps(row)}")
+        os.makedirs(os.path.join("results", "raw"), exist_ok=True)
+        metrics_file = os.path.join("results", "raw", f"step_metrics_{start_time.strftime('%Y%m%d_%H%M%S')}.json")
+        run.step_metrics.save(metrics_file)
+        log_print(f"Step metrics: {metrics_file}")
+    
+    # Which candidate each element locator matched: a fallback means the page changed, not that it got slower
+    locator_rows = run.locators.rows() if run.locators else []
+    if locator_rows:
+        log_print("\nLOCATORS (ms)")
+        log_print(LOCATOR_TABLE_HEADER)
+        for row in locator_rows:
+            log_print(format_locator_row(row))
+            logging.info(f"LOCATOR_STATS: {json.dumps(row)}")
+        for row in locator_rows:
+            if row['fallback']:
+                logging.warning(f"LOCATOR_BROKEN: {row['locator']}_XPATH matched nothing in {row['fallback']} of "
+                                f"{row['lookups']} lookups; a fallback found the element, so its step latencies are "
+                                f"real but the configured locator needs updating")
+    
+    # Retried attempts, kept out of the first-attempt step table above
+    first, retry = run.attempts['first'], run.attempts['retry']
+    if run.retries or retry['success'] or retry['failed']:
+        log_print(f"\nFirst attempts: {first['success']} succeeded, {first['failed']} failed")
+        log_print(f"Retries: {retry['success']} succeeded, {retry['failed']} failed")
+        retry_summary = {'first_attempts': first, 'retries': retry}
+        if run.retries:
+            retry_summary.update(queued=run.retries.queued, failures_by_class=run.retries.by_class)
+            log_print(f"Failed attempts: {run.retries.by_class['transient']} transient, "
+                      f"{run.retries.by_class['deterministic']} deterministic (not retried)")
+        retry_rows = run.retry_step_metrics.rows()
+        if retry_rows:
+            log_print("\nRETRY STEP LATENCY (ms)")
+            log_print(STEP_TABLE_HEADER)
+            for row in retry_rows:
+                if row['session'] == 'all':
+                    log_print(format_step_row(row))
+        retry_summary['step_latency'] = [row for row in retry_rows if row['session'] == 'all']
+        logging.info(f"RETRY_SUMMARY: {json.dumps(retry_summary)}")
+    if run.checkpoint:
+        log_print(f"Checkpoint: {run.checkpoint.path}")
+    
+    # Soak windows and per-step trends across them
+    if run.soak:
+        log_soak_summary(run, config, start_time)
+    
+    # AI tutor reply latency per concurrency band
+    chat_rows = run.chat_metrics.rows()
+    if chat_rows:
+        log_print("\nAI CHAT RESPONSES (ms, by active sessions)")
+        log_print(CHAT_TABLE_HEADER)
+        for row in chat_rows:
+            log_print(format_chat_row(row))
+            logging.info(f"CHAT_LATENCY: {json.dumps(row)}")
+    
+    # Per-endpoint request timings (NETWORK_CAPTURE=true)
+    network_rows = run.network_metrics.rows()
+    if network_rows:
+        log_print("\nNETWORK REQUESTS (ms, slowest p95 first)")
+        log_print(NETWORK_TABLE_HEADER)
+        for row in network_rows[:int(config.get('NETWORK_REPORT_ROWS', 20))]:
+            log_print(format_network_row(row))
+        for row in network_rows:
+            logging.info(f"NETWORK_LATENCY: {json.dumps(row)}")
+        os.makedirs(os.path.join("results", "raw"), exist_ok=True)
+        network_file = os.path.join("results", "raw", f"network_metrics_{start_time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(network_file, 'w') as f:
+            json.dump({'summary': network_rows, 'raw': run.network_metrics.to_dict()}, f, indent=2)
+        log_print(f"Network metrics: {network_file}")
     
     # Log failure summary if there were failures
     if failed_sessions > 0:
         log_print(f"Failure Analysis: {failed_sessions} total failures")
         logging.info(f"FAILURE_ANALYSIS: total_failures={failed_sessions}")
+    
+    # Pass/fail against the SLA thresholds, last so it is the final thing on the console
+    if run.sla:
+        log_sla_verdict(run, start_time)
+
+def log_sla_verdict(run, start_time):
+    """Judge the run against its SLA, print and log the verdict and save it as JSON for CI"""
+    verdict = run.sla.verdict(run.step_metrics, run.successful, run.failed)
+    run.sla_verdict = verdict
+    log_print(f"\nSLA VERDICT: {verdict['status'].upper()}")
+    if verdict['abort_reason']:
+        log_print(f"Aborted: {verdict['abort_reason']}")
+    for failure in verdict['failures']:
+        log_print(f"  {failure}")
+    for name, check in sorted(verdict['checks'].items()):
+        log_print(f"  {name}: limit {check['limit']:g}, worst window {check['worst']:g}, "
+                  f"breached {check['breached_checks']}/{check['checks']} checks")
+    logging.info(f"SLA_VERDICT: {json.dumps(verdict)}")
+    os.makedirs(os.path.join("results", "summary"), exist_ok=True)
+    verdict_file = os.path.join("results", "summary", f"sla_verdict_{start_time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(verdict_file, 'w') as f:
+        json.dump(verdict, f, indent=2)
+    log_print(f"SLA verdict: {verdict_file}")
+
+def log_soak_summary(run, config, start_time):
+    """Print the soak's time windows and drift table, log them for the report and save them as JSON"""
+    rows = run.soak.windows.rows()
+    log_print(f"\nSOAK WINDOWS ({run.soak.windows.window_seconds:.0f}s)")
+    log_print(f"{'window':>6} {'start':>8} {'iterations':>10} {'failed':>6} {'error %':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for row in rows:
+        error_rate = f"{row['error_rate'] * 100:.1f}" if row['error_rate'] is not None else "-"
+        p50 = f"{row['iteration_p50_ms']:.0f}" if row['iteration_p50_ms'] is not None else "-"
+        p95 = f"{row['iteration_p95_ms']:.0f}" if row['iteration_p95_ms'] is not None else "-"
+        start = f"{int(row['start_s'] // 3600)}:{int(row['start_s'] % 3600 // 60):02d}:{int(row['start_s'] % 60):02d}"
+        log_print(f"{row['window']:>6} {start:>8} {row['iterations']:>10} {row['failed']:>6} {error_rate:>7} "
+                  f"{p50:>9} {p95:>9}{'  (partial)' if row['partial'] else ''}")
+        logging.info(f"SOAK_WINDOW: {json.dumps(row)}")
+    
+    drift = drift_analysis(rows, config)
+    if drift:
+        log_print("\nSOAK DRIFT (Theil-Sen slope, Mann-Kendall p)")
+        log_print(DRIFT_TABLE_HEADER)
+        for row in drift:
+            log_print(format_drift_row(row))
+            logging.info(f"SOAK_DRIFT: {json.dumps(row)}")
+    else:
+        log_print(f"Soak drift: not enough complete windows for a trend (need {config.get('SOAK_MIN_WINDOWS', 4)})")
+    drifting = [f"{row['step']} {row['metric']}" for row in drift if row['drift']]
+    if drifting:
+        log_print(f"WARNING: Significant drift over the soak in {', '.join(drifting)} - look for leaks or exhausted pools on the server")
+    
+    os.makedirs(os.path.join("results", "raw"), exist_ok=True)
+    soak_file = os.path.join("results", "raw", f"soak_{start_time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(soak_file, 'w') as f:
+        json.dump({'duration_s': run.soak.duration, 'window_s': run.soak.windows.window_seconds,
+                   'windows': rows, 'drift': drift}, f, indent=2)
+    log_print(f"Soak windows: {soak_file}")
+
+def main():
+    """Main function to run batch student sessions"""
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='AI Tutor Student PPT Viewer - Headless Batch Processing')
+    parser.add_argument('--students', type=int, help='Number of students to test (overrides config)')
+    parser.add_argument('--engine', choices=['browser', 'protocol'], help='browser = Selenium sessions, protocol = browserless HTTP virtual students (overrides ENGINE)')
+    parser.add_argument('--concurrency', type=int, help='Parallel student sessions (overrides MAX_CONCURRENT_STUDENTS / PROTOCOL_MAX_CONCURRENT)')
+    parser.add_argument('--timeout', type=int, help='Global execution deadline in seconds, 0 for none (overrides EXECUTION_TIMEOUT)')
+    parser.add_argument('--profile', choices=['none', 'constant', 'ramp', 'step', 'spike'], help='Arrival-rate load profile (overrides LOAD_PROFILE)')
+    parser.add_argument('--driver-pool', type=int, metavar='SIZE', help='Reuse SIZE warm browsers across students, 0 for a fresh browser per student (overrides DRIVER_POOL_SIZE)')
+    parser.add_argument('--lean', action='store_true', help='Lean browsers: CDP blocking of fonts/analytics and trimmed Chrome services (sets BROWSER_LEAN_MODE=true)')
+    parser.add_argument('--contexts-per-browser', type=int, metavar='N', help='In lean mode, run N students per Chrome process in isolated contexts (overrides BROWSER_CONTEXTS_PER_PROCESS)')
+    parser.add_argument('--network-profile', choices=['none', '3g', '4g', 'home_dsl', 'campus_wifi', 'custom'], help='Emulated student network conditions (overrides NETWORK_PROFILE)')
+    parser.add_argument('--capture-network', action='store_true', help='Record per-request timings by endpoint from Chrome performance logs (sets NETWORK_CAPTURE=true)')
+    parser.add_argument('--session-cache', action='store_true', help='Restore stored cookies/localStorage instead of logging in through the UI after the first login per account (sets SESSION_CACHE=true)')
+    parser.add_argument('--soak', metavar='DURATION', help='Soak mode: loop a fixed set of virtual students for DURATION, e.g. 90m or 8h (overrides SOAK_DURATION)')
+    parser.add_argument('--scenarios', metavar='FILE', help='Weighted workload mix of student journeys, think times and chat question banks (overrides SCENARIO_FILE)')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='CHECKPOINT', help='Continue a crashed or stopped run from its checkpoint (default: the latest in results/checkpoints)')
+    parser.add_argument('--quiet', action='store_true', help='Console shows only run-level output and periodic progress; per-student lines go to the log files (sets LOG_CONSOLE=quiet)')
+    parser.add_argument('--verbose', action='store_true', help='Console shows every per-student line whatever the concurrency (sets LOG_CONSOLE=verbose)')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='Override any config value, e.g. --set ARRIVAL_RATE=2 (repeatable)')
+    args = parser.parse_args()
+    
+    # Load configuration first: it sets up logging
+    config = apply_config_overrides(load_config(), args.set)
+    if args.quiet:
+        config['LOG_CONSOLE'] = 'quiet'
+    elif args.verbose:
+        config['LOG_CONSOLE'] = 'verbose'
+    log_file = setup_logging(config=config)
+    
+    log_print("AI Tutor Student PPT Viewer - Headless Batch Processing")
+    log_print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log_print(f"Log file: {log_file}")
+    if LOG_PIPELINE.json_file:
+        log_print(f"JSON log: {LOG_PIPELINE.json_file} (run {LOG_PIPELINE.run_id})")
+    
+    if args.profile:
+        config['LOAD_PROFILE'] = args.profile
+    if args.driver_pool is not None:
+        config['DRIVER_POOL_SIZE'] = str(args.driver_pool)
+    if args.engine:
+        config['ENGINE'] = args.engine
+    if args.capture_network:
+        config['NETWORK_CAPTURE'] = 'true'
+    if args.lean:
+        config['BROWSER_LEAN_MODE'] = 'true'
+    if args.contexts_per_browser is not None:
+        config['BROWSER_CONTEXTS_PER_PROCESS'] = str(args.contexts_per_browser)
+    if args.network_profile:
+        config['NETWORK_PROFILE'] = args.network_profile
+    if args.session_cache:
+        config['SESSION_CACHE'] = 'true'
+    if args.soak:
+        config['SOAK_DURATION'] = args.soak
+    if args.scenarios:
+        config['SCENARIO_FILE'] = args.scenarios
+    engine = config.get('ENGINE', 'browser')
+    try:
+        soak = soak_enabled(config)
+        # Compiled once here; each student's pick is a hash lookup on the hot path
+        scenarios = load_scenarios(config)
+    except ValueError as e:
+        log_print(f"ERROR: {e}")
+        return 1
+    store = open_credential_store(config)
+    available = store.available() if store else 0
+    
+    resume = None
+    if args.resume and soak:
+        log_print("ERROR: Soak runs are not checkpointed and cannot be resumed")
+        return 1
+    if args.resume:
+        checkpoint_path = latest_checkpoint() if args.resume == 'latest' else args.resume
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            log_print(f"ERROR: No checkpoint to resume from ({args.resume})")
+            return 1
+        resume = load_checkpoint(checkpoint_path)
+        header = resume['header']
+        log_print(f"Resuming {checkpoint_path}: {len(resume['finished'])} of {len(header['students'])} students already finished")
+        if header['engine'] != engine:
+            log_print(f"WARNING: Checkpoint was written by the {header['engine']} engine, resuming with {engine}")
+    
+    if not store or (not available and resume is None):
+        log_print("ERROR: No student credentials found" if not store or not store.count() else "ERROR: Every student account is leased by another run")
+        return 1
+    
+    # Determine execution parameters
+    if resume is not None:
+        total_students = len(resume['header']['students'])
+    elif args.students:
+        total_students = args.students
+        log_print(f"Command line override: {total_students} students")
+    else:
+        total_students = int(config.get('TOTAL_STUDENTS', available))
+    
+    # Validate student count
+    if resume is None and total_students > available:
+        total_students = available
+        log_print(f"WARNING: Limited to {total_students} students (available credentials)")
+    
+    log_print(f"Target: {total_students} students")
+    log_print(f"Available credentials: {available} of {store.count()} students not leased")
+    log_print("Execution mode: Headless (server optimized)" if engine == 'browser' else "Execution mode: Protocol-level virtual students (no browser)")
+    log_print(f"Request delay: {config.get('REQUEST_DELAY', 0.1)}s between browser launches")
+    
+    concurrency_key = 'PROTOCOL_MAX_CONCURRENT' if engine == 'protocol' else 'MAX_CONCURRENT_STUDENTS'
+    max_workers = args.concurrency or int(config.get(concurrency_key, 1))
+    max_workers = max(1, min(max_workers, total_students))
+    execution_timeout = args.timeout if args.timeout is not None else int(config.get('EXECUTION_TIMEOUT', 0))
+    if soak:
+        # Every looping student holds a worker for the whole soak; the deadline is the soak plus time to drain
+        total_students = max_workers
+        duration = parse_duration(config['SOAK_DURATION'])
+        execution_timeout = int(duration + parse_duration(config.get('SOAK_DRAIN_TIMEOUT', 1800)))
+        log_print(f"Soak mode: {total_students} virtual students looping for {duration / 60:.1f} min, "
+                  f"think time {config.get('SOAK_THINK_TIME_MIN', 5)}-{config.get('SOAK_THINK_TIME_MAX', 30)}s, "
+                  f"{config.get('SOAK_WINDOW', 300)}s windows")
+    log_print(f"Concurrency: up to {max_workers} parallel {engine} sessions")
+    log_print(f"Workload: {scenarios.describe()}" + (f" from {scenarios.source}" if scenarios.source else " (built-in journey)"))
+    if quiet_console(config, max_workers):
+        log_print(f"Console: quiet (per-student output in {log_file}), progress every {config.get('LOG_PROGRESS_INTERVAL', 30)}s")
+    log_print(f"Execution timeout: {execution_timeout}s" if execution_timeout else "Execution timeout: none")
+    
+    # Build the arrival schedule for open-model load profiles (for the students still to run when resuming)
+    pending_students = total_students - len(resume['finished']) if resume is not None else total_students
+    try:
+        schedule = build_arrival_schedule(config, pending_students) if not soak else None
+    except ValueError as e:
+        log_print(f"ERROR: {e}")
+        return 1
+    if schedule is not None:
+        if not schedule:
+            log_print("ERROR: Load profile produced no arrivals - check its rate and duration settings")
+            return 1
+        # The profile decides how many students arrive, capped by the target student count
+        if resume is None:
+            total_students = len(schedule)
+        log_print(f"Load profile: {config['LOAD_PROFILE']} - {describe_schedule(schedule)}")
+    
+    # Lease the accounts so concurrent runs on this host never log in as the same student
+    owner = lease_owner()
+    lease_ttl = float(config.get('CREDENTIAL_LEASE_TTL', 0)) or (execution_timeout + 600 if execution_timeout else 6 * 3600)
+    if resume is not None:
+        # Take over the crashed run's leases on the students it did not finish
+        remaining = [email for email in resume['header']['students'] if email not in resume['finished']]
+        students = store.lease_emails(remaining, owner, lease_ttl, takeover=resume['owners'])
+        for previous_owner in resume['owners']:
+            store.release(previous_owner)
+        if len(students) < len(remaining):
+            log_print(f"WARNING: {len(remaining) - len(students)} unfinished students are leased by another run and are skipped")
+        if schedule is not None:
+            students = students[:len(schedule)]
+    else:
+        students = store.lease(total_students, owner, lease_ttl)
+        if len(students) < total_students:
+            log_print(f"WARNING: Only {len(students)} accounts could be leased")
+    onboarded = sum(1 for student in students if student['onboarded'])
+    log_print(f"Leased {len(students)} accounts ({onboarded} already onboarded)")
+    
+    # Each finished attempt goes to the checkpoint as it happens, so a crash loses only running students
+    checkpoint = None
+    if resume is not None:
+        checkpoint = RunCheckpoint(resume['path'])
+        checkpoint.resumed(owner, len(students))
+    elif str(config.get('CHECKPOINT', 'true')).lower() == 'true' and not soak:
+        checkpoint = RunCheckpoint.create(students, total_students, owner, engine)
+        log_print(f"Checkpoint: {checkpoint.path} (continue with --resume if the run is interrupted)")
+    
+    start_time = datetime.now()
+    try:
+        run = execute_batch(config, store, students, max_workers, execution_timeout, schedule, checkpoint, resume, scenarios)
+    finally:
+        store.release(owner)
+        if checkpoint:
+            checkpoint.close()
+    if run.soak:
+        # Soak results are per iteration, not per leased student
+        total_students = max(1, run.successful + run.failed)
+    log_run_summary(run, config, total_students, max_workers, start_time, datetime.now(), log_file, schedule)
+    return verdict_exit_code(run.sla_verdict)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
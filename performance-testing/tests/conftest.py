@@ -0,0 +1,20 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run from a scratch directory holding a copy of test_config.properties, so logs and results stay out of the tree"""
+    shutil.copy(os.path.join(ROOT, 'test_config.properties'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def config(workdir):
+    from student_ppt_viewer import load_config
+    return load_config()
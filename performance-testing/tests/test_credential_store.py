@@ -0,0 +1,45 @@
+import csv
+import os
+import time
+
+from credential_store import CredentialStore
+from student_ppt_viewer import get_session_for_index
+
+def write_csv(path, emails):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['email', 'password'])
+        writer.writerows([[email, 'secret'] for email in emails])
+
+def test_reimport_renumbers_positions_and_retires_dropped_accounts(workdir):
+    old = [f"old{n}@example.com" for n in range(100)]
+    new = [f"new{n}@example.com" for n in range(60)]
+    store = CredentialStore('accounts.db')
+    write_csv('accounts.csv', old)
+    assert store.sync_csv('accounts.csv') == 100
+    store.record_result('old0@example.com', True, 1)
+
+    # Re-provisioned: a different set of students, one of the old ones kept at the end
+    write_csv('accounts.csv', new + ['old0@example.com'])
+    os.utime('accounts.csv', (time.time() + 5, time.time() + 5))
+    assert store.sync_csv('accounts.csv') == 61
+    assert (store.count(), store.available()) == (61, 61)
+
+    leased = store.lease(100, 'test', 60)
+    assert [s['email'] for s in leased] == new + ['old0@example.com']
+    assert [s['index'] for s in leased] == list(range(1, 62))
+    sessions = [get_session_for_index(s['index']) for s in leased]
+    assert sessions == [1] * 25 + [2] * 25 + [3] * 11
+    # A kept account moves to its new row but keeps its history
+    assert store.get('old0@example.com')['runs'] == 1
+    assert store.get('old1@example.com')['retired'] == 1
+    assert store.lease_emails(['old1@example.com'], 'test', 60) == []
+    store.close()
+
+def test_duplicate_rows_do_not_leave_gaps(workdir):
+    store = CredentialStore('accounts.db')
+    write_csv('accounts.csv', ['a@example.com', 'b@example.com', 'a@example.com', 'c@example.com'])
+    store.import_csv('accounts.csv')
+    assert [(s['email'], s['index']) for s in store.iter_accounts()] == \
+        [('a@example.com', 1), ('b@example.com', 2), ('c@example.com', 3)]
+    store.close()
@@ -0,0 +1,69 @@
+import csv
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from conftest import ROOT
+from student_ppt_viewer import get_free_port
+
+STUDENTS = 6
+
+@pytest.fixture
+def mock_url(workdir):
+    """mock_portal.py in its own process on a free localhost port"""
+    port = get_free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'mock_portal.py'), '--port', str(port),
+                                '--set', 'MOCK_CHAT_FIRST_TOKEN_MS=10', '--set', 'MOCK_CHAT_CHUNK_INTERVAL_MS=5'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{url}/__mock/stats", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+def tagged(path, tag):
+    with open(path) as f:
+        return [json.loads(line.split(f"{tag}: ", 1)[1]) for line in f if f" - {tag}: " in line]
+
+def test_spawn_local_workers_share_one_start_and_disjoint_shards(workdir, mock_url):
+    with open('student_credentials.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['email', 'password'])
+        writer.writerows([[f"student{n}@example.com", 'secret'] for n in range(STUDENTS)])
+    overrides = ['ENGINE=protocol', f"PROTOCOL_BASE_URL={mock_url}", 'PROTOCOL_VIEWING_DURATION=0',
+                 'PROTOCOL_PPT_POLL_INTERVAL=0.1', 'HOST_MONITOR=false', 'TELEMETRY_PORT=0', 'CHECKPOINT=false']
+    command = [sys.executable, os.path.join(ROOT, 'distributed_runner.py'), 'coordinator', '--workers', '2',
+               '--spawn-local', '--port', '0', '--start-delay', '1', '--report-grace', '30']
+    for override in overrides:
+        command += ['--set', override]
+    subprocess.run(command, check=True, timeout=120, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    assignments = [entry for path in glob.glob('logs/distributed_worker_local-*.log')
+                   for entry in tagged(path, 'WORKER_ASSIGNMENT')]
+    assert sorted(a['worker_id'] for a in assignments) == [0, 1]
+    assert len({a['start_at'] for a in assignments}) == 1
+    shards = [set(a['students']) for a in assignments]
+    assert not shards[0] & shards[1]
+    assert shards[0] | shards[1] == {f"student{n}@example.com" for n in range(STUDENTS)}
+
+    [summary_file] = glob.glob('results/summary/distributed_*.json')
+    with open(summary_file) as f:
+        summary = json.load(f)
+    assert (summary['total_students'], summary['successful'], summary['failed'], summary['cancelled']) == (STUDENTS, STUDENTS, 0, 0)
+    assert sorted(summary['workers']) == ['local-0', 'local-1']
+    assert sum(worker['successful'] for worker in summary['workers'].values()) == STUDENTS
+    login = next(row for row in summary['step_latency'] if row['step'] == 'login_submit' and row['session'] == 'all')
+    assert login['count'] == STUDENTS
@@ -0,0 +1,28 @@
+import threading
+
+from host_monitor import HostMonitor
+
+def test_concurrent_admissions_stop_at_the_limit(config):
+    active = []
+    monitor = HostMonitor(config, lambda: len(active), 3)
+    barrier = threading.Barrier(10)
+    granted = []
+
+    def worker():
+        barrier.wait()
+        if monitor.try_admit():
+            granted.append(True)
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 3
+
+    # Starting a reserved session hands its slot over to the active count
+    active.append('session')
+    monitor.admitted()
+    assert not monitor.try_admit()
+    active.pop()
+    assert monitor.try_admit()
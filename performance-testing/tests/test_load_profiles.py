@@ -0,0 +1,21 @@
+import pytest
+
+from load_profiles import build_arrival_schedule, describe_schedule
+
+@pytest.mark.parametrize('offsets, description', [
+    ([], "0 arrivals"),
+    ([0.0], "1 arrival all at once at 0.0s"),
+    ([5.0] * 50, "50 arrivals all at once at 5.0s"),
+    ([0.0, 1.0, 2.0, 3.0, 4.0], "5 arrivals over 4.0s (target 1.00 users/s)"),
+])
+def test_describe_schedule(offsets, description):
+    assert describe_schedule(offsets) == description
+
+@pytest.mark.parametrize('settings, message', [
+    ({'STEP_USERS': '0'}, "STEP_USERS must be at least 1"),
+    ({'STEP_INTERVAL': '0'}, "STEP_INTERVAL must be greater than 0"),
+])
+def test_step_profile_rejects_degenerate_settings(config, settings, message):
+    config.update({'LOAD_PROFILE': 'step', **settings})
+    with pytest.raises(ValueError, match=message):
+        build_arrival_schedule(config, 100)
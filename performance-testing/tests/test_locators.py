@@ -0,0 +1,96 @@
+import pytest
+
+from locators import class_token_selector, compile_candidates, css_escape, xpath_to_css
+
+# Every locator in test_config.properties: the candidate chain it compiles to
+CONFIG_LOCATORS = [
+    ('STUDENT_BUTTON', [('xpath', "(//button[normalize-space()='Student'])[1]")]),
+    ('EMAIL_FIELD', [('css', 'input[placeholder="Enter your email"]')]),
+    ('PASSWORD_FIELD', [('css', 'input[placeholder="Your password"]')]),
+    ('LOGIN_BUTTON', [('xpath', "//button[normalize-space()='Login']")]),
+    ('BACKGROUND_ASPIRATIONS', [('css', 'textarea[placeholder*="background"], textarea[placeholder*="aspirations"], '
+                                        'textarea[placeholder*="share"], textarea[name*="background"], textarea[id*="background"]')]),
+    ('SUBMIT_INFORMATION_BUTTON', [('xpath', "//button[normalize-space()='Submit Information']")]),
+    ('NAVIGATION_ENROLLED_UNITS', [('xpath', "//span[normalize-space()='Enrolled Units']")]),
+    ('VIEW_DETAILS_BUTTON', [('xpath', "(//button[@data-slot='button'][normalize-space()='View Details'])[1]")]),
+    ('SESSION_BUTTON', [('css', 'tbody > tr:nth-of-type({session_number}) > td:nth-of-type(6) > button:nth-of-type(1)')]),
+    ('PPT_CONTAINER', [('css', 'div[class="bg-card text-card-foreground flex flex-col gap-6 rounded-xl border shadow-sm overflow-hidden py-0"]'),
+                       ('css', 'div.bg-card.text-card-foreground.flex.flex-col.gap-6.rounded-xl.border.shadow-sm.overflow-hidden.py-0')]),
+    ('RAISE_HAND_BUTTON', [('css', 'button[title="Raise Hand / Ask AI"]')]),
+    ('AI_CHAT_CONTAINER', [('css', 'div[class="p-4 h-full overflow-hidden"]'), ('css', 'div.p-4.h-full.overflow-hidden')]),
+    ('AI_MESSAGE_TEXTAREA', [('css', 'textarea[placeholder="Type your message (max 700 characters)..."]')]),
+    ('AI_SEND_BUTTON', [('xpath', "//button[normalize-space()='Send']")]),
+]
+
+@pytest.mark.parametrize('name, candidates', CONFIG_LOCATORS)
+def test_config_locators_compile(config, name, candidates):
+    assert compile_candidates(config, name) == candidates
+
+def test_every_config_locator_is_pinned(config):
+    pinned = {name for name, _ in CONFIG_LOCATORS} | {'PPT_PLAY_BUTTON'}
+    assert {key[:-len('_XPATH')] for key in config if key.endswith('_XPATH')} == pinned
+
+def test_tailwind_class_locator(config):
+    # The single-quoted [class*='size-'] inside a double-quoted XPath literal stays as is in the CSS string
+    attribute, tokens = compile_candidates(config, 'PPT_PLAY_BUTTON')
+    assert attribute[1].startswith('button[class="inline-flex items-center ') and attribute[1].endswith(' duration-200"]')
+    assert "[&_svg:not([class*='size-'])]:size-4" in attribute[1]
+    assert tokens[1].startswith('button.inline-flex.items-center.')
+    for escaped in (r".\[\&_svg\]\:pointer-events-none.", r".focus-visible\:ring-\[3px\].", r".gap-1\.5.",
+                    r".has-\[\>svg\]\:px-2\.5.", r".hover\:bg-white\/20."):
+        assert escaped in tokens[1]
+
+@pytest.mark.parametrize('xpath, css', [
+    ("//div[@id]", 'div[id]'),
+    ("//a[starts-with(@href, '/units')]", 'a[href^="/units"]'),
+    ("//input[@type='text' and @name='q']", 'input[type="text"][name="q"]'),
+    ("//ul/li[2]", 'ul > li:nth-of-type(2)'),
+    ("//*[3]", '*:nth-child(3)'),
+    ("(//button[@data-slot='button'])[1]", 'button[data-slot="button"]'),
+    ('//input[@placeholder=\'say "hi"\']', 'input[placeholder="say \\"hi\\""]'),
+    ("//div[@title='back\\slash']", 'div[title="back\\\\slash"]'),
+])
+def test_translated_xpath(xpath, css):
+    assert xpath_to_css(xpath) == css
+
+@pytest.mark.parametrize('xpath', [
+    "//span[text()='Enrolled Units']",
+    "//span[contains(text(), 'Units')]",
+    "//button[normalize-space()='Send']",
+    "//div/following-sibling::span",
+    "//div/parent::section",
+    "//label/..",
+    "//button[@type='submit'][2]",
+    "(//button)[2]",
+    "/html/body/div",
+    "//div[contains(@class, '')]",
+    "//div[@id=1]",
+])
+def test_untranslatable_xpath_stays_xpath(xpath):
+    assert xpath_to_css(xpath) is None
+
+def test_prefer_css_off_and_fallbacks(config):
+    config['LOCATOR_PREFER_CSS'] = 'false'
+    config['EMAIL_FIELD_FALLBACKS'] = "css:input[type=email] || xpath://input[@name='email'] || input#email || css:input[type=email]"
+    assert compile_candidates(config, 'EMAIL_FIELD') == [
+        ('xpath', "//input[@placeholder='Enter your email']"), ('css', 'input[type=email]'),
+        ('xpath', "//input[@name='email']"), ('css', 'input#email')]
+
+@pytest.mark.parametrize('identifier, escaped', [
+    ('size-4', 'size-4'),
+    ('[&_svg]:size-4', r'\[\&_svg\]\:size-4'),
+    ('ring-[3px]', r'ring-\[3px\]'),
+    ("[class*='size-']", r"\[class\*\=\'size-\'\]"),
+    ('a"b', r'a\"b'),
+    ('3xl', r'\33 xl'),
+    ('-2', r'-\32 '),
+    ('-', r'\-'),
+    ('bg-black/50', r'bg-black\/50'),
+])
+def test_css_escape(identifier, escaped):
+    assert css_escape(identifier) == escaped
+
+def test_class_token_selector():
+    assert class_token_selector("//div[@class='a  b:c']") == r'div.a.b\:c'
+    assert class_token_selector("//div[@class='']") is None
+    assert class_token_selector("//div[@class='a'][1]") is None
@@ -0,0 +1,35 @@
+import logging
+import threading
+
+from log_pipeline import LogPipeline, log_context
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.seen = []
+
+    def emit(self, record):
+        self.seen.append((record.getMessage(), getattr(record, 'student', None), threading.current_thread()))
+
+def test_attached_handlers_run_on_the_writer_thread(workdir):
+    pipeline = LogPipeline('test', {'LOG_JSON': 'false'}).start()
+    recorder = Recorder()
+    pipeline.add_handler(recorder)
+    try:
+        with log_context(student='student1@example.com'):
+            for n in range(50):
+                logging.error(f"FAILURE_STEP_LOGIN: student1@example.com - attempt {n}")
+        logging.info("below the handler's level")
+        pipeline.flush()
+        assert len(recorder.seen) == 50
+        assert recorder.seen[-1][:2] == ("FAILURE_STEP_LOGIN: student1@example.com - attempt 49", 'student1@example.com')
+        assert all(thread is not threading.current_thread() for _, _, thread in recorder.seen)
+
+        # Removing drains first, then the handler sees nothing more
+        logging.error("FAILURE_STEP_LOGIN: student2@example.com - late")
+        pipeline.remove_handler(recorder)
+        logging.error("FAILURE_STEP_LOGIN: student3@example.com - after removal")
+        pipeline.flush()
+        assert [message for message, _, _ in recorder.seen[50:]] == ["FAILURE_STEP_LOGIN: student2@example.com - late"]
+    finally:
+        pipeline.stop()
@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+
+import aiohttp
+from aiohttp import web
+
+from mock_portal import MockPortal
+from protocol_student import _protocol_worker, _run_protocol_batch, run_protocol_session
+from retry_policy import RetryQueue
+from scenarios import load_scenarios
+from student_ppt_viewer import RunState
+
+FAST = {'MOCK_CHAT_FIRST_TOKEN_MS': 10, 'MOCK_CHAT_CHUNKS': 5, 'MOCK_CHAT_CHUNK_INTERVAL_MS': 5,
+        'PROTOCOL_VIEWING_DURATION': 0, 'PROTOCOL_PPT_POLL_INTERVAL': 0.05}
+
+def student(n):
+    return {'email': f"student{n}@example.com", 'password': 'secret', 'index': n}
+
+@contextlib.asynccontextmanager
+async def mock_portal(config, **settings):
+    """The mock portal on a free localhost port, with PROTOCOL_BASE_URL pointed at it"""
+    config.update({key: str(value) for key, value in {**FAST, **settings}.items()})
+    portal = MockPortal(config)
+    runner = web.AppRunner(portal.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    config['PROTOCOL_BASE_URL'] = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    try:
+        yield portal
+    finally:
+        await runner.cleanup()
+
+def run_session(config, **settings):
+    run = RunState(None)
+
+    async def session():
+        async with mock_portal(config, **settings):
+            connector = aiohttp.TCPConnector()
+            try:
+                return await run_protocol_session(student(1), config, 0, connector, run)
+            finally:
+                await connector.close()
+
+    return asyncio.run(session()), run
+
+def failures(caplog):
+    return [r.getMessage().split(':', 1)[0] for r in caplog.records if r.getMessage().startswith('FAILURE_STEP_')]
+
+def test_session_succeeds_and_times_every_step(config, caplog):
+    caplog.set_level(logging.INFO)
+    success, run = run_session(config)
+    assert success
+    assert failures(caplog) == []
+    steps = {row['step'] for row in run.step_metrics.rows()}
+    assert {'login_submit', 'aspirations', 'enrolled_units', 'session_list', 'ppt_container', 'chat_response'} <= steps
+    assert run.chat_metrics.rows()[0]['ok'] == 1
+
+def test_http_error_is_classified_by_step(config, caplog):
+    success, _ = run_session(config, MOCK_ERROR_RATE_UNITS=1)
+    assert not success
+    assert failures(caplog) == ['FAILURE_STEP_NAVIGATION']
+
+def test_rejected_aspirations_are_skipped_like_the_browser(config, caplog):
+    caplog.set_level(logging.INFO)
+    success, run = run_session(config, MOCK_ERROR_RATE_ASPIRATIONS=1)
+    assert success
+    assert failures(caplog) == []
+    assert any(r.getMessage().startswith("Aspirations skipped") for r in caplog.records)
+    assert 'aspirations' not in {row['step'] for row in run.step_metrics.rows()}
+
+def test_slow_request_is_a_timeout(config, caplog):
+    success, _ = run_session(config, MOCK_LATENCY_MS_LOGIN=1000, ELEMENT_WAIT_TIMEOUT=0.2)
+    assert not success
+    assert failures(caplog) == ['FAILURE_STEP_TIMEOUT']
+
+def test_chat_reply_gets_its_own_timeout(config, caplog):
+    # Slower than ELEMENT_WAIT_TIMEOUT but within CHAT_RESPONSE_TIMEOUT: a normal reply
+    success, run = run_session(config, MOCK_CHAT_FIRST_TOKEN_MS=400, ELEMENT_WAIT_TIMEOUT=0.2, CHAT_RESPONSE_TIMEOUT=5)
+    assert success
+    # Still streaming at CHAT_RESPONSE_TIMEOUT: incomplete, not a request timeout
+    success, run = run_session(config, MOCK_CHAT_CHUNK_INTERVAL_MS=200, CHAT_RESPONSE_TIMEOUT=0.3)
+    assert not success
+    assert failures(caplog) == ['FAILURE_STEP_CHATBOT_RESPONSE']
+    assert run.chat_metrics.rows()[0]['incomplete'] == 1
+
+def test_unexpected_payload_is_recorded(config, caplog, monkeypatch):
+    async def units(self, request):
+        return web.json_response({'data': ['unit-1']})
+
+    monkeypatch.setattr(MockPortal, 'units', units)
+    success, _ = run_session(config)
+    assert not success
+    assert failures(caplog) == ['FAILURE_STEP_UNEXPECTED']
+
+def test_batch_counts_every_student(config, caplog):
+    run = RunState(None)
+    run.scenarios = load_scenarios(config)
+    students = [student(n) for n in range(1, 5)]
+
+    async def batch():
+        async with mock_portal(config):
+            await _run_protocol_batch(students, config, run, 2, None)
+
+    asyncio.run(batch())
+    assert (run.successful, run.failed, run.cancelled) == (4, 0, 0)
+    assert failures(caplog) == []
+
+def test_attempts_leave_no_failure_entries_behind(config):
+    run = RunState(None)
+    run.scenarios = load_scenarios(config)
+    run.retries = RetryQueue(config)
+
+    async def attempts():
+        async with mock_portal(config, MOCK_LATENCY_MS_LOGIN=2000):
+            connector = aiohttp.TCPConnector()
+            try:
+                limiter = asyncio.Semaphore(2)
+                # One attempt cancelled mid-login, as the deadline does
+                task = asyncio.create_task(_protocol_worker(student(1), config, 0, 2, connector, limiter, run, None))
+                await asyncio.sleep(0.3)
+                assert 'student1@example.com' in run.retries.failures.failures
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                # One that succeeds, so it is never classified
+                config['MOCK_LATENCY_MS_LOGIN'] = '0'
+                assert await _protocol_worker(student(2), config, 1, 2, connector, limiter, run, None)
+            finally:
+                await connector.close()
+
+    asyncio.run(attempts())
+    assert run.retries.failures.failures == {}
@@ -0,0 +1,88 @@
+import math
+import random
+
+import pytest
+
+from run_report import compare_runs, latency_shift_test, success_rate_test
+from step_metrics import LatencyHistogram, StepMetrics, normal_sf
+
+def histogram(values_ms):
+    hist = LatencyHistogram()
+    for value in values_ms:
+        hist.record(value / 1000.0)
+    return hist
+
+def report(latencies_ms, success, total=200):
+    metrics = StepMetrics()
+    for value in latencies_ms:
+        metrics.record('login_submit', value / 1000.0, session=1)
+    return {'sources': ['run.log'], 'step_metrics': metrics.to_dict(),
+            'batch': {'total': total, 'success': success, 'success_rate': success / total}}
+
+def baseline_latencies(seed=1):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(math.log(800), 0.3) for _ in range(200)]
+
+def mann_whitney_reference(current_ms, baseline_ms):
+    """Textbook Mann-Whitney on bucket indexes: mid-ranks and the tie-corrected variance, from raw samples"""
+    bucket = LatencyHistogram()._bucket
+    pooled = sorted([(bucket(v), 'current') for v in current_ms] + [(bucket(v), 'baseline') for v in baseline_ms])
+    ranks, ties, i = {}, [], 0
+    while i < len(pooled):
+        j = i
+        while j < len(pooled) and pooled[j][0] == pooled[i][0]:
+            j += 1
+        ranks[pooled[i][0]] = (i + 1 + j) / 2.0
+        ties.append(j - i)
+        i = j
+    n1, n2 = len(current_ms), len(baseline_ms)
+    n = n1 + n2
+    u = sum(ranks[bucket(v)] for v in current_ms) - n1 * (n1 + 1) / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - sum(t ** 3 - t for t in ties) / (n * (n - 1)))
+    return normal_sf((u - n1 * n2 / 2.0) / math.sqrt(variance))
+
+def test_identical_runs_are_not_a_regression(config):
+    latencies = baseline_latencies()
+    comparison = compare_runs(report(latencies, 190), report(latencies, 190), config)
+    assert comparison['regressions'] == []
+    [row] = comparison['steps']
+    assert (row['step'], row['change'], row['regression']) == ('login_submit', 0.0, False)
+    assert row['p_value'] == pytest.approx(0.5, abs=0.01)
+    assert not comparison['success_rate']['regression']
+
+def test_shifted_run_is_a_regression(config):
+    latencies = baseline_latencies()
+    comparison = compare_runs(report([v * 1.5 for v in latencies], 150), report(latencies, 190), config)
+    [row] = comparison['steps']
+    assert row['regression'] and row['p_value'] < 1e-6 and row['change'] == pytest.approx(0.5, abs=0.05)
+    assert comparison['success_rate']['regression']
+    assert len(comparison['regressions']) == 2
+
+def test_small_shift_is_below_the_minimum_change(config):
+    latencies = baseline_latencies()
+    comparison = compare_runs(report([v * 1.08 for v in latencies], 190), report(latencies, 190), config)
+    [row] = comparison['steps']
+    assert row['p_value'] < 0.05 and not row['regression']
+
+def test_too_few_samples_get_no_p_value(config):
+    latencies = baseline_latencies()[:10]
+    [row] = compare_runs(report([v * 3 for v in latencies], 190), report(latencies, 190), config)['steps']
+    assert row['p_value'] is None and not row['regression']
+
+def test_latency_shift_matches_rank_test_with_bucket_ties():
+    # Whole-millisecond values land many samples in the same log bucket
+    rng = random.Random(7)
+    baseline = [rng.choice([100, 101, 102, 150, 151, 200]) for _ in range(60)]
+    current = [rng.choice([101, 102, 150, 151, 200, 250]) for _ in range(50)]
+    assert latency_shift_test(histogram(current), histogram(baseline)) == \
+        pytest.approx(mann_whitney_reference(current, baseline), rel=1e-9)
+
+def test_all_tied_samples_have_no_variance():
+    assert latency_shift_test(histogram([100] * 30), histogram([100] * 30)) == 1.0
+    assert latency_shift_test(histogram([]), histogram([100])) is None
+
+def test_success_rate_test():
+    assert success_rate_test({'total': 100, 'success': 95}, {'total': 100, 'success': 95}) == pytest.approx(0.5)
+    assert success_rate_test({'total': 100, 'success': 80}, {'total': 100, 'success': 95}) < 0.01
+    assert success_rate_test({'total': 100, 'success': 100}, {'total': 100, 'success': 100}) == 1.0
+    assert success_rate_test({'total': 0, 'success': 0}, {'total': 100, 'success': 95}) is None
@@ -0,0 +1,62 @@
+import random
+
+from soak import SoakWindows, drift_analysis, mann_kendall
+from step_metrics import LatencyHistogram
+
+WINDOW = 300
+STARTED = 1000.0
+
+def soak_windows(latencies_per_window, failed_per_window=None):
+    """SoakWindows filled window by window: login_submit latencies (ms) and 20 iterations each"""
+    windows = SoakWindows(WINDOW, STARTED)
+    for index, latencies in enumerate(latencies_per_window):
+        at = STARTED + index * WINDOW + 1
+        window = windows._window(at)
+        for value in latencies:
+            window['steps'].setdefault('login_submit', LatencyHistogram()).record(value / 1000.0)
+        window['iterations'] = 20
+        window['failed'] = failed_per_window[index] if failed_per_window else 0
+        for _ in range(20):
+            window['duration'].record(5.0)
+    return windows
+
+def flagged(rows, config):
+    return {(row['step'], row['metric']) for row in drift_analysis(rows, config) if row['drift']}
+
+def test_flat_series_has_no_drift(config):
+    rng = random.Random(3)
+    windows = soak_windows([[rng.uniform(400, 600) for _ in range(40)] for _ in range(10)])
+    rows = windows.rows(until=STARTED + 10 * WINDOW)
+    results = drift_analysis(rows, config)
+    assert {(r['step'], r['metric']) for r in results} >= {('login_submit', 'p50_ms'), ('login_submit', 'p95_ms'),
+                                                           ('iteration', 'error_rate')}
+    assert flagged(rows, config) == set()
+
+def test_rising_p95_is_drift(config):
+    # The median stays put while the slowest tenth gets 20% slower every window
+    windows = soak_windows([[500] * 36 + [1000 * (1 + 0.2 * index)] * 4 for index in range(8)])
+    rows = windows.rows(until=STARTED + 8 * WINDOW)
+    assert flagged(rows, config) == {('login_submit', 'p95_ms')}
+    [p95] = [r for r in drift_analysis(rows, config) if r['metric'] == 'p95_ms']
+    assert p95['windows'] == 8 and p95['slope_per_hour'] > 0 and p95['p_value'] < 0.05
+
+def test_rising_error_rate_is_drift(config):
+    windows = soak_windows([[500] * 20] * 8, failed_per_window=[0, 0, 1, 1, 2, 2, 3, 4])
+    assert flagged(windows.rows(until=STARTED + 8 * WINDOW), config) == {('iteration', 'error_rate')}
+
+def test_partial_window_is_excluded(config):
+    # Eight flat windows, then a window still open at the end with a huge spike
+    windows = soak_windows([[500] * 20] * 8 + [[50000] * 20])
+    rows = windows.rows(until=STARTED + 8 * WINDOW + 10)
+    assert [row['partial'] for row in rows] == [False] * 8 + [True]
+    assert flagged(rows, config) == set()
+    assert all(r['windows'] == 8 for r in drift_analysis(rows, config))
+
+def test_too_few_windows_are_not_analysed(config):
+    windows = soak_windows([[500 * (index + 1)] * 20 for index in range(3)])
+    assert drift_analysis(windows.rows(until=STARTED + 3 * WINDOW), config) == []
+
+def test_mann_kendall():
+    assert mann_kendall([1, 2, 3, 4, 5, 6, 7, 8])[0] == 28
+    assert mann_kendall([1, 2, 3, 4, 5, 6, 7, 8])[1] < 0.01
+    assert mann_kendall([5, 5, 5, 5]) == (0, 1.0)